@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Parallel, streaming loader for vision analysis result directories.
+
+- Files are read and parsed on a thread pool (or a process pool) with a
+  bounded number of tasks in flight, and come back in file-id order
+- iter_results() streams (file_id, analysis) pairs, so callers that only
+  aggregate never hold the whole directory in memory; load() builds the dict
+- orjson parses when it is installed, the json module otherwise
+- Re-downloaded copies ("X_analysis(1).json", "(2)", ...) compete with the
+  original for the same file id: the newest meta.generated_at wins and
+  ties go to the lowest copy number, i.e. the original download
+"""
+
+import os
+import re
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, faster parser
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+# Directory-level aggregates that are not per-image analyses
+AGGREGATE_FILES = ("DEF_ALL.json", "IMG_GEN_analysis.json")
+ANALYSIS_RX = re.compile(r"^(?P<stem>.+)_analysis(?:\((?P<copy>\d+)\))?\.json$")
+# Groups parsed per task: keeps the pool busy without one future per file
+THREAD_CHUNK = 8
+PROCESS_CHUNK = 64
+
+# (file_id, kept path, analysis, shadowed paths, [(file name, error)])
+GroupResult = Tuple[str, Optional[Path], Any, List[Path], List[Tuple[str, str]]]
+
+
+def parse_json_bytes(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_json_text(value: Any) -> str:
+    """Compact JSON text (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def file_id_of(path: Path) -> str:
+    """"0009_SDB_MAC_20250819_analysis(2).json" -> "0009"."""
+    m = ANALYSIS_RX.match(path.name)
+    stem = m.group("stem") if m else path.stem
+    return stem.split("_")[0]
+
+
+def copy_number(path: Path) -> int:
+    m = ANALYSIS_RX.match(path.name)
+    return int(m.group("copy")) if m and m.group("copy") else 0
+
+
+def analysis_files(analysis_dir) -> List[Path]:
+    """Per-image analysis files, re-downloaded copies included, sorted by name."""
+    return sorted(
+        p for p in Path(analysis_dir).glob("*_analysis*.json")
+        if p.name not in AGGREGATE_FILES and ANALYSIS_RX.match(p.name)
+    )
+
+
+def group_by_file_id(paths: Iterable[Path]) -> Dict[str, List[Path]]:
+    groups: Dict[str, List[Path]] = {}
+    for p in sorted(paths):
+        groups.setdefault(file_id_of(p), []).append(p)
+    return dict(sorted(groups.items()))
+
+
+def _generated_at(analysis: Any) -> str:
+    meta = analysis.get("meta") if isinstance(analysis, dict) else None
+    return str(meta.get("generated_at") or "") if isinstance(meta, dict) else ""
+
+
+def read_group(file_id: str, paths: List[Path]) -> GroupResult:
+    """Parse every candidate for one file id and keep one of them."""
+    parsed = []
+    errors = []
+    for p in paths:
+        try:
+            parsed.append((p, parse_json_bytes(p.read_bytes())))
+        except (OSError, ValueError) as e:
+            errors.append((p.name, str(e)))
+    if not parsed:
+        return file_id, None, None, [], errors
+    # max() keeps the first of equal keys, and paths are sorted by name
+    kept, analysis = max(parsed, key=lambda pa: (_generated_at(pa[1]), -copy_number(pa[0])))
+    shadowed = [p for p, _ in parsed if p != kept]
+    return file_id, kept, analysis, shadowed, errors
+
+
+def _read_groups(chunk: List[Tuple[str, List[Path]]]) -> List[GroupResult]:
+    return [read_group(file_id, paths) for file_id, paths in chunk]
+
+
+class AnalysisLoader:
+    """Loads one analysis directory; counters describe the last pass."""
+
+    def __init__(self, analysis_dir, workers: Optional[int] = None, processes: bool = False):
+        self.analysis_dir = Path(analysis_dir)
+        self.workers = max(1, workers or min(16, (os.cpu_count() or 1) + 4))
+        self.processes = processes
+        self.loaded = 0
+        self.duplicates: Dict[str, Dict[str, Any]] = {}  # file_id -> kept / shadowed file names
+        self.errors: Dict[str, str] = {}  # file name -> parse error
+
+    def files(self) -> List[Path]:
+        return analysis_files(self.analysis_dir)
+
+    def iter_results(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(file_id, analysis) pairs in file-id order, parsed ahead on the pool."""
+        self.loaded = 0
+        self.duplicates = {}
+        self.errors = {}
+        groups = list(group_by_file_id(self.files()).items())
+        if self.workers == 1 or len(groups) <= THREAD_CHUNK:
+            for results in map(_read_groups, ([g] for g in groups)):
+                yield from self._accept(results)
+            return
+        size = PROCESS_CHUNK if self.processes else THREAD_CHUNK
+        chunks = [groups[i:i + size] for i in range(0, len(groups), size)]
+        pool_cls = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+        window = self.workers * 2
+        with pool_cls(max_workers=self.workers) as pool:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(_read_groups, chunk))
+                if len(in_flight) >= window:
+                    yield from self._accept(in_flight.popleft().result())
+            while in_flight:
+                yield from self._accept(in_flight.popleft().result())
+
+    def _accept(self, results: List[GroupResult]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for file_id, kept, analysis, shadowed, errors in results:
+            self.errors.update(errors)
+            if kept is None:
+                continue
+            if shadowed:
+                self.duplicates[file_id] = {"kept": kept.name, "shadowed": [p.name for p in shadowed]}
+            self.loaded += 1
+            yield file_id, analysis
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.iter_results())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": JSON_BACKEND,
+            "workers": self.workers,
+            "executor": "process" if self.processes else "thread",
+            "loaded": self.loaded,
+            "duplicates_resolved": len(self.duplicates),
+            "errors": len(self.errors),
+        }
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+SQLite store of vision analyses, for queries without re-parsing JSON.
+
+- `python analysis_store.py ingest` loads an analysis directory into
+  normalised tables: frames, defects, regle_refs, annotations, metrics
+- Indexed on zone, category, severity and id_defaut, so questions like
+  "gravite=1 étanchéité defects in SDB" are one indexed query
+  (`python analysis_store.py query --zone SDB --categorie étanchéité --gravite 1`)
+- Ingest is incremental: a source file is re-hashed only when its size or
+  mtime changed, and a file id is re-ingested only when one of its
+  files' content changed. Re-downloaded copies are resolved as in
+  analysis_loader
+- Each frame keeps its analysis document, so run_pipeline.py and
+  run_vision_analysis.py can read whole analyses from here (--analysis-db)
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from analysis_loader import analysis_files, dump_json_text, group_by_file_id, parse_json_bytes, read_group
+from pipeline_cache import hash_parts
+from file_hash import sha256_file
+
+DEFAULT_DB_PATH = Path(".cache/analysis_store.sqlite")
+DEFAULT_ANALYSIS_DIR = "docs/To validate/ArBot-Core,_v1.4_OUT_JSON"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    file_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    generated_at TEXT,
+    file_name TEXT,
+    file_date TEXT,
+    zone_id INTEGER,
+    zone_name TEXT,
+    cat_id INTEGER,
+    viewtype_id TEXT,
+    width INTEGER,
+    height INTEGER,
+    document BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS defects (
+    file_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    id_defaut TEXT,
+    categorie TEXT,
+    type_defaut TEXT,
+    origin_layer TEXT,
+    gravite,
+    priorite,
+    conf_score REAL,
+    incertitude REAL,
+    resume TEXT,
+    PRIMARY KEY (file_id, idx)
+);
+CREATE TABLE IF NOT EXISTS regle_refs (
+    file_id TEXT NOT NULL,
+    defect_idx INTEGER NOT NULL,
+    doc_id TEXT,
+    norme TEXT,
+    partie TEXT,
+    source_page TEXT,
+    article_id TEXT,
+    PRIMARY KEY (file_id, defect_idx)
+);
+CREATE TABLE IF NOT EXISTS annotations (
+    file_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    ann_id TEXT,
+    ann_type TEXT,
+    ann_label TEXT,
+    linked_def_id TEXT,
+    layer TEXT,
+    confidence REAL,
+    bbox_xyxy_norm TEXT,
+    polygon_norm TEXT,
+    PRIMARY KEY (file_id, idx)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    file_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    metric_id TEXT,
+    type TEXT,
+    value,
+    unit TEXT,
+    expected_min,
+    status TEXT,
+    annotation_ref TEXT,
+    PRIMARY KEY (file_id, idx)
+);
+CREATE INDEX IF NOT EXISTS frames_zone ON frames (zone_name);
+CREATE INDEX IF NOT EXISTS defects_categorie ON defects (categorie, gravite);
+CREATE INDEX IF NOT EXISTS defects_gravite ON defects (gravite);
+CREATE INDEX IF NOT EXISTS defects_id ON defects (id_defaut);
+CREATE INDEX IF NOT EXISTS annotations_defect ON annotations (linked_def_id);
+CREATE INDEX IF NOT EXISTS sources_file_id ON sources (file_id);
+"""
+
+CHILD_TABLES = ("defects", "regle_refs", "annotations", "metrics")
+COLUMNS = {"frames": 13, "defects": 11, "regle_refs": 7, "annotations": 10, "metrics": 9}
+BATCH_ROWS = 5000  # rows buffered per table between executemany() calls
+
+
+def _cell(value: Any) -> Any:
+    """SQLite value: nested JSON is stored as text."""
+    if isinstance(value, (dict, list)):
+        return dump_json_text(value)
+    return value
+
+
+def _dict(value: Any) -> Dict[str, Any]:
+    return value if isinstance(value, dict) else {}
+
+
+def _list(value: Any) -> List[Any]:
+    return value if isinstance(value, list) else []
+
+
+class AnalysisStore:
+    """One SQLite database of analyses; use as a context manager."""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._pending: Dict[str, List[tuple]] = {table: [] for table in COLUMNS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # ingest
+
+    def ingest(self, analysis_dir) -> Dict[str, int]:
+        """Bring the store in line with `analysis_dir`; returns what changed."""
+        stats = {"files": 0, "hashed": 0, "ingested": 0, "unchanged": 0, "removed": 0, "errors": 0}
+        known = {row["path"]: row for row in self.conn.execute("SELECT * FROM sources")}
+        stored_paths: Dict[str, set] = {}
+        for row in known.values():
+            stored_paths.setdefault(row["file_id"], set()).add(row["path"])
+
+        groups = group_by_file_id(analysis_files(analysis_dir))
+        with self.conn:
+            for file_id, paths in groups.items():
+                changed = {str(p) for p in paths} != stored_paths.get(file_id, set())
+                digests = {}
+                for p in paths:
+                    stats["files"] += 1
+                    st = os.stat(p)
+                    row = known.get(str(p))
+                    if row is not None and (row["size"], row["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+                        digests[p] = row["sha256"]
+                        continue
+                    digest = digests[p] = sha256_file(p)
+                    stats["hashed"] += 1
+                    changed = changed or row is None or row["sha256"] != digest
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO sources (path, file_id, size, mtime_ns, sha256) VALUES (?, ?, ?, ?, ?)",
+                        (str(p), file_id, st.st_size, st.st_mtime_ns, digest),
+                    )
+                if not changed:
+                    stats["unchanged"] += 1
+                    continue
+                _, kept, analysis, _, errors = read_group(file_id, paths)
+                stats["errors"] += len(errors)
+                for name, error in errors:
+                    print(f"[WARNING] Could not load {name}: {error}")
+                if file_id in stored_paths:
+                    self._flush()
+                    self.conn.execute(
+                        f"DELETE FROM sources WHERE file_id = ? AND path NOT IN ({','.join('?' * len(paths))})",
+                        (file_id, *map(str, paths)),
+                    )
+                    self._delete(file_id)
+                if kept is not None:
+                    self._insert(file_id, kept, digests[kept], analysis)
+                    stats["ingested"] += 1
+            self._flush()
+            for file_id in set(stored_paths) - set(groups):
+                self._delete(file_id)
+                self.conn.execute("DELETE FROM sources WHERE file_id = ?", (file_id,))
+                stats["removed"] += 1
+        return stats
+
+    def _add(self, table: str, rows: List[tuple]):
+        pending = self._pending[table]
+        pending.extend(rows)
+        if len(pending) >= BATCH_ROWS:
+            self._flush_table(table)
+
+    def _flush_table(self, table: str):
+        rows = self._pending[table]
+        if rows:
+            self.conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * COLUMNS[table])})", rows)
+            self._pending[table] = []
+
+    def _flush(self):
+        for table in COLUMNS:
+            self._flush_table(table)
+
+    def _delete(self, file_id: str):
+        self.conn.execute("DELETE FROM frames WHERE file_id = ?", (file_id,))
+        for table in CHILD_TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,))
+
+    def _insert(self, file_id: str, source: Path, digest: str, analysis: Dict[str, Any]):
+        src = _dict(analysis.get("source_file"))
+        vision = _dict(analysis.get("vision"))
+        self._add("frames", [(
+            file_id, str(source), digest, _cell(_dict(analysis.get("meta")).get("generated_at")),
+            *(_cell(src.get(k)) for k in (
+                "file_name", "file_date", "zone_ID", "zone_name", "cat_ID", "viewtype_ID",
+                "file_img_width", "file_img_height")),
+            # the source bytes are the document: no re-encoding
+            source.read_bytes(),
+        )])
+        defects = [_dict(d) for d in _list(vision.get("defects"))]
+        self._add("defects", [
+            (file_id, i, *(_cell(d.get(k)) for k in (
+                "id_defaut", "categorie", "type_defaut", "origin_layer", "gravite",
+                "priorite", "conf_score", "incertitude", "resume")))
+            for i, d in enumerate(defects)
+        ])
+        self._add("regle_refs", [
+            (file_id, i, *(_cell(d["regle_ref"].get(k)) for k in (
+                "doc_id", "norme", "partie", "source_page", "article_id")))
+            for i, d in enumerate(defects) if isinstance(d.get("regle_ref"), dict)
+        ])
+        self._add("annotations", [
+            (file_id, i, *(_cell(a.get(k)) for k in (
+                "ann_ID", "ann_type", "ann_label", "ann_linked_def_ID", "ann_layer",
+                "ann_confidence", "bbox_xyxy_norm", "polygon_norm")))
+            for i, a in enumerate(_dict(a) for a in _list(vision.get("annotations")))
+        ])
+        self._add("metrics", [
+            (file_id, i, *(_cell(m.get(k)) for k in (
+                "metric_id", "type", "value", "unit", "expected_min", "status", "annotation_ref")))
+            for i, m in enumerate(_dict(m) for m in _list(vision.get("metrics")))
+        ])
+
+    # read
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    def fingerprint(self) -> str:
+        """Digest of the stored analyses: changes whenever an ingest changed anything."""
+        rows = self.conn.execute("SELECT file_id, sha256 FROM frames ORDER BY file_id")
+        return hash_parts([tuple(row) for row in rows])
+
+    def iter_results(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(file_id, analysis) pairs in file-id order, like AnalysisLoader.iter_results()."""
+        for file_id, document in self.conn.execute("SELECT file_id, document FROM frames ORDER BY file_id"):
+            yield file_id, parse_json_bytes(document)
+
+    def load_results(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.iter_results())
+
+    def query_defects(
+        self,
+        zone: Optional[str] = None,
+        categorie: Optional[str] = None,
+        gravite: Any = None,
+        id_defaut: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Defects with their frame's zone/file name and their norm reference."""
+        where, params = [], []
+        for column, value in (("f.zone_name", zone), ("d.categorie", categorie),
+                              ("d.gravite", gravite), ("d.id_defaut", id_defaut)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = (
+            "SELECT d.file_id, f.file_name, f.zone_name, d.id_defaut, d.categorie, d.type_defaut,"
+            " d.origin_layer, d.gravite, d.priorite, d.resume, r.norme, r.partie, r.doc_id"
+            " FROM defects d JOIN frames f ON f.file_id = d.file_id"
+            " LEFT JOIN regle_refs r ON r.file_id = d.file_id AND r.defect_idx = d.idx"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY d.file_id, d.idx"
+        )
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SQLite store of ArBot vision analyses")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help=f"Database (default {DEFAULT_DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="Load new or changed analysis files")
+    ingest.add_argument("--analysis-dir", default=DEFAULT_ANALYSIS_DIR, help="Directory of *_analysis.json files")
+    query = sub.add_parser("query", help="List defects (JSON lines)")
+    query.add_argument("--zone", help="zone_name, e.g. SDB")
+    query.add_argument("--categorie", help="e.g. étanchéité")
+    query.add_argument("--gravite", type=int, help="1 (critical) to 3")
+    query.add_argument("--id-defaut", help="e.g. 0001_D01")
+    args = parser.parse_args(argv)
+
+    with AnalysisStore(args.db) as store:
+        if args.command == "ingest":
+            if not Path(args.analysis_dir).exists():
+                print(f"[ERROR] Analysis directory not found: {args.analysis_dir}")
+                return 1
+            stats = store.ingest(args.analysis_dir)
+            print(f"[OK] {args.db}: {stats['ingested']} ingested, {stats['unchanged']} unchanged, "
+                  f"{stats['removed']} removed ({stats['files']} files, {stats['hashed']} hashed); "
+                  f"{store.count()} analyses stored")
+            return 1 if stats["errors"] else 0
+        for row in store.query_defects(args.zone, args.categorie, args.gravite, args.id_defaut):
+            print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Provider Batch-API plumbing for offline vision runs.
+
+- Packs request lines into JSONL shards under the provider size limits
+- Uploads each shard and creates one batch job per shard
+- Tracks job ids and custom_id -> image mapping in a local state file
+- Downloads finished jobs and yields per-request results for collection
+"""
+
+import os
+import io
+import json
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Provider limits: 200 MB and 50k requests per input file (keep a margin)
+MAX_SHARD_BYTES = 190 * 1024 * 1024
+MAX_SHARD_REQUESTS = 50000
+ENDPOINT = "/v1/chat/completions"
+FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def request_line(custom_id: str, body: Dict) -> str:
+    return json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body},
+                      ensure_ascii=False)
+
+
+def shard_lines(
+    lines: List[Tuple[str, str]],
+    max_bytes: int = MAX_SHARD_BYTES,
+    max_requests: int = MAX_SHARD_REQUESTS,
+) -> List[List[Tuple[str, str]]]:
+    """Split (custom_id, line) pairs into shards respecting both limits."""
+    shards: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    size = 0
+    for cid, line in lines:
+        n = len(line.encode("utf-8")) + 1
+        if current and (size + n > max_bytes or len(current) >= max_requests):
+            shards.append(current)
+            current, size = [], 0
+        current.append((cid, line))
+        size += n
+    if current:
+        shards.append(current)
+    return shards
+
+
+class BatchState:
+    """JSON file listing submitted jobs; rewritten atomically on every change."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = {"jobs": []}
+        if self.path.exists():
+            self.data = json.loads(self.path.read_text(encoding="utf-8"))
+
+    @property
+    def jobs(self) -> List[Dict]:
+        return self.data["jobs"]
+
+    def pending_jobs(self) -> List[Dict]:
+        return [j for j in self.jobs if not j.get("collected")]
+
+    def submitted_ids(self) -> set:
+        """custom_ids of jobs that are still awaiting collection."""
+        return {cid for j in self.pending_jobs() for cid in j["requests"]}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+
+def submit_shards(
+    client,
+    shards: List[List[Tuple[str, str]]],
+    requests_meta: Dict[str, Dict],
+    work_dir: Path,
+    state: BatchState,
+) -> List[str]:
+    """Write, upload and start one batch per shard. Returns the new batch ids."""
+    work_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    batch_ids = []
+    for i, shard in enumerate(shards):
+        shard_path = work_dir / f"batch_{stamp}_{i:03d}.jsonl"
+        shard_path.write_text("\n".join(line for _, line in shard) + "\n", encoding="utf-8")
+        with open(shard_path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=ENDPOINT,
+            completion_window="24h",
+        )
+        state.jobs.append({
+            "batch_id": batch.id,
+            "input_file_id": uploaded.id,
+            "shard_file": str(shard_path),
+            "submitted_at": datetime.utcnow().isoformat(),
+            "status": batch.status,
+            "collected": False,
+            "requests": {cid: requests_meta[cid] for cid, _ in shard},
+        })
+        state.save()
+        batch_ids.append(batch.id)
+        print(f"- Submitted batch {batch.id}: {len(shard)} request(s) from {shard_path.name}")
+    return batch_ids
+
+
+def _read_jsonl(client, file_id: Optional[str]) -> Iterator[Dict]:
+    if not file_id:
+        return
+    text = client.files.content(file_id).text
+    for line in io.StringIO(text):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_finished_results(client, state: BatchState) -> Iterator[Tuple[Dict, str, Optional[Dict], Optional[str]]]:
+    """Yield (meta, custom_id, response_body, error) for every finished, uncollected job.
+
+    Jobs still running are refreshed and left pending. A job is marked
+    collected once all its lines have been yielded.
+    """
+    for job in state.pending_jobs():
+        batch = client.batches.retrieve(job["batch_id"])
+        job["status"] = batch.status
+        if batch.status not in FINAL_STATES:
+            print(f"- Batch {job['batch_id']} still {batch.status}")
+            continue
+        seen = set()
+        for rec in _read_jsonl(client, batch.output_file_id):
+            cid = rec.get("custom_id")
+            resp = rec.get("response") or {}
+            if cid not in job["requests"]:
+                continue
+            seen.add(cid)
+            if resp.get("status_code") == 200:
+                yield job["requests"][cid], cid, resp.get("body"), None
+            else:
+                yield job["requests"][cid], cid, None, json.dumps(rec.get("error") or resp.get("body"))
+        for rec in _read_jsonl(client, batch.error_file_id):
+            cid = rec.get("custom_id")
+            if cid in job["requests"] and cid not in seen:
+                seen.add(cid)
+                yield job["requests"][cid], cid, None, json.dumps(rec.get("error") or rec.get("response"))
+        for cid, meta in job["requests"].items():
+            if cid not in seen:
+                yield meta, cid, None, f"Batch {job['batch_id']} ended as {batch.status} without a result"
+        job["collected"] = True
+        job["collected_at"] = datetime.utcnow().isoformat()
+        state.save()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Columnar table of vision defects, built in one pass over the analyses.
+
+- One row per defect. categorie, gravite, zone_name and origin_layer are
+  dictionary-encoded into integer code columns (array('I')); with
+  detail=True the defect dicts themselves are kept as an object column
+- Per-image columns (file id, file name) sit beside it; each image's
+  defects are the contiguous row range offsets[i]:offsets[i + 1]
+- Counters, group-bys and top-N lists work on the code columns
+  (collections.Counter and heapq run in C), so analyze_defects(),
+  DEFECT_DETECTION and the assessment report share a single traversal
+"""
+
+import heapq
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+CATEGORICAL = ("categorie", "gravite", "zone_name", "origin_layer")
+BATCH_ROWS = 4096
+
+
+class _Missing:
+    """Marks a field absent from the analysis (each consumer has its own default)."""
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+class Categories:
+    """Dictionary encoding of one column: value <-> small integer code."""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self._codes: Dict[Any, int] = {}
+
+    def encode(self, values: List[Any]) -> List[int]:
+        codes = self._codes
+        out = []
+        for value in values:
+            key = _key(value)
+            code = codes.get(key)
+            if code is None:
+                code = codes[key] = len(self.values)
+                self.values.append(value)
+            out.append(code)
+        return out
+
+    def decoded(self, default: Any) -> List[Any]:
+        """Value per code, with `default` for MISSING."""
+        return [default if v is MISSING else v for v in self.values]
+
+
+def _key(value: Any) -> Any:
+    """Dictionary key of a value: str and int keys never collide; others are
+    typed so that 2.0 and True stay apart from 2 and 1, and lists become hashable."""
+    t = type(value)
+    if t is str or t is int:
+        return value
+    try:
+        hash(value)
+    except TypeError:
+        return t, repr(value)
+    return t, value
+
+
+class DefectTable:
+    """Defects of many analyses as columns."""
+
+    def __init__(self, detail: bool = True):
+        self.detail = detail
+        self.categories = {name: Categories() for name in CATEGORICAL}
+        self.codes = {name: array("I") for name in CATEGORICAL}
+        self.defects: List[Dict[str, Any]] = []  # detail=True only
+        self.file_ids: List[str] = []
+        self.file_names: List[Any] = []
+        self.offsets = array("I", [0])
+        self.images_with_defects = 0
+        # Rows not yet encoded: encoding in batches is far cheaper than per
+        # image, and at most BATCH_ROWS defects wait here
+        self._rows: List[Dict[str, Any]] = []
+        self._zones: List[Any] = []
+
+    @classmethod
+    def from_analyses(cls, analysis_results, detail: bool = True) -> "DefectTable":
+        """Table of a results dict or of a (file_id, analysis) stream, read once."""
+        pairs = analysis_results.items() if isinstance(analysis_results, Mapping) else analysis_results
+        table = cls(detail)
+        for file_id, analysis in pairs:
+            table.add(file_id, analysis)
+        table.flush()
+        return table
+
+    def add(self, file_id: str, analysis: Dict[str, Any]):
+        defects = analysis.get("vision", {}).get("defects", []) or []
+        source_file = analysis.get("source_file", {})
+        self.file_ids.append(file_id)
+        self.file_names.append(source_file.get("file_name", MISSING))
+        if defects:
+            self.images_with_defects += 1
+            self._rows.extend(defects)
+            self._zones.extend([source_file.get("zone_name", "UNKNOWN")] * len(defects))
+            if len(self._rows) >= BATCH_ROWS:
+                self.flush()
+        self.offsets.append(self.offsets[-1] + len(defects))
+
+    def flush(self):
+        """Move buffered rows into the columns (done by from_analyses)."""
+        rows = self._rows
+        if not rows:
+            return
+        self.codes["zone_name"].extend(self.categories["zone_name"].encode(self._zones))
+        for name in ("categorie", "gravite", "origin_layer"):
+            self.codes[name].extend(self.categories[name].encode([d.get(name, MISSING) for d in rows]))
+        if self.detail:
+            self.defects.extend(rows)
+        self._rows = []
+        self._zones = []
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+    @property
+    def n_images(self) -> int:
+        return len(self.file_ids)
+
+    def decoded(self, name: str, default: Any) -> List[Any]:
+        """Categorical column as values, one per row."""
+        return list(map(self.categories[name].decoded(default).__getitem__, self.codes[name]))
+
+    def per_row(self, per_image: List[Any], default: Any = None) -> List[Any]:
+        """Spread a per-image column over that image's defect rows."""
+        rows = []
+        offsets = self.offsets
+        for i, value in enumerate(per_image):
+            n = offsets[i + 1] - offsets[i]
+            if n:
+                rows.extend([default if value is MISSING else value] * n)
+        return rows
+
+    def counts(self, name: str, default: Any = "UNKNOWN", key: Callable[[Any], Any] = None) -> Dict[Any, int]:
+        """Rows per value of a categorical column, in first-seen order."""
+        values = self.categories[name].decoded(default)
+        out: Dict[Any, int] = {}
+        for code, n in Counter(self.codes[name]).items():
+            value = key(values[code]) if key else values[code]
+            out[value] = out.get(value, 0) + n
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        """The counters of run_vision_analysis.analyze_defects()."""
+        return {
+            "total_images_analyzed": self.n_images,
+            "total_defects": len(self),
+            "defects_by_category": defaultdict(int, self.counts("categorie")),
+            "defects_by_severity": defaultdict(int, self.counts("gravite", key=str)),
+            "defects_by_zone": defaultdict(int, self.counts("zone_name")),
+            "images_with_defects": self.images_with_defects,
+            "images_without_defects": self.n_images - self.images_with_defects,
+        }
+
+    def top_images(self, n: int, missing_name: Any = "N/A") -> List[Tuple[str, Any, int, Set[Any]]]:
+        """(file_id, file_name, defect count, categories) of the n images with most defects."""
+        offsets = self.offsets
+        sizes = [offsets[i + 1] - offsets[i] for i in range(self.n_images)]
+        best = heapq.nlargest(n, (i for i, size in enumerate(sizes) if size), key=sizes.__getitem__)
+        categories = self.categories["categorie"].decoded("UNKNOWN")
+        codes = self.codes["categorie"]
+        rows = []
+        for i in best:
+            name = self.file_names[i]
+            cats = {categories[c] for c in codes[offsets[i]:offsets[i + 1]]}
+            rows.append((self.file_ids[i], missing_name if name is MISSING else name, sizes[i], cats))
+        return rows
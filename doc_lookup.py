@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Lookup index over docs_index.json for norm reference linking.
+
+- Built once per run: O(documents) to build, O(1) per defect to resolve
+- Keys: document id, code, filename stem and a normalised norm identifier,
+  so "DTU 25.41_1993", "DTU-25-41:1993" and "DTU_25.41_1993.pdf" all hit
+  the same document
+- A norm cited without its year ("NF DTU 60.1") resolves when only one
+  edition is indexed
+- Resolves both regle_ref forms: {"doc_id", ...} and {"norme", "partie"}
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+DOC_EXTS = (".pdf", ".docx", ".doc", ".xlsx")
+# Publisher prefix that does not change which document is meant ("NF DTU 60.1")
+NORM_PREFIX = "NF"
+_SEP_RX = re.compile(r"[\s._:/\\-]+")
+_YEAR_RX = re.compile(r"^(19|20)\d\d$")
+
+
+def normalize_norm(ref: str) -> str:
+    """Canonical form of a norm / document reference: "DTU 25 41 1993"."""
+    text = unicodedata.normalize("NFKC", str(ref or "")).strip()
+    if text.lower().endswith(DOC_EXTS):
+        text = text.rsplit(".", 1)[0]
+    tokens = [t for t in _SEP_RX.split(text.upper()) if t]
+    if len(tokens) > 1 and tokens[0] == NORM_PREFIX:
+        tokens = tokens[1:]
+    return " ".join(tokens)
+
+
+def without_year(norm_key: str) -> Optional[str]:
+    """Drop a trailing year ("DTU 60 1 2012" -> "DTU 60 1"); None if there is none."""
+    head, _, last = norm_key.rpartition(" ")
+    return head if head and _YEAR_RX.match(last) else None
+
+
+class DocLookup:
+    """Dict-backed index from reference strings to docs_index documents."""
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.exact: Dict[str, Dict[str, Any]] = {}
+        self.norms: Dict[str, Dict[str, Any]] = {}
+        undated: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in documents:
+            # First document wins for shared keys (e.g. code "DTU"), as the linear scan did
+            for value in (doc.get("id"), doc.get("code")):
+                if value:
+                    self.exact.setdefault(str(value), doc)
+            for value in (doc.get("filename"), doc.get("title")):
+                key = normalize_norm(value) if value else ""
+                if key:
+                    self.norms.setdefault(key, doc)
+                    base = without_year(key)
+                    if base:
+                        undated.setdefault(base, []).append(doc)
+        for base, docs in undated.items():
+            if base not in self.norms and len({d.get("id") for d in docs}) == 1:
+                self.norms[base] = docs[0]
+
+    @classmethod
+    def from_docs_index(cls, docs_index: Dict[str, Any]) -> "DocLookup":
+        return cls(docs_index.get("documents", []))
+
+    def find(self, ref: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Document for an id, code, file name or norm identifier."""
+        if not ref:
+            return None
+        doc = self.exact.get(str(ref))
+        if doc is None:
+            doc = self.norms.get(normalize_norm(ref))
+        return doc
+
+    def resolve(self, regle_ref: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Document cited by a defect's regle_ref, in either form."""
+        if not isinstance(regle_ref, dict):
+            return None
+        doc_id = regle_ref.get("doc_id")
+        if doc_id and doc_id != "UNKNOWN":
+            doc = self.find(doc_id)
+            if doc is not None:
+                return doc
+        return self.find(regle_ref.get("norme"))
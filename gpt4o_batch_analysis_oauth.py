@@ -2,31 +2,64 @@
 """
 GPT-4o Vision Batch Analysis with OAuth Authentication
 
-- Obtains/refreshes access tokens via OAuthTokenManager
+- Obtains/refreshes access tokens via OAuthTokenManager: one manager per
+  process, asked for the current token before every request
 - Iterates images in a folder and analyzes them with GPT-4o
 - Saves one JSON result per image in the output directory
+- Optional async mode (--concurrency N) keeps N requests in flight
+- Optional shared rate limiter (--rpm/--tpm) adapting to 429 responses
+- Content-addressed response cache: identical images cost no API call
+- Optional upload profile: EXIF-rotate, downscale and re-encode before sending
+- Offline Batch-API mode (--mode batch, then --mode collect)
+- Crash-safe run journal; result files are written atomically
+- Classified retries with backoff + jitter; dead letters for --retry-failed
+- JSON mode where supported, local JSON repair + schema check before a re-ask
+- Optional packing (--pack K): up to K photos of one zone/category per request
 """
 
 import os
+import re
 import json
+import time
 import base64
+import asyncio
 import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 try:
-    from openai import OpenAI
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
 except Exception as e:
+    httpx = None
     OpenAI = None
+    AsyncOpenAI = None
 
 from oauth_token_manager import OAuthTokenManager
+from rate_limiter import RateLimiter, estimate_request_tokens
+from json_repair import ResponseRepairer, load_schema, repair_json
+from retry_policy import RATE_LIMIT, DeadLetterQueue, RetryPolicy, classify, retry_after_of
+from response_cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from upload_profile import UploadProfile, PROVIDER_MAX_SIDE, PROVIDER_SHORT_SIDE
+from run_journal import RunJournal, atomic_write_text
+from batch_jobs import BatchState, MAX_SHARD_BYTES, iter_finished_results, request_line, shard_lines, submit_shards
 
 # Defaults
 DEFAULT_IMAGES_DIR = Path("images")
 DEFAULT_OUTPUT_DIR = Path("docs/To validate/ArBot-Vision-GPT4o_v1.0/individual_analysis")
 DEFAULT_MODEL = "gpt-4o"
+DEFAULT_PREVIEW_DIR = Path("images/preview")
+DEFAULT_SCHEMA_PATH = Path("ArBot-Vision-Pack_v0.7.1/schemas/image_analysis.schema.json")
+# Model families accepting response_format={"type": "json_object"}
+JSON_MODE_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-5", "o1", "o3", "o4")
+MAX_TOKENS = 2000
+MAX_PACKED_TOKENS = 16000  # completion cap of the gpt-4o family
+TEMPERATURE = 0.2
+DETAIL = "high"
 SUPPORTED_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+# NameGen file names start with the 4-digit file_ID: zone (1 digit), category (1), sequence (2)
+FILE_ID_RX = re.compile(r"^(\d)(\d)\d\d_")
 
 
 ANALYSIS_PROMPT = """You are an expert in construction damage assessment for French bathrooms.
@@ -38,19 +71,91 @@ Analyze the provided photo and produce a concise JSON with:
 Be concrete and avoid speculation beyond the image. Output valid JSON only.
 """
 
+# Prepended to ANALYSIS_PROMPT for packed requests
+PACKED_PROMPT = """The {n} photos above, labelled {labels}, show the same zone and category.
+Analyze each photo on its own and return one JSON object whose keys are exactly
+these labels; each value is the analysis of that photo, as described below.
+"""
+
+REPAIR_PROMPT = """Your previous answer was supposed to be a single JSON object matching the schema below,
+but it is invalid: {errors}
+Return the corrected JSON object only, keeping the original content.
+Schema:
+{schema}
+Previous answer:
+{content}
+"""
+
+
+_token_manager: OAuthTokenManager | None = None
+
+
+def token_manager() -> OAuthTokenManager:
+    """The process-wide token manager: its cache and refreshes serve every client."""
+    global _token_manager
+    if _token_manager is None:
+        _token_manager = OAuthTokenManager()
+    return _token_manager
+
+
+class OAuthBearer(httpx.Auth if httpx is not None else object):
+    """httpx auth hook: current access token on every request; on a 401, refresh once and resend."""
+
+    def __init__(self, manager: OAuthTokenManager):
+        self.manager = manager
+
+    def sync_auth_flow(self, request):
+        token = self.manager.get_valid_token()
+        request.headers["Authorization"] = f"Bearer {token}"
+        response = yield request
+        if response.status_code == 401:
+            request.headers["Authorization"] = f"Bearer {self.manager.force_refresh(token)}"
+            yield request
 
-def get_openai_client() -> "OpenAI":
-    manager = OAuthTokenManager()
-    token = manager.get_valid_token()
+    async def async_auth_flow(self, request):
+        # Served from memory (a token near expiry is refreshed in the background);
+        # only a refresh that must be waited for goes to a thread, off the event loop
+        token = self.manager.get_valid_token(blocking=False)
+        if token is None:
+            token = await asyncio.to_thread(self.manager.get_valid_token)
+        request.headers["Authorization"] = f"Bearer {token}"
+        response = yield request
+        if response.status_code == 401:
+            token = await asyncio.to_thread(self.manager.force_refresh, token)
+            request.headers["Authorization"] = f"Bearer {token}"
+            yield request
+
+
+def get_openai_client(
+    base_url: str | None = None,
+    max_retries: int = 2,
+    manager: OAuthTokenManager | None = None,
+) -> "OpenAI":
     if OpenAI is None:
         raise RuntimeError(
             "openai library not available. Install with: pip install openai>=1.0.0"
         )
-    # Use OAuth access token as API key (SDK sends Bearer header)
-    return OpenAI(api_key=token)
+    manager = manager or token_manager()
+    # The SDK's own Bearer header is replaced per request by OAuthBearer
+    return OpenAI(api_key=manager.get_valid_token(), base_url=base_url, max_retries=max_retries,
+                  http_client=httpx.Client(auth=OAuthBearer(manager)))
+
 
+def get_async_openai_client(
+    base_url: str | None = None,
+    max_retries: int = 2,
+    manager: OAuthTokenManager | None = None,
+) -> "AsyncOpenAI":
+    if AsyncOpenAI is None:
+        raise RuntimeError(
+            "openai library not available. Install with: pip install openai>=1.0.0"
+        )
+    manager = manager or token_manager()
+    return AsyncOpenAI(api_key=manager.get_valid_token(), base_url=base_url, max_retries=max_retries,
+                       http_client=httpx.AsyncClient(auth=OAuthBearer(manager)))
 
-def encode_image_as_data_url(p: Path) -> str:
+
+def encode_image_as_data_url(p: Path, profile: UploadProfile | None = None) -> str:
     mime = "image/jpeg"
     ext = p.suffix.lower()
     if ext == ".png":
@@ -62,42 +167,429 @@ def encode_image_as_data_url(p: Path) -> str:
     elif ext in (".jpg", ".jpeg"):
         mime = "image/jpeg"
 
-    b = p.read_bytes()
+    if profile is not None:
+        mime, b = profile.prepare(p, mime)
+    else:
+        b = p.read_bytes()
     b64 = base64.b64encode(b).decode("utf-8")
     return f"data:{mime};base64,{b64}"
 
 
-def analyze_image(client: "OpenAI", img_path: Path, model: str) -> Dict:
-    data_url = encode_image_as_data_url(img_path)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": data_url, "detail": "high"}},
-                    {"type": "text", "text": ANALYSIS_PROMPT},
-                ],
-            }
-        ],
-        temperature=0.2,
-        max_tokens=2000,
+def build_messages(data_url: str) -> List[Dict]:
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "image_url", "image_url": {"url": data_url, "detail": DETAIL}},
+                {"type": "text", "text": ANALYSIS_PROMPT},
+            ],
+        }
+    ]
+
+
+def supports_json_mode(model: str) -> bool:
+    return model.startswith(JSON_MODE_PREFIXES)
+
+
+def request_body(model: str, data_url: str) -> Dict:
+    """Chat completions payload shared by interactive and Batch-API modes."""
+    body = {
+        "model": model,
+        "messages": build_messages(data_url),
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS,
+    }
+    if supports_json_mode(model):
+        body["response_format"] = {"type": "json_object"}
+    return body
+
+
+def reask_body(model: str, content: str, errors: List[str], schema: Dict | None) -> Dict:
+    """Text-only request asking the model to fix its own JSON (no image re-sent)."""
+    prompt = REPAIR_PROMPT.format(
+        errors="; ".join(errors[:10]),
+        schema=json.dumps(schema, ensure_ascii=False) if schema else "(see keys in the original prompt)",
+        content=content,
     )
+    body = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0,
+        "max_tokens": MAX_TOKENS,
+    }
+    if supports_json_mode(model):
+        body["response_format"] = {"type": "json_object"}
+    return body
+
+
+def unparsed_result(content: str, img_path: Path, model: str) -> Dict:
+    return {
+        "image_analysis": {
+            "file_name": img_path.name,
+            "model": model,
+            "analysis_timestamp": datetime.utcnow().isoformat(),
+            "raw_response": content,
+            "parse_error": "Response was not valid JSON",
+        }
+    }
+
+
+def parse_and_check(
+    content: str,
+    img_path: Path,
+    model: str,
+    repairer: ResponseRepairer | None = None,
+) -> Tuple[Dict, List[str]]:
+    """(result, errors): local repairs (no API call) and schema check when a repairer is given."""
+    if repairer is None:
+        try:
+            return json.loads(content), []
+        except json.JSONDecodeError:
+            return unparsed_result(content, img_path, model), ["not valid JSON"]
+    obj, steps, errors = repairer.check(content)
+    if obj is None:
+        repairer.unrecoverable += 1
+        return unparsed_result(content, img_path, model), errors
+    if errors:
+        repairer.invalid_kept += 1
+    else:
+        repairer.record_local(steps)
+    return obj, errors
+
+
+def parse_response_content(
+    content: str,
+    img_path: Path,
+    model: str,
+    repairer: ResponseRepairer | None = None,
+) -> Dict:
+    """Parse a response, applying local repairs (no API call) when a repairer is given."""
+    return parse_and_check(content, img_path, model, repairer)[0]
+
+
+def first_pass(repairer: ResponseRepairer | None, content: str):
+    """(parsed_or_None, errors, needs_reask) after local repair only."""
+    if repairer is None:
+        try:
+            return json.loads(content), [], False
+        except json.JSONDecodeError:
+            return None, ["not valid JSON"], False
+    obj, steps, errors = repairer.check(content)
+    if obj is not None and not errors:
+        repairer.record_local(steps)
+        return obj, [], False
+    return obj, errors, repairer.max_reasks > 0
+
+
+def reask_pass(repairer: ResponseRepairer, obj, errors: List[str], new_content: str):
+    """Fold a re-ask answer in. Returns (obj, errors, done)."""
+    new_obj, _, new_errors = repairer.check(new_content)
+    if new_obj is not None and not new_errors:
+        repairer.reask_fixed += 1
+        return new_obj, [], True
+    if obj is None and new_obj is not None:
+        return new_obj, new_errors, False
+    return obj, errors, False
+
+
+def settle(repairer: ResponseRepairer | None, obj, errors: List[str], content: str, img_path: Path, model: str) -> Dict:
+    if obj is None:
+        if repairer is not None:
+            repairer.unrecoverable += 1
+        return unparsed_result(content, img_path, model)
+    if errors and repairer is not None:
+        repairer.invalid_kept += 1
+    return obj
+
+
+def sampling_params(model: str = DEFAULT_MODEL, profile: UploadProfile | None = None) -> Dict:
+    """Request parameters that change the response (part of the cache key)."""
+    params = {"temperature": TEMPERATURE, "max_tokens": MAX_TOKENS, "detail": DETAIL}
+    if supports_json_mode(model):  # as in request_body()
+        params["response_format"] = "json_object"
+    if profile is not None:
+        params["upload"] = profile.params()
+    return params
+
+
+def make_cache(
+    cache_dir: Path = DEFAULT_CACHE_DIR,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    profile: UploadProfile | None = None,
+    model: str = DEFAULT_MODEL,
+) -> ResponseCache:
+    return ResponseCache(cache_dir, max_bytes, prompt=ANALYSIS_PROMPT, params=sampling_params(model, profile))
+
+
+def cache_lookup(cache: ResponseCache | None, img_path: Path, model: str):
+    """Return (key, cached_content_or_None); key is None without a cache."""
+    if cache is None:
+        return None, None
+    key = cache.key_for(img_path, model)
+    return key, cache.get(key, upload_bytes=img_path.stat().st_size)
+
+
+def cache_store(cache: ResponseCache | None, key: str | None, obj, errors: List[str], img_path: Path, model: str):
+    """Cache a parsed answer; never pin one that failed parsing or the schema check (`errors`)."""
+    if cache is None or key is None or obj is None or errors:
+        return
+    cache.put(key, json.dumps(obj, ensure_ascii=False), {"file_name": img_path.name, "model": model})
+
+
+def create_sync(client: "OpenAI", body: Dict, policy: RetryPolicy, meter: "UsageMeter | None" = None,
+                images: int = 1):
+    """One chat completion, retried per the policy (create_async without a limiter)."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            resp = client.chat.completions.create(**body)
+        except Exception as e:
+            delay = policy.next_delay(e, attempt)
+            if delay is None:
+                e.attempts = attempt  # read by the dead-letter queue
+                raise
+            time.sleep(delay)
+            continue
+        policy.on_success(attempt)
+        break
+    if meter is not None:
+        meter.add(resp, images)
+    return resp
+
+
+def reask_estimate(body: Dict) -> int:
+    """Token estimate of a text-only re-ask, for the limiter."""
+    return len(body["messages"][0]["content"]) // 4 + MAX_TOKENS
+
+
+def analyze_image(
+    client: "OpenAI",
+    img_path: Path,
+    model: str,
+    cache: ResponseCache | None = None,
+    profile: UploadProfile | None = None,
+    policy: RetryPolicy | None = None,
+    repairer: ResponseRepairer | None = None,
+    meter: "UsageMeter | None" = None,
+) -> Dict:
+    key, cached = cache_lookup(cache, img_path, model)
+    if cached is not None:
+        return parse_response_content(cached, img_path, model)
+
+    policy = policy or RetryPolicy()
+    data_url = encode_image_as_data_url(img_path, profile)
+    resp = create_sync(client, request_body(model, data_url), policy, meter)
 
     content = resp.choices[0].message.content or "{}"
-    try:
-        parsed = json.loads(content)
-    except json.JSONDecodeError:
-        parsed = {
-            "image_analysis": {
-                "file_name": img_path.name,
-                "model": model,
-                "analysis_timestamp": datetime.utcnow().isoformat(),
-                "raw_response": content,
-                "parse_error": "Response was not valid JSON",
-            }
+    obj, errors, needs_reask = first_pass(repairer, content)
+    for _ in range(repairer.max_reasks if needs_reask else 0):
+        repairer.reasks += 1
+        try:
+            fix = create_sync(client, reask_body(model, content, errors, repairer.schema), policy, meter,
+                              images=0)
+        except Exception:
+            break  # retries exhausted: keep what we have rather than failing the image
+        obj, errors, done = reask_pass(repairer, obj, errors, fix.choices[0].message.content or "")
+        if done:
+            break
+
+    cache_store(cache, key, obj, errors, img_path, model)
+    return settle(repairer, obj, errors, content, img_path, model)
+
+
+class UsageMeter:
+    """Requests and tokens spent, to compare packed and single-image runs."""
+
+    def __init__(self):
+        self.requests = 0
+        self.images = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, resp, images: int = 1):
+        usage = getattr(resp, "usage", None)
+        self.requests += 1
+        self.images += images
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    def stats(self, elapsed_s: float | None = None) -> Dict:
+        n = max(self.images, 1)
+        out = {
+            "requests": self.requests,
+            "images": self.images,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "prompt_tokens_per_image": round(self.prompt_tokens / n, 1),
+            "completion_tokens_per_image": round(self.completion_tokens / n, 1),
         }
-    return parsed
+        if elapsed_s is not None:
+            out["wall_s_per_image"] = round(elapsed_s / n, 3)
+        return out
+
+
+async def create_async(
+    client: "AsyncOpenAI",
+    body: Dict,
+    limiter: RateLimiter | None = None,
+    policy: RetryPolicy | None = None,
+    estimated: int = 0,
+    meter: UsageMeter | None = None,
+    images: int = 1,
+):
+    """One chat completion, paced by the limiter and retried per the policy."""
+    policy = policy or RetryPolicy()
+    attempt = 0
+    while True:
+        attempt += 1
+        if limiter is not None:
+            await limiter.acquire(estimated)
+        try:
+            resp = await client.chat.completions.create(**body)
+        except Exception as e:
+            delay = policy.next_delay(e, attempt)
+            if delay is None:
+                e.attempts = attempt  # read by the dead-letter queue
+                raise
+            if limiter is not None and classify(e) == RATE_LIMIT:
+                # The limiter pauses every worker for Retry-After; no extra sleep
+                limiter.on_rate_limited(retry_after_of(e))
+                continue
+            await asyncio.sleep(delay)
+            continue
+        policy.on_success(attempt)
+        break
+
+    if limiter is not None:
+        limiter.on_success()
+        usage = getattr(resp, "usage", None)
+        limiter.record_usage(estimated, getattr(usage, "total_tokens", None))
+    if meter is not None:
+        meter.add(resp, images)
+    return resp
+
+
+async def analyze_image_async(
+    client: "AsyncOpenAI",
+    img_path: Path,
+    model: str,
+    limiter: RateLimiter | None = None,
+    cache: ResponseCache | None = None,
+    profile: UploadProfile | None = None,
+    policy: RetryPolicy | None = None,
+    repairer: ResponseRepairer | None = None,
+    meter: "UsageMeter | None" = None,
+) -> Dict:
+    key, cached = await asyncio.to_thread(cache_lookup, cache, img_path, model)
+    if cached is not None:
+        return parse_response_content(cached, img_path, model)
+
+    # Encoding (and resizing) is blocking work; keep it off the event loop
+    data_url = await asyncio.to_thread(encode_image_as_data_url, img_path, profile)
+    estimated = 0
+    if limiter is not None:
+        estimated = await asyncio.to_thread(estimate_request_tokens, ANALYSIS_PROMPT, img_path, MAX_TOKENS)
+
+    resp = await create_async(client, request_body(model, data_url), limiter, policy, estimated, meter)
+    content = resp.choices[0].message.content or "{}"
+    obj, errors, needs_reask = first_pass(repairer, content)
+    for _ in range(repairer.max_reasks if needs_reask else 0):
+        repairer.reasks += 1
+        body = reask_body(model, content, errors, repairer.schema)
+        try:
+            fix = await create_async(client, body, limiter, policy, reask_estimate(body), meter, images=0)
+        except Exception:
+            break  # retries exhausted: keep what we have rather than failing the image
+        obj, errors, done = reask_pass(repairer, obj, errors, fix.choices[0].message.content or "")
+        if done:
+            break
+
+    await asyncio.to_thread(cache_store, cache, key, obj, errors, img_path, model)
+    return settle(repairer, obj, errors, content, img_path, model)
+
+
+def pack_key(img_path: Path) -> Tuple:
+    """(zone, category) from the NameGen file_ID; images without one are never packed."""
+    m = FILE_ID_RX.match(img_path.name)
+    if not m:
+        return ("single", img_path.as_posix())
+    return ("zone_cat", img_path.parent.as_posix(), m.group(1), m.group(2))
+
+
+def group_for_packing(images: List[Path], pack_size: int) -> List[List[Path]]:
+    """Split images into packs of at most `pack_size` sharing (zone, category)."""
+    groups: Dict[Tuple, List[Path]] = {}
+    for img in images:
+        groups.setdefault(pack_key(img), []).append(img)
+    size = max(1, pack_size)
+    return [members[i:i + size] for members in groups.values() for i in range(0, len(members), size)]
+
+
+def pack_labels(pack: List[Path]) -> List[str]:
+    return [f"image_{i + 1}" for i in range(len(pack))]
+
+
+def packed_request_body(model: str, pack: List[Path], data_urls: List[str]) -> Dict:
+    labels = pack_labels(pack)
+    content = []
+    for label, img, url in zip(labels, pack, data_urls):
+        content.append({"type": "text", "text": f"{label}: {img.name}"})
+        content.append({"type": "image_url", "image_url": {"url": url, "detail": DETAIL}})
+    content.append({"type": "text", "text": PACKED_PROMPT.format(n=len(pack), labels=", ".join(labels)) + ANALYSIS_PROMPT})
+    body = {
+        "model": model,
+        "messages": [{"role": "user", "content": content}],
+        "temperature": TEMPERATURE,
+        "max_tokens": min(MAX_TOKENS * len(pack), MAX_PACKED_TOKENS),
+    }
+    if supports_json_mode(model):
+        body["response_format"] = {"type": "json_object"}
+    return body
+
+
+def split_packed_content(
+    content: str,
+    pack: List[Path],
+    model: str,
+    repairer: ResponseRepairer | None = None,
+) -> Dict[Path, Tuple[Dict, List[str]] | Exception]:
+    """Per-image (result, errors) as parse_and_check(), or the exception explaining why it is missing.
+
+    Only local repairs are applied; a missing entry fails that image alone
+    (and --retry-failed sends it again unpacked).
+    """
+    obj, _ = repair_json(content)
+    out: Dict[Path, Tuple[Dict, List[str]] | Exception] = {}
+    for label, img in zip(pack_labels(pack), pack):
+        part = obj.get(label) if isinstance(obj, dict) else None
+        if isinstance(part, dict):
+            out[img] = parse_and_check(json.dumps(part, ensure_ascii=False), img, model, repairer)
+        else:
+            out[img] = ValueError(f"Packed response has no '{label}' object for {img.name}")
+    return out
+
+
+async def analyze_pack_async(
+    client: "AsyncOpenAI",
+    pack: List[Path],
+    model: str,
+    limiter: RateLimiter | None = None,
+    profile: UploadProfile | None = None,
+    policy: RetryPolicy | None = None,
+    repairer: ResponseRepairer | None = None,
+    meter: UsageMeter | None = None,
+) -> Dict[Path, Tuple[Dict, List[str]] | Exception]:
+    """Send the whole pack in one request and split the answer per image."""
+    data_urls = [await asyncio.to_thread(encode_image_as_data_url, img, profile) for img in pack]
+    body = packed_request_body(model, pack, data_urls)
+    estimated = 0
+    if limiter is not None:
+        for img in pack:
+            estimated += await asyncio.to_thread(estimate_request_tokens, "", img, 0)
+        estimated += len(PACKED_PROMPT + ANALYSIS_PROMPT) // 4 + body["max_tokens"]
+    resp = await create_async(client, body, limiter, policy, estimated, meter, images=len(pack))
+    return split_packed_content(resp.choices[0].message.content or "{}", pack, model, repairer)
 
 
 def collect_images(images_dir: Path, pattern: str | None = None, limit: int | None = None) -> List[Path]:
@@ -113,12 +605,319 @@ def collect_images(images_dir: Path, pattern: str | None = None, limit: int | No
 
 
 def save_result(output_dir: Path, img_path: Path, result: Dict):
-    output_dir.mkdir(parents=True, exist_ok=True)
     out_path = output_dir / f"{img_path.stem}_analysis.json"
-    out_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    atomic_write_text(out_path, json.dumps(result, ensure_ascii=False, indent=2))
     return out_path
 
 
+def save_error(output_dir: Path, img_path: Path, error: Exception) -> Path:
+    err_path = output_dir / f"{img_path.stem}_error.txt"
+    atomic_write_text(err_path, str(error))
+    return err_path
+
+
+def select_pending(
+    images: List[Path],
+    output_dir: Path,
+    overwrite: bool,
+    journal: RunJournal | None = None,
+) -> List[Path]:
+    """Drop images whose analysis already exists (unless overwriting).
+
+    With a journal, its recorded state decides; only images it has never
+    seen are checked on disk (and recorded as succeeded if done).
+    """
+    pending = []
+    for img in images:
+        if overwrite:
+            pending.append(img)
+            continue
+        state = journal.state_of(img.as_posix()) if journal is not None else None
+        if state is None:
+            out_file = output_dir / f"{img.stem}_analysis.json"
+            done = out_file.exists()
+            if done and journal is not None:
+                journal.record(img.as_posix(), "succeeded")
+        else:
+            done = state == "succeeded"
+        if done:
+            print(f"- Skip (exists): {img.name}")
+            continue
+        pending.append(img)
+    return pending
+
+
+def _journal(journal: RunJournal | None, img: Path, state: str, error: str | None = None):
+    if journal is not None:
+        journal.record(img.as_posix(), state, error)
+
+
+def _succeeded(journal: RunJournal | None, dead_letters: DeadLetterQueue | None, img: Path):
+    _journal(journal, img, "succeeded")
+    if dead_letters is not None:
+        dead_letters.resolve(img)
+
+
+def _failed(
+    journal: RunJournal | None,
+    dead_letters: DeadLetterQueue | None,
+    output_dir: Path,
+    img: Path,
+    e: Exception,
+):
+    err_path = save_error(output_dir, img, e)
+    _journal(journal, img, "failed", str(e))
+    if dead_letters is not None:
+        dead_letters.add(img, e, getattr(e, "attempts", 1))
+    print(f"  ! Error: {e} (logged to {err_path.name})")
+
+
+async def _journal_async(journal: RunJournal | None, img: Path, state: str, error: str | None = None):
+    if journal is not None:
+        await journal.record_async(img.as_posix(), state, error)
+
+
+async def _succeeded_async(journal: RunJournal | None, dead_letters: DeadLetterQueue | None, img: Path):
+    """_succeeded() for the async runners: file I/O runs off the event loop."""
+    await _journal_async(journal, img, "succeeded")
+    if dead_letters is not None:
+        await asyncio.to_thread(dead_letters.resolve, img)
+
+
+async def _failed_async(
+    journal: RunJournal | None,
+    dead_letters: DeadLetterQueue | None,
+    output_dir: Path,
+    img: Path,
+    e: Exception,
+):
+    """_failed() for the async runners: file I/O runs off the event loop."""
+    err_path = await asyncio.to_thread(save_error, output_dir, img, e)
+    await _journal_async(journal, img, "failed", str(e))
+    if dead_letters is not None:
+        await asyncio.to_thread(dead_letters.add, img, e, getattr(e, "attempts", 1))
+    print(f"  ! Error: {e} (logged to {err_path.name})")
+
+
+def run_batch(
+    client: "OpenAI",
+    images: List[Path],
+    output_dir: Path,
+    model: str,
+    cache: ResponseCache | None = None,
+    profile: UploadProfile | None = None,
+    journal: RunJournal | None = None,
+    policy: RetryPolicy | None = None,
+    dead_letters: DeadLetterQueue | None = None,
+    repairer: ResponseRepairer | None = None,
+    meter: UsageMeter | None = None,
+) -> int:
+    """Analyze images one at a time. Returns the number processed."""
+    processed = 0
+    for img in images:
+        print(f"- Analyzing: {img.name}")
+        _journal(journal, img, "sent")
+        try:
+            result = analyze_image(client, img, model, cache, profile, policy, repairer, meter)
+            save_result(output_dir, img, result)
+            _succeeded(journal, dead_letters, img)
+            processed += 1
+        except Exception as e:
+            _failed(journal, dead_letters, output_dir, img, e)
+    return processed
+
+
+async def run_batch_async(
+    client: "AsyncOpenAI",
+    images: List[Path],
+    output_dir: Path,
+    model: str,
+    concurrency: int = 4,
+    limiter: RateLimiter | None = None,
+    cache: ResponseCache | None = None,
+    profile: UploadProfile | None = None,
+    journal: RunJournal | None = None,
+    policy: RetryPolicy | None = None,
+    dead_letters: DeadLetterQueue | None = None,
+    repairer: ResponseRepairer | None = None,
+    meter: UsageMeter | None = None,
+) -> int:
+    """Analyze images with at most `concurrency` requests in flight.
+
+    Each result is written as soon as its request completes, so an
+    interrupted run keeps everything finished so far.
+    """
+    policy = policy or RetryPolicy()  # one retry budget for all workers
+    queue: asyncio.Queue = asyncio.Queue()
+    for img in images:
+        queue.put_nowait(img)
+    processed = 0
+
+    async def worker():
+        nonlocal processed
+        while True:
+            try:
+                img = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            print(f"- Analyzing: {img.name}")
+            _journal(journal, img, "sent")
+            try:
+                result = await analyze_image_async(
+                    client, img, model, limiter, cache, profile, policy, repairer, meter,
+                )
+                await asyncio.to_thread(save_result, output_dir, img, result)
+                await _succeeded_async(journal, dead_letters, img)
+                processed += 1
+            except Exception as e:
+                await _failed_async(journal, dead_letters, output_dir, img, e)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    await asyncio.gather(*workers)
+    return processed
+
+
+async def run_packed_async(
+    client: "AsyncOpenAI",
+    images: List[Path],
+    output_dir: Path,
+    model: str,
+    pack_size: int = 3,
+    concurrency: int = 4,
+    limiter: RateLimiter | None = None,
+    cache: ResponseCache | None = None,
+    profile: UploadProfile | None = None,
+    journal: RunJournal | None = None,
+    policy: RetryPolicy | None = None,
+    dead_letters: DeadLetterQueue | None = None,
+    repairer: ResponseRepairer | None = None,
+    meter: UsageMeter | None = None,
+) -> int:
+    """Like run_batch_async, with up to `pack_size` related images per request.
+
+    Cache hits are written first and only the misses are packed; each
+    image's share of a packed answer is cached under its own key.
+    """
+    policy = policy or RetryPolicy()
+    processed = 0
+    keys = {}
+    misses = []
+    for img in images:
+        key, cached = await asyncio.to_thread(cache_lookup, cache, img, model)
+        if cached is None:
+            keys[img] = key
+            misses.append(img)
+            continue
+        await asyncio.to_thread(save_result, output_dir, img, parse_response_content(cached, img, model))
+        await _succeeded_async(journal, dead_letters, img)
+        processed += 1
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for pack in group_for_packing(misses, pack_size):
+        queue.put_nowait(pack)
+
+    async def worker():
+        nonlocal processed
+        while True:
+            try:
+                pack = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            print(f"- Analyzing pack: {', '.join(img.name for img in pack)}")
+            for img in pack:
+                _journal(journal, img, "sent")
+            try:
+                results = await analyze_pack_async(client, pack, model, limiter, profile, policy, repairer, meter)
+            except Exception as e:
+                results = {img: e for img in pack}
+            for img, result in results.items():
+                if isinstance(result, Exception):
+                    await _failed_async(journal, dead_letters, output_dir, img, result)
+                    continue
+                result, errors = result
+                await asyncio.to_thread(cache_store, cache, keys[img], result, errors, img, model)
+                await asyncio.to_thread(save_result, output_dir, img, result)
+                await _succeeded_async(journal, dead_letters, img)
+                processed += 1
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    await asyncio.gather(*workers)
+    return processed
+
+
+def submit_batch(
+    client: "OpenAI",
+    images: List[Path],
+    output_dir: Path,
+    model: str,
+    state_path: Path,
+    cache: ResponseCache | None = None,
+    profile: UploadProfile | None = None,
+    max_shard_bytes: int = MAX_SHARD_BYTES,
+    journal: RunJournal | None = None,
+) -> Dict:
+    """Pack pending images into Batch-API JSONL shards and submit them.
+
+    Cache hits are written immediately; images already awaiting a batch
+    are not submitted twice.
+    """
+    state = BatchState(state_path)
+    in_flight = state.submitted_ids()
+    lines = []
+    meta = {}
+    cached = 0
+    for img in images:
+        cid = img.as_posix()
+        if cid in in_flight:
+            print(f"- Skip (in batch): {img.name}")
+            continue
+        key, content = cache_lookup(cache, img, model)
+        if content is not None:
+            save_result(output_dir, img, parse_response_content(content, img, model))
+            _journal(journal, img, "succeeded")
+            cached += 1
+            continue
+        data_url = encode_image_as_data_url(img, profile)
+        lines.append((cid, request_line(cid, request_body(model, data_url))))
+        meta[cid] = {"image": cid, "model": model, "cache_key": key}
+
+    batch_ids = []
+    if lines:
+        shards = shard_lines(lines, max_bytes=max_shard_bytes)
+        batch_ids = submit_shards(client, shards, meta, output_dir / "batch", state)
+        for cid, _ in lines:
+            _journal(journal, Path(cid), "sent")
+    return {"submitted": len(lines), "cached": cached, "batch_ids": batch_ids}
+
+
+def collect_batch(
+    client: "OpenAI",
+    output_dir: Path,
+    state_path: Path,
+    cache: ResponseCache | None = None,
+    journal: RunJournal | None = None,
+    repairer: ResponseRepairer | None = None,
+) -> Dict:
+    """Split finished batch outputs into <stem>_analysis.json / _error.txt files."""
+    state = BatchState(state_path)
+    processed = failed = 0
+    for meta, cid, body, error in iter_finished_results(client, state):
+        img = Path(meta["image"])
+        if body is not None:
+            content = body["choices"][0]["message"]["content"] or "{}"
+            result, errors = parse_and_check(content, img, meta["model"], repairer)
+            cache_store(cache, meta.get("cache_key"), result, errors, img, meta["model"])
+            save_result(output_dir, img, result)
+            _journal(journal, img, "succeeded")
+            processed += 1
+        else:
+            save_error(output_dir, img, RuntimeError(error))
+            _journal(journal, img, "failed", error)
+            print(f"  ! Error: {img.name} (logged to {img.stem}_error.txt)")
+            failed += 1
+    return {"processed": processed, "failed": failed, "jobs_pending": len(state.pending_jobs())}
+
+
 def main():
     parser = argparse.ArgumentParser(description="Batch GPT-4o vision analysis with OAuth.")
     parser.add_argument("--images-dir", type=Path, default=DEFAULT_IMAGES_DIR, help="Folder with images.")
@@ -127,52 +926,184 @@ def main():
     parser.add_argument("--pattern", type=str, default=None, help="Glob filter (e.g., *.jpg).")
     parser.add_argument("--limit", type=int, default=None, help="Limit number of images.")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing outputs.")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Requests kept in flight; >1 switches to the async client.")
+    parser.add_argument("--base-url", type=str, default=None,
+                        help="Override the API base URL (e.g., a local stub server).")
+    parser.add_argument("--rpm", type=float, default=None, help="Requests-per-minute budget.")
+    parser.add_argument("--tpm", type=float, default=None,
+                        help="Estimated tokens-per-minute budget (prompt + image tiles + max_tokens).")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache.")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Response cache folder.")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Cache size cap in MB (LRU eviction).")
+    parser.add_argument("--upload", choices=["original", "resized"], default="original",
+                        help="Send files as-is, or EXIF-rotated, downscaled and re-encoded.")
+    parser.add_argument("--upload-max-side", type=int, default=PROVIDER_MAX_SIDE, help="Resized long side cap (px).")
+    parser.add_argument("--upload-short-side", type=int, default=PROVIDER_SHORT_SIDE,
+                        help="Resized short side cap (px, 0 = none); default matches the high-detail tile grid.")
+    parser.add_argument("--upload-format", choices=["jpeg", "webp"], default="jpeg", help="Re-encoding format.")
+    parser.add_argument("--upload-quality", type=int, default=85, help="Re-encoding quality.")
+    parser.add_argument("--use-previews", action="store_true",
+                        help="Reuse fresh WebP previews (make_previews_and_augment_json.py) when they cover the target size.")
+    parser.add_argument("--preview-dir", type=Path, default=DEFAULT_PREVIEW_DIR, help="Preview folder.")
+    parser.add_argument("--mode", choices=["interactive", "batch", "collect"], default="interactive",
+                        help="interactive: chat completions now; batch: submit Batch-API jobs; "
+                             "collect: fetch finished jobs into *_analysis.json.")
+    parser.add_argument("--batch-state", type=Path, default=None,
+                        help="Batch job state file (default: <output-dir>/batch_state.json).")
+    parser.add_argument("--journal", type=Path, default=None,
+                        help="Run journal file (default: <output-dir>/journal.jsonl).")
+    parser.add_argument("--max-attempts", type=int, default=4, help="Attempts per image for transient errors.")
+    parser.add_argument("--retry-budget", type=int, default=None, help="Max retries for the whole run.")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Reprocess only the images in <output-dir>/dead_letter.")
+    parser.add_argument("--schema", type=Path, default=DEFAULT_SCHEMA_PATH,
+                        help="JSON schema responses are validated against (setup_pipeline.py).")
+    parser.add_argument("--max-reasks", type=int, default=1,
+                        help="Paid re-asks when local JSON repair cannot produce a valid answer (0 = never).")
+    parser.add_argument("--pack", type=int, default=1,
+                        help="Images of one zone/category sent per request (1 = no packing).")
+    parser.add_argument("--max-shard-mb", type=float, default=MAX_SHARD_BYTES / (1024 * 1024),
+                        help="Batch input file size limit in MB.")
     args = parser.parse_args()
 
-    if not args.images_dir.exists():
-        print(f"Images directory not found: {args.images_dir}")
-        return 1
-
-    client = get_openai_client()
-    images = collect_images(args.images_dir, args.pattern, args.limit)
-    if not images:
-        print("No images found to process.")
+    state_path = args.batch_state or (args.output_dir / "batch_state.json")
+    repairer = ResponseRepairer(load_schema(args.schema), max_reasks=args.max_reasks)
+    journal = RunJournal(args.journal or (args.output_dir / "journal.jsonl"))
+    if journal.replayed > len(journal.states):
+        journal.compact()
+    if args.mode == "collect":
+        cache = None if args.no_cache else make_cache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024), model=args.model)
+        summary = collect_batch(
+            get_openai_client(args.base_url), args.output_dir, state_path, cache, journal, repairer,
+        )
+        index = {
+            "model": args.model,
+            "mode": "collect",
+            "output_dir": str(args.output_dir),
+            "count_processed": summary["processed"],
+            "count_failed": summary["failed"],
+            "jobs_pending": summary["jobs_pending"],
+            "journal": journal.summary(),
+            "json_repair": repairer.stats(),
+            "timestamp_utc": datetime.utcnow().isoformat(),
+        }
+        atomic_write_text(args.output_dir / "index.json", json.dumps(index, indent=2))
+        journal.close()
+        print(f"Collected {summary['processed']} result(s), {summary['failed']} error(s); "
+              f"{summary['jobs_pending']} job(s) still pending.")
         return 0
 
-    print(f"Found {len(images)} image(s). Writing results to: {args.output_dir}")
+    dead_letters = DeadLetterQueue(args.output_dir / "dead_letter")
+    policy = RetryPolicy(max_attempts=args.max_attempts, budget=args.retry_budget)
+    if args.retry_failed:
+        images = [p for p in dead_letters.images() if p.exists()]
+        if not images:
+            print("Dead-letter queue is empty.")
+            return 0
+        print(f"Retrying {len(images)} dead-lettered image(s). Writing results to: {args.output_dir}")
+        pending = images
+    else:
+        if not args.images_dir.exists():
+            print(f"Images directory not found: {args.images_dir}")
+            return 1
 
-    processed = 0
-    for img in images:
-        out_file = args.output_dir / f"{img.stem}_analysis.json"
-        if out_file.exists() and not args.overwrite:
-            print(f"- Skip (exists): {img.name}")
-            continue
+        images = collect_images(args.images_dir, args.pattern, args.limit)
+        if not images:
+            print("No images found to process.")
+            return 0
 
-        print(f"- Analyzing: {img.name}")
-        try:
-            result = analyze_image(client, img, args.model)
-            save_result(args.output_dir, img, result)
-            processed += 1
-        except Exception as e:
-            err_path = args.output_dir / f"{img.stem}_error.txt"
-            err_path.write_text(str(e), encoding="utf-8")
-            print(f"  ! Error: {e} (logged to {err_path.name})")
+        print(f"Found {len(images)} image(s). Writing results to: {args.output_dir}")
+
+        pending = select_pending(images, args.output_dir, args.overwrite, journal)
+    journal.record_many([img.as_posix() for img in pending], "queued")
+    started = time.perf_counter()
+    profile = None
+    if args.upload == "resized":
+        profile = UploadProfile(
+            max_side=args.upload_max_side,
+            short_side=args.upload_short_side or None,
+            fmt=args.upload_format,
+            quality=args.upload_quality,
+            preview_dir=args.preview_dir if args.use_previews else None,
+            images_dir=args.images_dir,
+        )
+    cache = None
+    if not args.no_cache:
+        cache = make_cache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024), profile, args.model)
+    meter = UsageMeter()
+    limiter = None
+    if args.rpm or args.tpm:
+        limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
+    if args.mode == "batch":
+        summary = submit_batch(
+            get_openai_client(args.base_url), pending, args.output_dir, args.model, state_path,
+            cache, profile, int(args.max_shard_mb * 1024 * 1024), journal,
+        )
+        processed = summary["cached"]
+        print(f"Submitted {summary['submitted']} request(s) in {len(summary['batch_ids'])} batch(es); "
+              f"run again with --mode collect once they finish.")
+    elif args.pack > 1:
+        client = get_async_openai_client(args.base_url, max_retries=0)
+        processed = asyncio.run(run_packed_async(
+            client, pending, args.output_dir, args.model, args.pack, args.concurrency,
+            limiter, cache, profile, journal, policy, dead_letters, repairer, meter,
+        ))
+    elif args.concurrency > 1 or limiter is not None:
+        # Retries are ours (RetryPolicy); keep the SDK from retrying too
+        client = get_async_openai_client(args.base_url, max_retries=0)
+        processed = asyncio.run(run_batch_async(
+            client, pending, args.output_dir, args.model, args.concurrency,
+            limiter, cache, profile, journal, policy, dead_letters, repairer, meter,
+        ))
+    else:
+        client = get_openai_client(args.base_url, max_retries=0)
+        processed = run_batch(
+            client, pending, args.output_dir, args.model, cache, profile, journal, policy, dead_letters,
+            repairer, meter,
+        )
+    elapsed = time.perf_counter() - started
 
     # Optional index
     index = {
         "model": args.model,
+        "mode": args.mode,
         "images_dir": str(args.images_dir),
         "output_dir": str(args.output_dir),
         "count_found": len(images),
         "count_processed": processed,
+        "concurrency": args.concurrency,
+        "pack": args.pack,
+        "elapsed_s": round(elapsed, 3),
+        "rate_limiter": limiter.stats() if limiter else None,
+        "cache": cache.stats() if cache else None,
+        "upload": profile.stats() if profile else None,
+        "journal": journal.summary(),
+        "retries": policy.stats(),
+        "json_repair": repairer.stats(),
+        "dead_letters": len(dead_letters.images()),
+        "usage": meter.stats(elapsed),
         "timestamp_utc": datetime.utcnow().isoformat(),
     }
-    (args.output_dir / "index.json").write_text(json.dumps(index, indent=2), encoding="utf-8")
+    atomic_write_text(args.output_dir / "index.json", json.dumps(index, indent=2))
+    journal.close()
 
-    print(f"Done. Processed {processed}/{len(images)} image(s).")
+    print(f"Done. Processed {processed}/{len(images)} image(s) in {elapsed:.1f}s.")
+    if limiter is not None:
+        print(f"Rate limiter: {json.dumps(limiter.stats())}")
+    if cache is not None:
+        print(cache.report())
+    if profile is not None:
+        print(profile.report())
+    print(repairer.report())
+    if meter.requests:
+        usage = meter.stats(elapsed)
+        print(f"Usage: {usage['requests']} request(s) for {usage['images']} image(s); per image "
+              f"{usage['prompt_tokens_per_image']} prompt + {usage['completion_tokens_per_image']} "
+              f"completion tokens, {usage['wall_s_per_image']}s")
     return 0
 
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
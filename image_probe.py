@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Header-only image probe: size and EXIF orientation without decoding pixels.
+
+- JPEG: markers are walked up to the SOFn frame header; only an Exif APP1
+  segment is read, every other segment is skipped with a seek
+- PNG: IHDR, plus an eXIf chunk if one precedes the image data
+- WebP: VP8X canvas, or the VP8 / VP8L frame header; EXIF chunk if flagged
+- TIFF: IFD0 width, length and orientation (size transposed for 5-8, as
+  PIL does for TIFF only)
+- probe() reads a few KB per file and returns None for anything it does
+  not understand; image_info() then falls back to PIL (header read only)
+- Values match PIL's: im.size (stored, not rotated), im.format and
+  im.getexif().get(0x0112)
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+ORIENTATION_TAG = 0x0112
+# EXIF orientations 5-8 store the image rotated by 90 degrees
+TRANSPOSED = (5, 6, 7, 8)
+# Frame headers: SOF0-SOF15 minus DHT (C4), JPG (C8) and DAC (CC)
+JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Prefix of a JPEG Exif APP1 segment (also found in some WebP / PNG EXIF chunks)
+EXIF_HEADER = b"Exif\x00\x00"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff")
+
+# (width, height, EXIF orientation or None, PIL format name)
+ImageInfo = Tuple[int, int, Optional[int], str]
+
+
+def oriented_size(width: int, height: int, orientation: Optional[int]) -> Tuple[int, int]:
+    """Displayed size once the EXIF orientation is applied."""
+    return (height, width) if orientation in TRANSPOSED else (width, height)
+
+
+def displayed_size(info: ImageInfo) -> Tuple[int, int]:
+    """Displayed size of a probed image (PIL's TIFF sizes are already transposed)."""
+    width, height, orientation, fmt = info
+    return (width, height) if fmt == "TIFF" else oriented_size(width, height, orientation)
+
+
+def _tiff_tags(read_at: Callable[[int, int], bytes], wanted=(256, 257, ORIENTATION_TAG)) -> Dict[int, int]:
+    """Single-valued SHORT/LONG tags of IFD0 from a TIFF stream."""
+    head = read_at(0, 8)
+    if head[:4] == b"II*\x00":
+        order = "<"
+    elif head[:4] == b"MM\x00*":
+        order = ">"
+    else:
+        return {}
+    (offset,) = struct.unpack(order + "I", head[4:8])
+    raw = read_at(offset, 2)
+    if len(raw) < 2:
+        return {}
+    (count,) = struct.unpack(order + "H", raw)
+    entries = read_at(offset + 2, 12 * count)
+    tags = {}
+    for i in range(len(entries) // 12):
+        tag, typ, n = struct.unpack(order + "HHI", entries[i * 12:i * 12 + 8])
+        if tag in wanted and n == 1:
+            value = entries[i * 12 + 8:i * 12 + 12]
+            if typ == 3:  # SHORT
+                tags[tag] = struct.unpack(order + "H", value[:2])[0]
+            elif typ == 4:  # LONG
+                tags[tag] = struct.unpack(order + "I", value)[0]
+    return tags
+
+
+def _exif_orientation(data: bytes) -> Optional[int]:
+    if data.startswith(EXIF_HEADER):
+        data = data[len(EXIF_HEADER):]
+    return _tiff_tags(lambda o, n: data[o:o + n], (ORIENTATION_TAG,)).get(ORIENTATION_TAG)
+
+
+def _probe_jpeg(f) -> Optional[ImageInfo]:
+    orientation = None
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            return None
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        m = marker[0]
+        if m == 0x01 or 0xD0 <= m <= 0xD8:  # standalone markers
+            continue
+        if m in (0xD9, 0xDA):  # end of image / scan data before any frame header
+            return None
+        raw = f.read(2)
+        if len(raw) < 2:
+            return None
+        length = struct.unpack(">H", raw)[0] - 2
+        if m in JPEG_SOF:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height, orientation, "JPEG"
+        if m == 0xE1 and orientation is None:
+            data = f.read(length)
+            if data.startswith(EXIF_HEADER):
+                orientation = _exif_orientation(data)
+        else:
+            f.seek(length, 1)
+
+
+def _probe_png(f) -> Optional[ImageInfo]:
+    f.seek(8)
+    head = f.read(24)
+    if len(head) < 24 or head[4:8] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[8:16])
+    orientation = None
+    f.seek(8 + 8 + struct.unpack(">I", head[:4])[0] + 4)
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8 or chunk[4:8] in (b"IDAT", b"IEND"):
+            break
+        size = struct.unpack(">I", chunk[:4])[0]
+        if chunk[4:8] == b"eXIf":
+            orientation = _exif_orientation(f.read(size))
+            break
+        f.seek(size + 4, 1)  # data + CRC
+    return width, height, orientation, "PNG"
+
+
+def _probe_webp(f) -> Optional[ImageInfo]:
+    f.seek(12)
+    size = None
+    has_exif = False
+    orientation = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        fourcc, length = chunk[:4], struct.unpack("<I", chunk[4:8])[0]
+        if fourcc == b"VP8X":
+            data = f.read(10)
+            has_exif = bool(data[0] & 0x08)
+            size = (1 + int.from_bytes(data[4:7], "little"), 1 + int.from_bytes(data[7:10], "little"))
+            f.seek(length - 10 + (length & 1), 1)
+            continue
+        if fourcc == b"VP8 " and size is None:
+            data = f.read(10)
+            if data[3:6] != b"\x9d\x01\x2a":
+                return None
+            w, h = struct.unpack("<HH", data[6:10])
+            size = (w & 0x3FFF, h & 0x3FFF)
+            f.seek(length - 10 + (length & 1), 1)
+        elif fourcc == b"VP8L" and size is None:
+            data = f.read(5)
+            if data[:1] != b"\x2f":
+                return None
+            bits = int.from_bytes(data[1:5], "little")
+            size = (1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF))
+            f.seek(length - 5 + (length & 1), 1)
+        elif fourcc == b"EXIF":
+            orientation = _exif_orientation(f.read(length))
+            break
+        else:
+            f.seek(length + (length & 1), 1)
+        if size is not None and not has_exif:
+            break
+    if size is None:
+        return None
+    return size[0], size[1], orientation, "WEBP"
+
+
+def _probe_tiff(f) -> Optional[ImageInfo]:
+    def read_at(offset: int, n: int) -> bytes:
+        f.seek(offset)
+        return f.read(n)
+
+    tags = _tiff_tags(read_at)
+    if 256 not in tags or 257 not in tags:
+        return None
+    orientation = tags.get(ORIENTATION_TAG)
+    # PIL reports TIFF sizes already transposed for orientations 5-8
+    width, height = oriented_size(tags[256], tags[257], orientation)
+    return width, height, orientation, "TIFF"
+
+
+def probe(path) -> Optional[ImageInfo]:
+    """(width, height, orientation, format) from the file header, or None."""
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            if magic[:3] == b"\xff\xd8\xff":
+                return _probe_jpeg(f)
+            if magic[:8] == b"\x89PNG\r\n\x1a\n":
+                return _probe_png(f)
+            if magic[:4] == b"RIFF" and magic[8:12] == b"WEBP":
+                return _probe_webp(f)
+            if magic[:4] in (b"II*\x00", b"MM\x00*"):
+                return _probe_tiff(f)
+    except (OSError, struct.error, IndexError):
+        pass
+    return None
+
+
+def pil_info(path) -> Optional[ImageInfo]:
+    """The same fields through PIL (header read only, no pixel decode)."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as im:
+            try:
+                orientation = im.getexif().get(ORIENTATION_TAG)
+            except Exception:
+                orientation = None
+            return im.size[0], im.size[1], orientation, im.format
+    except Exception:
+        return None
+
+
+def image_info(path) -> Optional[ImageInfo]:
+    """probe(), falling back to PIL for formats and files it cannot parse."""
+    return probe(path) or pil_info(path)
+
+
+def _image_files(root: Path) -> List[Path]:
+    if root.is_file():
+        return [root]
+    return sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_EXTS)
+
+
+def _rate(fn, paths: List[Path], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for p in paths:
+            fn(p)
+        best = min(best, time.perf_counter() - start)
+    return len(paths) / best if best > 0 else float("inf")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Header-only image size / EXIF orientation probe")
+    parser.add_argument("path", type=Path, help="Image file or directory")
+    parser.add_argument("--bench", action="store_true",
+                        help="Compare files/second with the PIL path and report disagreements")
+    parser.add_argument("--repeat", type=int, default=3, help="Benchmark passes (best one counts)")
+    args = parser.parse_args(argv)
+
+    paths = _image_files(args.path)
+    if not args.bench:
+        for p in paths:
+            info = image_info(p)
+            print(json.dumps({"path": str(p), "width": info[0] if info else None,
+                              "height": info[1] if info else None,
+                              "orientation": info[2] if info else None,
+                              "format": info[3] if info else None}))
+        return 0
+
+    mismatches = [str(p) for p in paths if probe(p) is not None and probe(p) != pil_info(p)]
+    fallbacks = sum(1 for p in paths if probe(p) is None)
+    probe_rate = _rate(probe, paths, args.repeat)
+    pil_rate = _rate(pil_info, paths, args.repeat) if Image is not None else 0.0
+    total = sum(os.path.getsize(p) for p in paths)
+    print(f"{len(paths)} files, {total / 1e6:.1f} MB")
+    print(f"  header probe: {probe_rate:10.0f} files/s")
+    if Image is not None:
+        print(f"  PIL open:     {pil_rate:10.0f} files/s  (x{probe_rate / pil_rate:.1f})")
+    print(f"  PIL fallbacks: {fallbacks}, disagreements with PIL: {len(mismatches)}")
+    for p in mismatches:
+        print(f"    {p}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Local repair and validation of JSON returned by vision models.
+
+Repairs are tried in order, cheapest first:
+- parse as-is
+- strip Markdown code fences / prose around the outermost object
+- drop trailing commas before } or ]
+- cut a truncated answer back to its last complete value and close it
+
+validate() checks the result against a JSON schema (the subset used by
+the ArBot pack: type, required, properties, items, enum, minimum, maximum).
+"""
+
+import re
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+FENCE_RX = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.S)
+
+
+def strip_code_fences(text: str) -> str:
+    m = FENCE_RX.search(text)
+    if m:
+        text = m.group(1)
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end > start:
+        return text[start:end + 1]
+    if start != -1:
+        return text[start:]  # truncated: no closing brace at all
+    return text
+
+
+def remove_trailing_commas(text: str) -> str:
+    out = []
+    in_str = esc = False
+    for ch in text:
+        if in_str:
+            out.append(ch)
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "}]":
+            # drop a comma (and whitespace) right before the closer
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+        out.append(ch)
+    return "".join(out)
+
+
+def close_truncated(text: str) -> str:
+    """Cut back to the last fully closed value and close the open brackets."""
+    stack: List[str] = []
+    in_str = esc = False
+    last_cut: Optional[Tuple[int, List[str]]] = None
+    for i, ch in enumerate(text):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            last_cut = (i + 1, list(stack))
+            if not stack:
+                return text[:i + 1]
+    if last_cut is None:
+        return text
+    cut, open_ = last_cut
+    head = text[:cut].rstrip().rstrip(",")
+    return head + "".join(reversed(open_))
+
+
+REPAIRS = (
+    ("code_fences", strip_code_fences),
+    ("trailing_commas", remove_trailing_commas),
+    ("truncation", close_truncated),
+)
+
+
+def repair_json(text: str) -> Tuple[Optional[Any], List[str]]:
+    """(parsed_or_None, repair steps applied). Steps are cumulative."""
+    try:
+        return json.loads(text), []
+    except (json.JSONDecodeError, TypeError):
+        pass
+    steps = []
+    current = text or ""
+    for name, fn in REPAIRS:
+        fixed = fn(current)
+        if fixed == current:
+            continue
+        current = fixed
+        steps.append(name)
+        try:
+            return json.loads(current), steps
+        except json.JSONDecodeError:
+            continue
+    return None, steps
+
+
+def load_schema(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _is_type(value: Any, t: str) -> bool:
+    if t == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if t == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, _TYPES.get(t, object))
+
+
+def validate(value: Any, schema: Optional[Dict], path: str = "$") -> List[str]:
+    """List of human-readable schema violations (empty = valid)."""
+    if not schema:
+        return []
+    errors = []
+    t = schema.get("type")
+    if t:
+        types = t if isinstance(t, list) else [t]
+        if not any(_is_type(value, x) for x in types):
+            return [f"{path}: expected {t}, got {type(value).__name__}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} not in {schema['enum']}")
+    if _is_type(value, "number"):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(f"{path}: {value} < {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(f"{path}: {value} > {schema['maximum']}")
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing '{key}'")
+        for key, sub in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], sub, f"{path}.{key}"))
+    if isinstance(value, list) and isinstance(schema.get("items"), dict):
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+class ResponseRepairer:
+    """Local repair + schema check, and counters of how responses were salvaged.
+
+    `repaired_locally` counts responses that needed no paid re-ask.
+    """
+
+    def __init__(self, schema: Optional[Dict] = None, max_reasks: int = 1):
+        self.schema = schema
+        self.max_reasks = max_reasks
+        self.valid_direct = 0
+        self.repaired_locally = 0
+        self.steps: Dict[str, int] = {}
+        self.reasks = 0
+        self.reask_fixed = 0
+        self.invalid_kept = 0
+        self.unrecoverable = 0
+
+    def check(self, content: str) -> Tuple[Optional[Any], List[str], List[str]]:
+        """(parsed_or_None, repair steps, schema errors)."""
+        obj, steps = repair_json(content)
+        if obj is None:
+            return None, steps, ["not valid JSON"]
+        return obj, steps, validate(obj, self.schema)
+
+    def record_local(self, steps: List[str]):
+        if steps:
+            self.repaired_locally += 1
+            for s in steps:
+                self.steps[s] = self.steps.get(s, 0) + 1
+        else:
+            self.valid_direct += 1
+
+    def stats(self) -> Dict:
+        return {
+            "valid_direct": self.valid_direct,
+            "repaired_locally": self.repaired_locally,
+            "repair_steps": dict(self.steps),
+            "reasks": self.reasks,
+            "reask_fixed": self.reask_fixed,
+            "invalid_kept": self.invalid_kept,
+            "unrecoverable": self.unrecoverable,
+        }
+
+    def report(self) -> str:
+        return (f"JSON repair: {self.repaired_locally} response(s) fixed locally (re-asks saved), "
+                f"{self.reasks} re-ask(s), {self.reask_fixed} fixed by re-ask, "
+                f"{self.unrecoverable} unrecoverable")
@@ -2,21 +2,70 @@
 """
 OAuth Token Manager for OpenAI API
 Handles authorization, refresh, secure storage, and revocation.
+
+The access token is kept in memory with its expiry deadline and refreshed
+ahead of time in the background; concurrent callers share a single
+in-flight refresh, and token endpoints are called through one pooled
+keep-alive session.
+
+Several worker processes can share one token file: refreshes happen
+under an advisory file lock, the file is replaced atomically, and a
+generation counter lets a process adopt a token a peer just refreshed
+instead of refreshing (and invalidating a rotated refresh token) again.
 """
 
 import os
 import json
+import time
+import tempfile
+import contextlib
+import threading
 import webbrowser
 from pathlib import Path
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlencode
 from datetime import datetime, timedelta
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 # 'requests' is imported lazily inside methods to avoid import-time failures
 
 # Storage
 OAUTH_DIR = Path(".oauth")
 TOKEN_FILE = OAUTH_DIR / "openai_token.json"
+# Refresh in the background this long before the token expires
+REFRESH_MARGIN_S = 300
+# Keep-alive connections kept per token host
+POOL_SIZE = 8
+
+
+@contextlib.contextmanager
+def file_lock(path: Path):
+    """Exclusive advisory lock on `path` (created if missing), across processes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
 
 
 def _load_env_local():
@@ -70,7 +119,7 @@ class OAuthTokenManager:
     TOKEN_URL = "https://api.openai.com/oauth/token"
     REVOKE_URL = "https://api.openai.com/oauth/revoke"
 
-    def __init__(self):
+    def __init__(self, token_file: Path | None = None):
         _load_env_local()
         self.client_id = os.getenv("OPENAI_CLIENT_ID")
         self.client_secret = os.getenv("OPENAI_CLIENT_SECRET")
@@ -78,7 +127,36 @@ class OAuthTokenManager:
         if not self.client_id or not self.client_secret:
             raise ValueError("OPENAI_CLIENT_ID and OPENAI_CLIENT_SECRET must be set")
 
-        OAUTH_DIR.mkdir(exist_ok=True)
+        self.token_file = Path(token_file or TOKEN_FILE)
+        self.lock_file = self.token_file.with_suffix(".lock")
+        self.token_file.parent.mkdir(parents=True, exist_ok=True)
+        self._session = None
+        self._token: dict | None = None
+        self._deadline = 0.0  # epoch seconds at which self._token expires
+        self._lock = threading.Lock()  # guards the cached token
+        self._refresh_lock = threading.Lock()  # single-flight refresh
+        self._refresh_thread: threading.Thread | None = None
+        self.refresh_count = 0
+        self.adopted_count = 0  # fresher tokens taken from a peer process
+
+    @property
+    def session(self):
+        """Pooled keep-alive session shared by every token endpoint call."""
+        if self._session is None:
+            import requests  # lazy import
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept"] = "application/json"
+            self._session = session
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
     def get_authorization_url(self) -> str:
         params = {
@@ -116,8 +194,7 @@ class OAuthTokenManager:
             "client_secret": self.client_secret,
             "redirect_uri": self.redirect_uri,
         }
-        import requests  # lazy import
-        resp = requests.post(self.TOKEN_URL, data=data, headers={"Accept": "application/json"})
+        resp = self.session.post(self.TOKEN_URL, data=data)
         resp.raise_for_status()
         token = resp.json()
         token["obtained_at"] = datetime.utcnow().isoformat()
@@ -125,18 +202,38 @@ class OAuthTokenManager:
         return token
 
     def save_token(self, token: dict):
-        TOKEN_FILE.write_text(json.dumps(token), encoding="utf-8")
+        """Atomically replace the token file, bumping its generation counter.
+
+        Callers that may race with other processes hold the file lock.
+        """
+        current = self.load_token() or {}
+        token["generation"] = max(int(current.get("generation", 0)), int(token.get("generation", 0))) + 1
+        fd, tmp = tempfile.mkstemp(dir=self.token_file.parent, prefix=".token.", suffix=".tmp")
         try:
-            if os.name == "posix":
-                os.chmod(TOKEN_FILE, 0o600)
-        except Exception:
-            pass
-        print(f"Token saved to {TOKEN_FILE}")
+            try:
+                if os.name == "posix":
+                    os.chmod(tmp, 0o600)
+            except Exception:
+                pass
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(token, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.token_file)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+        print(f"Token saved to {self.token_file}")
 
     def load_token(self) -> dict | None:
-        if not TOKEN_FILE.exists():
+        # No lock needed: the file is only ever replaced whole
+        try:
+            return json.loads(self.token_file.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
             return None
-        return json.loads(TOKEN_FILE.read_text(encoding="utf-8"))
 
     def is_token_expired(self, token: dict) -> bool:
         if not token or "obtained_at" not in token:
@@ -145,6 +242,25 @@ class OAuthTokenManager:
         expires_in = int(token.get("expires_in", 3600))
         return datetime.utcnow() > (obtained + timedelta(seconds=expires_in))
 
+    def _deadline_of(self, token: dict | None) -> float:
+        if not token or "obtained_at" not in token:
+            return 0.0
+        obtained = datetime.fromisoformat(token["obtained_at"])
+        expires_at = obtained + timedelta(seconds=int(token.get("expires_in", 3600)))
+        return time.time() + (expires_at - datetime.utcnow()).total_seconds()
+
+    def _set_token(self, token: dict):
+        with self._lock:
+            self._token = token
+            self._deadline = self._deadline_of(token)
+
+    def _cached(self, margin: float = 0.0) -> str | None:
+        """In-memory access token if it is valid for at least `margin` more seconds."""
+        with self._lock:
+            if self._token and time.time() + margin < self._deadline:
+                return self._token["access_token"]
+        return None
+
     def refresh_token(self, token: dict) -> dict | None:
         if "refresh_token" not in token:
             print("No refresh token; re-authorization required.")
@@ -156,38 +272,135 @@ class OAuthTokenManager:
             "client_id": self.client_id,
             "client_secret": self.client_secret,
         }
-        import requests  # lazy import
-        resp = requests.post(self.TOKEN_URL, data=data, headers={"Accept": "application/json"})
+        resp = self.session.post(self.TOKEN_URL, data=data)
         if not resp.ok:
             print(f"Token refresh failed: {resp.status_code} {resp.text}")
             return None
         new_token = resp.json()
         new_token["obtained_at"] = datetime.utcnow().isoformat()
+        # Providers may omit the refresh token when it is not rotated
+        new_token.setdefault("refresh_token", token["refresh_token"])
+        self.refresh_count += 1
         print("Token refreshed.")
         return new_token
 
-    def get_valid_token(self) -> str:
-        token = self.load_token()
-        if token and not self.is_token_expired(token):
-            print("Using cached token.")
-            return token["access_token"]
-        if token and self.is_token_expired(token):
-            refreshed = self.refresh_token(token)
-            if refreshed:
+    def get_valid_token(self, blocking: bool = True) -> str | None:
+        """Valid access token; disk and network are only touched when needed.
+
+        A token close to expiry is still returned while a background
+        refresh replaces it. With blocking=False, None instead of a
+        refresh the caller would have to wait for (e.g. on an event loop).
+        """
+        access = self._cached(REFRESH_MARGIN_S)
+        if access:
+            return access
+        access = self._cached()
+        if access:
+            self._refresh_in_background()
+            return access
+        return self._refresh_blocking() if blocking else None
+
+    def force_refresh(self, rejected: str) -> str:
+        """New access token after the API rejected `rejected` (401), whatever its deadline says.
+
+        Callers hitting the same 401 together share one refresh; the first
+        one refreshes, the others get its token.
+        """
+        with self._refresh_lock:
+            access = self._cached()
+            if access and access != rejected:
+                return access
+            with file_lock(self.lock_file):
+                token = self.load_token()
+                if token and token.get("access_token") != rejected and not self.is_token_expired(token):
+                    self._set_token(token)  # a peer process already replaced it
+                    return token["access_token"]
+                refreshed = self.refresh_token(token or self._token or {})
+                if not refreshed:
+                    raise RuntimeError("Access token rejected (401) and it could not be refreshed")
                 self.save_token(refreshed)
+                self._set_token(refreshed)
                 return refreshed["access_token"]
-        code = self.request_authorization()
-        token = self.exchange_code_for_token(code)
-        self.save_token(token)
+
+    def _generation(self) -> int:
+        with self._lock:
+            return int((self._token or {}).get("generation", 0))
+
+    def _adopt_from_disk(self, margin: float = 0.0) -> str | None:
+        """Take the token on disk if a peer wrote a newer one valid for `margin` seconds."""
+        token = self.load_token()
+        if not token or self.is_token_expired(token):
+            return None
+        if self._token is not None and int(token.get("generation", 0)) <= self._generation():
+            return None
+        if self._deadline_of(token) - time.time() <= margin:
+            return None
+        if self._token is not None:
+            self.adopted_count += 1
+        self._set_token(token)
         return token["access_token"]
 
+    def _refresh_blocking(self) -> str:
+        # Single flight: whoever holds the lock refreshes, the others reuse its result
+        with self._refresh_lock:
+            access = self._cached() or self._adopt_from_disk()
+            if access:
+                return access
+            with file_lock(self.lock_file):
+                access = self._adopt_from_disk()  # a peer may have refreshed while we waited
+                if access:
+                    return access
+                token = self.load_token() or self._token
+                if token:
+                    refreshed = self.refresh_token(token)
+                    if refreshed:
+                        self.save_token(refreshed)
+                        self._set_token(refreshed)
+                        return refreshed["access_token"]
+                code = self.request_authorization()
+                token = self.exchange_code_for_token(code)
+                self.save_token(token)
+                self._set_token(token)
+                return token["access_token"]
+
+    def _refresh_in_background(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # a refresh is already in flight
+        try:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._proactive_refresh, daemon=True)
+            self._refresh_thread.start()
+        finally:
+            self._refresh_lock.release()
+
+    def _proactive_refresh(self):
+        with self._refresh_lock:
+            if self._cached(REFRESH_MARGIN_S) or not self._token:
+                return
+            if self._adopt_from_disk(REFRESH_MARGIN_S):
+                return
+            with file_lock(self.lock_file):
+                if self._adopt_from_disk(REFRESH_MARGIN_S):
+                    return
+                try:
+                    refreshed = self.refresh_token(self.load_token() or self._token)
+                except Exception as e:
+                    print(f"Background token refresh failed: {e}")
+                    return
+                if refreshed:
+                    self.save_token(refreshed)
+                    self._set_token(refreshed)
+
     def revoke_token(self):
-        if not TOKEN_FILE.exists():
+        if not self.token_file.exists():
             return
         token = self.load_token() or {}
+        with self._lock:
+            self._token = None
+            self._deadline = 0.0
         try:
-            import requests  # lazy import
-            requests.post(self.REVOKE_URL, data={
+            self.session.post(self.REVOKE_URL, data={
                 "token": token.get("access_token", ""),
                 "client_id": self.client_id,
                 "client_secret": self.client_secret,
@@ -196,7 +409,7 @@ class OAuthTokenManager:
         except Exception:
             print("Could not revoke token on server.")
         try:
-            TOKEN_FILE.unlink()
+            self.token_file.unlink()
             print("Local token file removed.")
         except FileNotFoundError:
             pass
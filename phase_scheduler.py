@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Dependency-aware scheduler for pipeline phases.
+
+- Each phase declares the artifacts it reads (inputs) and writes (outputs)
+- Phases switched off in the control panel are skipped, and so is
+  anything that needs one of their outputs
+- Phases whose inputs are ready run concurrently on a thread pool
+- Per-phase wall time and the critical path are reported
+- With a PhaseCache, a phase whose inputs are unchanged since the last
+  run is not executed; its outputs are loaded (or, for phases that are
+  cheaper to redo than to unpickle, recomputed) only if something needs them
+"""
+
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pipeline_cache import PhaseCache, hash_parts
+
+
+class Phase:
+    """A unit of work: fn(**inputs) -> {output_name: value}."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Dict[str, Any]],
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        always: bool = False,
+        version: str = "",
+        fingerprint: Optional[Callable[[], str]] = None,
+        store: bool = True,
+    ):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.always = always  # data loading etc., not listed in pipeline.sequence
+        self.version = version  # bump (or hash the code) to invalidate cached outputs
+        self.fingerprint = fingerprint  # digest of files read directly by fn
+        self.store = store  # False: recompute on demand rather than pickling outputs
+
+    def __repr__(self):
+        return f"Phase({self.name})"
+
+
+class _Deferred:
+    """Outputs of a phase that was not executed, produced on first use."""
+
+    def __init__(self, produce: Callable[[], Dict[str, Any]]):
+        self._produce = produce
+        self._outputs = None
+
+    def output(self, name: str) -> Any:
+        if self._outputs is None:
+            self._outputs = self._produce() or {}
+        return self._outputs.get(name)
+
+
+class _Pending:
+    def __init__(self, deferred: _Deferred, name: str):
+        self.deferred = deferred
+        self.name = name
+
+
+class Artifacts(dict):
+    """Artifact values; outputs of cached phases are materialized on first access."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.RLock()  # recomputing may read other pending artifacts
+
+    def __getitem__(self, name):
+        value = super().__getitem__(name)
+        if isinstance(value, _Pending):
+            with self._lock:
+                value = super().__getitem__(name)
+                if isinstance(value, _Pending):
+                    value = value.deferred.output(value.name)
+                    self[name] = value
+        return value
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def is_loaded(self, name) -> bool:
+        return not isinstance(super().get(name), _Pending)
+
+
+class PhaseScheduler:
+    """Runs phases as soon as their inputs exist, at most `workers` at a time."""
+
+    def __init__(
+        self,
+        phases: List[Phase],
+        active: Optional[Dict[str, bool]] = None,
+        workers: int = 4,
+        cache: Optional[PhaseCache] = None,
+    ):
+        self.phases = {p.name: p for p in phases}
+        self.cache = cache
+        self.active = active or {}
+        self.workers = max(1, workers)
+        self.producers: Dict[str, str] = {}
+        for p in phases:
+            for out in p.outputs:
+                if out in self.producers:
+                    raise ValueError(f"Artifact '{out}' produced by both {self.producers[out]} and {p.name}")
+                self.producers[out] = p.name
+        self.status: Dict[str, str] = {}
+        self.reasons: Dict[str, str] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.keys: Dict[str, str] = {}  # phase -> cache key of its outputs
+        self.wall_s = 0.0
+
+    def deps(self, phase: Phase) -> List[str]:
+        return [self.producers[i] for i in phase.inputs if i in self.producers]
+
+    def is_active(self, phase: Phase) -> bool:
+        return phase.always or self.active.get(phase.name, True)
+
+    def run(self, context: Optional[Dict[str, Any]] = None) -> Artifacts:
+        """Run every runnable phase; returns the artifacts (initial context included)."""
+        artifacts = Artifacts(context or {})
+        fps: Dict[str, str] = {}
+        if self.cache is not None:
+            fps = {name: hash_parts(value) for name, value in artifacts.items()}
+        for name, p in self.phases.items():
+            missing = [i for i in p.inputs if i not in self.producers and i not in artifacts]
+            if missing:
+                raise ValueError(f"Phase {name} needs {missing}, which nothing provides")
+
+        pending = dict(self.phases)
+        running = {}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                progressed = False
+                for name in list(pending):
+                    phase = pending[name]
+                    if not self.is_active(phase):
+                        self._skip(pending, name, "inactive in control panel")
+                        progressed = True
+                        continue
+                    states = [self.status.get(d) for d in self.deps(phase)]
+                    blocked = [d for d, s in zip(self.deps(phase), states) if s in ("skipped", "failed")]
+                    if blocked:
+                        self._skip(pending, name, f"needs output of {', '.join(blocked)}")
+                        progressed = True
+                        continue
+                    if all(s == "success" for s in states):
+                        t0 = time.perf_counter()
+                        self.timings[name] = {"start_s": round(t0 - started, 4)}
+                        input_fps = [fps.get(i) for i in phase.inputs]
+                        running[pool.submit(self._timed, phase, artifacts, input_fps)] = name
+                        del pending[name]
+                        progressed = True
+                if not running:
+                    if not progressed:
+                        raise ValueError(f"Dependency cycle between {sorted(pending)}")
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    try:
+                        outputs, elapsed, key = fut.result()
+                    except Exception as e:
+                        self.status[name] = "failed"
+                        self.reasons[name] = f"{type(e).__name__}: {e}"
+                        print(f"[ERROR] Phase {name} failed: {e}")
+                        continue
+                    self.timings[name]["wall_s"] = round(elapsed, 4)
+                    phase = self.phases[name]
+                    deferred = self._deferred(phase, artifacts, key) if outputs is None else None
+                    for out in phase.outputs:
+                        artifacts[out] = _Pending(deferred, out) if deferred else outputs.get(out)
+                        if key is not None:
+                            fps[out] = f"{key}:{out}"
+                    if key is not None:
+                        self.keys[name] = key
+                        self.timings[name]["cached"] = outputs is None
+                    self.status[name] = "success"
+        self.wall_s = time.perf_counter() - started
+        return artifacts
+
+    def _timed(self, phase: Phase, artifacts: Artifacts, input_fps: List[Optional[str]]):
+        """(outputs or None when served from cache, seconds, cache key or None)."""
+        t0 = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            external = phase.fingerprint() if phase.fingerprint else None
+            key = hash_parts(phase.name, phase.version, external, input_fps)
+            hit = self.cache.has(key) if phase.store else self.cache.last_key(phase.name) == key
+            if hit:
+                self.cache.hits += 1
+                return None, time.perf_counter() - t0, key
+            self.cache.misses += 1
+        outputs = phase.fn(**{i: artifacts[i] for i in phase.inputs}) or {}
+        if key is not None:
+            if phase.store:
+                self.cache.store(key, outputs)
+            self.cache.set_last(phase.name, key)
+        return outputs, time.perf_counter() - t0, key
+
+    def _deferred(self, phase: Phase, artifacts: Artifacts, key: str) -> _Deferred:
+        if phase.store:
+            return _Deferred(lambda: self.cache.load(key))
+        return _Deferred(lambda: phase.fn(**{i: artifacts[i] for i in phase.inputs}))
+
+    def _skip(self, pending: Dict[str, Phase], name: str, reason: str):
+        self.status[name] = "skipped"
+        self.reasons[name] = reason
+        del pending[name]
+
+    def critical_path(self) -> List[str]:
+        """Longest chain (by wall time) of successful phases."""
+        best: Dict[str, float] = {}
+        prev: Dict[str, Optional[str]] = {}
+
+        def cost(name: str) -> float:
+            if name in best:
+                return best[name]
+            before = [d for d in self.deps(self.phases[name]) if self.status.get(d) == "success"]
+            pick = max(before, key=cost, default=None)
+            prev[name] = pick
+            best[name] = self.timings[name]["wall_s"] + (cost(pick) if pick else 0.0)
+            return best[name]
+
+        done = [n for n, s in self.status.items() if s == "success"]
+        if not done:
+            return []
+        end = max(done, key=cost)
+        path = [end]
+        while prev[path[-1]]:
+            path.append(prev[path[-1]])
+        return list(reversed(path))
+
+    def summary(self) -> Dict[str, Any]:
+        path = self.critical_path()
+        phases = {}
+        for name in self.phases:
+            entry = {"status": self.status.get(name, "pending")}
+            entry.update(self.timings.get(name, {}))
+            if name in self.reasons:
+                entry["reason"] = self.reasons[name]
+            phases[name] = entry
+        busy = sum(t.get("wall_s", 0.0) for t in self.timings.values())
+        return {
+            "workers": self.workers,
+            "wall_s": round(self.wall_s, 4),
+            "sum_phase_s": round(busy, 4),
+            "critical_path": path,
+            "critical_path_s": round(sum(self.timings[n]["wall_s"] for n in path), 4),
+            "phases": phases,
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        lines = [f"Schedule: {s['wall_s']:.3f}s wall for {s['sum_phase_s']:.3f}s of phase work "
+                 f"on {s['workers']} worker(s)"]
+        for name, entry in s["phases"].items():
+            if entry["status"] == "success":
+                cached = " (cached)" if entry.get("cached") else ""
+                lines.append(f"  - {name:<22} {entry['wall_s']:.3f}s{cached}")
+            else:
+                lines.append(f"  - {name:<22} {entry['status']} ({entry.get('reason', '')})")
+        lines.append(f"  Critical path ({s['critical_path_s']:.3f}s): {' -> '.join(s['critical_path'])}")
+        return "\n".join(lines)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Memoization of pipeline phase outputs across runs.
+
+- A phase's key hashes its name, code version, external-input fingerprint
+  and the keys of the phases that produced its inputs, so a change
+  anywhere upstream invalidates exactly the phases downstream of it
+- Outputs are pickled under `<key>.pkl` and loaded only when a phase that
+  must rerun actually needs them. Phases whose outputs are cheaper to
+  recompute than to unpickle (parsed JSON) only record their latest key
+- File digests are SHA-256, re-hashed only when a file's size or mtime
+  changes, so fingerprinting 10k files costs one stat() each (and with
+  a fast digest installed, a touched but unchanged file skips SHA-256)
+- Memos keep what a phase derives from each file under that file's
+  digest, so when a phase must rerun only the changed files are re-read
+- Saving drops the outputs and report bodies the run did not use, so the
+  directory holds one run's worth of entries rather than every run's
+"""
+
+import os
+import re
+import json
+import pickle
+import hashlib
+import inspect
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set
+
+from file_hash import refresh_digests
+
+DEFAULT_CACHE_DIR = Path(".cache/pipeline")
+# Keyed entries: pickled outputs and rendered report bodies
+ENTRY_RX = re.compile(r"^(?P<key>[0-9a-f]{64})\.(?:pkl|json|min\.json)(?:\.gz)?$")
+
+
+@contextmanager
+def _atomic_writer(path: Path):
+    """Binary file that replaces `path` only once fully written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _atomic_write_bytes(path: Path, data: bytes):
+    with _atomic_writer(path) as f:
+        f.write(data)
+
+
+def hash_parts(*parts: Any) -> str:
+    material = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def code_version(*fns) -> str:
+    """Hash of the functions' source: editing a phase invalidates its cache."""
+    sources = []
+    for fn in fns:
+        try:
+            sources.append(inspect.getsource(fn))
+        except (OSError, TypeError):
+            sources.append(getattr(fn, "__qualname__", repr(fn)))
+    return hash_parts(*sources)[:16]
+
+
+class FileDigests:
+    """SHA-256 per file, memoized on (size, mtime_ns) in a JSON side file.
+
+    Entries are [size, mtime_ns, sha256, fast digest or None].
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hashed = 0
+        try:
+            self.entries: Dict[str, list] = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            self.entries = {}
+
+    def digest(self, p: Path, st: Optional[os.stat_result] = None) -> str:
+        st = st or os.stat(p)
+        name = os.path.abspath(p)
+        with self._lock:
+            cur = self.entries.get(name)
+        if cur and cur[0] == st.st_size and cur[1] == st.st_mtime_ns:
+            return cur[2]
+        # same size: maybe only touched, which the fast digest can tell
+        digest, fast = refresh_digests(p, *(cur[2:4] if cur and cur[0] == st.st_size else ()))
+        with self._lock:
+            self.entries[name] = [st.st_size, st.st_mtime_ns, digest, fast]
+            self._dirty = True
+            self.hashed += 1
+        return digest
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self.entries, separators=(",", ":")).encode("utf-8")
+            self._dirty = False
+        _atomic_write_bytes(self.path, data)
+
+
+class Memo:
+    """Values derived from single files, keyed on their digests, in one pickle.
+
+    Loaded on first use. Saving keeps only the entries used since, so
+    values of deleted or changed files do not pile up.
+    """
+
+    def __init__(self, path: Path, version: str):
+        self.path = Path(path)
+        self.version = version
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Any]] = None
+        self._used: Dict[str, Any] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Any]:
+        if self._entries is None:
+            try:
+                with open(self.path, "rb") as f:
+                    version, entries = pickle.load(f)
+            except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                version, entries = None, {}
+            self._entries = entries if version == self.version else {}
+        return self._entries
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._load().get(key)
+            if value is not None:
+                self._used[key] = value
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._used[key] = value
+            self._dirty = True
+            self.misses += 1
+
+    def save(self):
+        with self._lock:
+            if self._entries is None or (not self._dirty and len(self._used) == len(self._entries)):
+                return
+            data = pickle.dumps((self.version, self._used), protocol=pickle.HIGHEST_PROTOCOL)
+            self._entries = dict(self._used)
+            self._dirty = False
+        _atomic_write_bytes(self.path, data)
+
+
+class PhaseCache:
+    """Directory of pickled phase outputs and rendered report bodies."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.digests = FileDigests(self.cache_dir / "file_digests.json")
+        self.memos: Dict[str, Memo] = {}
+        self._used: Set[str] = set()  # keys asked for by this run, kept on save
+        self._used_lock = threading.Lock()
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.pruned = 0
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def _use(self, key: str):
+        with self._used_lock:
+            self._used.add(key)
+
+    def fingerprint_files(self, paths: Iterable[Path]) -> str:
+        """Digest of a set of files (names + contents), in the given order."""
+        return hash_parts([(Path(p).name, self.digests.digest(p)) for p in paths])
+
+    def has(self, key: str) -> bool:
+        self._use(key)
+        return self._entry(key).exists()
+
+    def load(self, key: str) -> Any:
+        with open(self._entry(key), "rb") as f:
+            value = pickle.load(f)
+        self.loads += 1
+        return value
+
+    def store(self, key: str, value: Any):
+        self._use(key)
+        _atomic_write_bytes(self._entry(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def set_last(self, phase: str, key: str):
+        """Remember the key `phase` ran with most recently."""
+        _atomic_write_bytes(self.cache_dir / f"last_{phase}.key", key.encode("ascii"))
+
+    def last_key(self, phase: str) -> Optional[str]:
+        try:
+            return (self.cache_dir / f"last_{phase}.key").read_text(encoding="ascii").strip()
+        except OSError:
+            return None
+
+    def text_path(self, key: str, suffix: str = ".json") -> Optional[Path]:
+        self._use(key)
+        path = self.cache_dir / f"{key}{suffix}"
+        return path if path.exists() else None
+
+    def open_text(self, key: str, suffix: str = ".json"):
+        """Binary writer for a rendered document, published atomically on close."""
+        self._use(key)
+        return _atomic_writer(self.cache_dir / f"{key}{suffix}")
+
+    def memo(self, name: str, version: str) -> Memo:
+        """Per-file memo `name`; a new `version` (code hash) starts it empty."""
+        memo = self.memos.get(name)
+        if memo is None or memo.version != version:
+            memo = self.memos[name] = Memo(self.cache_dir / f"memo_{name}.pkl", version)
+        return memo
+
+    def save(self):
+        """Persist digests and memos, then drop the entries this run did not use."""
+        self.digests.save()
+        for memo in self.memos.values():
+            memo.save()
+        self.pruned = 0
+        with self._used_lock:
+            used = set(self._used)
+        for path in self.cache_dir.iterdir():
+            m = ENTRY_RX.match(path.name)
+            if m and m.group("key") not in used:
+                try:
+                    path.unlink()
+                    self.pruned += 1
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict:
+        return {
+            "phase_hits": self.hits,
+            "phase_misses": self.misses,
+            "outputs_loaded": self.loads,
+            "files_hashed": self.digests.hashed,
+            "files_memoized": sum(m.hits for m in self.memos.values()),
+            "files_rederived": sum(m.misses for m in self.memos.values()),
+            "entries_pruned": self.pruned,
+        }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Shared request/token rate limiter for vision batches.
+
+- Two token buckets: requests per minute and estimated tokens per minute
+- Token estimate = prompt text + image tiles (high detail) + max_tokens
+- Pauses every caller on 429 for the Retry-After delay
+- Adapts its rate: halves on 429, creeps back up on success (AIMD)
+- Exposes budget utilisation counters via stats()
+"""
+
+import time
+import math
+import asyncio
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from image_probe import image_info
+
+# OpenAI vision pricing model (detail=high): fit in 2048x2048, shortest side
+# scaled to 768, then 170 tokens per 512px tile plus a fixed 85.
+TILE_SIZE = 512
+TILE_TOKENS = 170
+BASE_IMAGE_TOKENS = 85
+DEFAULT_TILES = 4  # 768x768 equivalent when dimensions are unknown
+
+
+def image_tokens(width: int, height: int) -> int:
+    """Token cost of one high-detail image of the given size."""
+    if width <= 0 or height <= 0:
+        return BASE_IMAGE_TOKENS + TILE_TOKENS * DEFAULT_TILES
+    scale = min(1.0, 2048 / max(width, height))
+    w, h = width * scale, height * scale
+    scale = min(1.0, 768 / min(w, h))
+    w, h = w * scale, h * scale
+    tiles = math.ceil(w / TILE_SIZE) * math.ceil(h / TILE_SIZE)
+    return BASE_IMAGE_TOKENS + TILE_TOKENS * tiles
+
+
+def image_size(p: Path) -> tuple:
+    """(width, height) from the image header, or (0, 0) if unreadable."""
+    info = image_info(p)
+    return (info[0], info[1]) if info else (0, 0)
+
+
+def estimate_request_tokens(prompt: str, img_path: Path, max_tokens: int = 2000) -> int:
+    """Worst-case tokens a single analyze_image() call can consume."""
+    prompt_tokens = len(prompt) // 4 + 1
+    w, h = image_size(img_path)
+    return prompt_tokens + image_tokens(w, h) + max_tokens
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds to wait from Retry-After / retry-after-ms headers, if present."""
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class TokenBucket:
+    """Classic token bucket holding at most one minute of budget."""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = now
+
+    def refill(self, now: float, factor: float = 1.0):
+        elapsed = max(0.0, now - self.updated)
+        self.level = min(self.capacity, self.level + elapsed * self.capacity / 60.0 * factor)
+        self.updated = now
+
+    def wait_time(self, amount: float, factor: float = 1.0) -> float:
+        """Seconds until `amount` is available (0 if it already is)."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.capacity / 60.0 * factor)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Requests/min + tokens/min budget shared by every worker of a run."""
+
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        min_factor: float = 0.1,
+        recovery_step: float = 0.05,
+        clock=time.monotonic,
+    ):
+        self.clock = clock
+        now = clock()
+        self.rpm = TokenBucket(rpm, now) if rpm else None
+        self.tpm = TokenBucket(tpm, now) if tpm else None
+        self.factor = 1.0
+        self.min_factor = min_factor
+        self.recovery_step = recovery_step
+        self.paused_until = 0.0
+        self.started = now
+        self._lock: Optional[asyncio.Lock] = None
+        # counters
+        self.requests_granted = 0
+        self.tokens_granted = 0
+        self.tokens_used = 0
+        self.wait_s = 0.0
+        self.throttled = 0
+
+    def _buckets(self):
+        return [b for b in (self.rpm, self.tpm) if b is not None]
+
+    def reserve(self, tokens: int) -> float:
+        """Try to take one request + `tokens`. Returns 0 on success, else seconds to wait."""
+        now = self.clock()
+        if now < self.paused_until:
+            return self.paused_until - now
+        for b in self._buckets():
+            b.refill(now, self.factor)
+        wait = 0.0
+        if self.rpm:
+            wait = max(wait, self.rpm.wait_time(1, self.factor))
+        if self.tpm:
+            wait = max(wait, self.tpm.wait_time(tokens, self.factor))
+        if wait > 0:
+            return wait
+        if self.rpm:
+            self.rpm.take(1)
+        if self.tpm:
+            self.tpm.take(tokens)
+        self.requests_granted += 1
+        self.tokens_granted += tokens
+        return 0.0
+
+    async def acquire(self, tokens: int):
+        """Block until the request fits in both budgets (FIFO among callers)."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = self.reserve(tokens)
+                if wait <= 0:
+                    return
+                self.wait_s += wait
+                await asyncio.sleep(wait)
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Refund (or charge) the difference between estimate and real usage."""
+        if actual is None:
+            self.tokens_used += estimated
+            return
+        self.tokens_used += actual
+        if self.tpm:
+            self.tpm.level = min(self.tpm.capacity, self.tpm.level + (estimated - actual))
+
+    def on_success(self):
+        self.factor = min(1.0, self.factor + self.recovery_step)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Halve the rate and pause everyone for Retry-After (default 1s)."""
+        self.throttled += 1
+        self.factor = max(self.min_factor, self.factor / 2)
+        delay = retry_after if retry_after is not None else 1.0
+        self.paused_until = max(self.paused_until, self.clock() + delay)
+
+    def stats(self) -> Dict:
+        minutes = max((self.clock() - self.started) / 60.0, 1e-9)
+        out = {
+            "requests_granted": self.requests_granted,
+            "tokens_granted": self.tokens_granted,
+            "tokens_used": self.tokens_used,
+            "wait_s": round(self.wait_s, 3),
+            "throttled_429": self.throttled,
+            "rate_factor": round(self.factor, 3),
+        }
+        if self.rpm:
+            out["rpm_limit"] = self.rpm.capacity
+            out["rpm_utilisation"] = round(self.requests_granted / minutes / self.rpm.capacity, 3)
+        if self.tpm:
+            out["tpm_limit"] = self.tpm.capacity
+            out["tpm_utilisation"] = round(self.tokens_used / minutes / self.tpm.capacity, 3)
+        return out
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON writer for pipeline reports.
+
+- Objects are written member by member and arrays element by element.
+  Each array element (a frame, a defect, a citation) is encoded on its
+  own, so only one element's text is in memory, never the whole document
+- Iterators (generators, map objects) are written as arrays without
+  being materialized
+- indent=2 output is byte-identical to json.dumps(..., indent=2);
+  indent=None gives the compact form
+- Gzip members concatenate: a compressed report body can be copied as-is
+  and more members appended to it as a new gzip member
+"""
+
+import gzip
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, BinaryIO, List, Optional
+
+FLUSH_BYTES = 1 << 16
+GZIP_LEVEL = 6  # level 9 is several times slower for a few percent on JSON
+
+
+class JSONStreamWriter:
+    """Writes one JSON document to a binary stream, piece by piece."""
+
+    def __init__(self, out: BinaryIO, indent: Optional[int] = 2):
+        self.out = out
+        self.indent = indent
+        self._item_sep, self._key_sep = (",", ": ") if indent is not None else (",", ":")
+        self._stack: List[list] = []  # [closer, members written so far]
+        self._buf: List[str] = []
+        self._size = 0
+
+    def _write(self, text: str):
+        self._buf.append(text)
+        self._size += len(text)
+        if self._size >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            self.out.write("".join(self._buf).encode("utf-8"))
+            self._buf = []
+            self._size = 0
+
+    def _newline(self, level: int) -> str:
+        return "\n" + " " * (self.indent * level) if self.indent is not None else ""
+
+    def _encode(self, value: Any, level: int) -> str:
+        text = json.dumps(value, ensure_ascii=False, indent=self.indent,
+                          separators=(self._item_sep, self._key_sep))
+        if self.indent is not None and level and "\n" in text:
+            text = text.replace("\n", self._newline(level))
+        return text
+
+    def _next_slot(self):
+        frame = self._stack[-1]
+        self._write((self._item_sep if frame[1] else "") + self._newline(len(self._stack)))
+        frame[1] += 1
+
+    def begin_object(self):
+        self._write("{")
+        self._stack.append(["}", 0])
+
+    def begin_array(self):
+        self._write("[")
+        self._stack.append(["]", 0])
+
+    def resume_object(self, has_members: bool = True):
+        """Continue an object whose opening brace (and members) were written elsewhere."""
+        self._stack.append(["}", 1 if has_members else 0])
+
+    def end(self):
+        closer, count = self._stack.pop()
+        self._write((self._newline(len(self._stack)) if count else "") + closer)
+
+    def member(self, key: str, value: Any):
+        self._next_slot()
+        self._write(json.dumps(str(key), ensure_ascii=False) + self._key_sep)
+        self.value(value)
+
+    def item(self, value: Any):
+        self._next_slot()
+        self._write(self._encode(value, len(self._stack)))
+
+    def value(self, value: Any):
+        """Objects are streamed per member, arrays per (whole) element."""
+        if isinstance(value, dict):
+            self.begin_object()
+            for k, v in value.items():
+                self.member(k, v)
+            self.end()
+        elif isinstance(value, (list, tuple, Iterator)):
+            self.begin_array()
+            for v in value:
+                self.item(v)
+            self.end()
+        else:
+            self._write(self._encode(value, len(self._stack)))
+
+
+@contextmanager
+def maybe_gzip(out: BinaryIO, compress: bool):
+    """`out` itself, or a gzip member written into it (left open on exit)."""
+    if not compress:
+        yield out
+        return
+    with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as gz:
+        yield gz
+
+
+def write_json(out: BinaryIO, value: Any, indent: Optional[int] = 2, compress: bool = False):
+    """Stream `value` to `out` as one JSON document."""
+    with maybe_gzip(out, compress) as f:
+        writer = JSONStreamWriter(f, indent)
+        writer.value(value)
+        writer.flush()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for vision responses.
+
+- Key = SHA-256(image bytes) + model + SHA-256(prompt) + sampling params
+- Renamed or moved images therefore hit the same entry
+- One JSON file per entry; size-capped with LRU eviction (mtime = last use)
+- Counts hits, misses and upload bytes saved for the end-of-run report
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from file_hash import sha256_file
+
+DEFAULT_CACHE_DIR = Path(".cache/vision_responses")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResponseCache:
+    """LRU-bounded directory of `<key>.json` response entries."""
+
+    def __init__(
+        self,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        prompt: str = "",
+        params: Optional[Dict] = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        self.params = params or {}
+        self._lock = threading.Lock()
+        self.total_bytes = sum(p.stat().st_size for p in self.cache_dir.glob("*.json"))
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    def key_for(self, img_path: Path, model: str) -> str:
+        material = json.dumps({
+            "image_sha256": sha256_file(img_path),
+            "model": model,
+            "prompt_sha256": self.prompt_hash,
+            "params": self.params,
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str, upload_bytes: int = 0) -> Optional[str]:
+        """Cached response content, or None. `upload_bytes` feeds bytes_saved on a hit."""
+        p = self._path(key)
+        try:
+            entry = json.loads(p.read_text(encoding="utf-8"))
+            os.utime(p)  # mark as recently used
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += upload_bytes
+        return entry.get("content")
+
+    def put(self, key: str, content: str, meta: Optional[Dict] = None):
+        data = json.dumps({"content": content, "meta": meta or {}}, ensure_ascii=False).encode("utf-8")
+        p = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._lock:
+            old = p.stat().st_size if p.exists() else 0
+            os.replace(tmp, p)
+            self.total_bytes += len(data) - old
+            self.stores += 1
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for p in self.cache_dir.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        for _, size, p in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+            "cache_bytes": self.total_bytes,
+        }
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        rate = (self.hits / lookups * 100) if lookups else 0.0
+        return (f"Cache: {self.hits} hit(s), {self.misses} miss(es) ({rate:.0f}% hit rate), "
+                f"{self.bytes_saved / 1e6:.1f} MB upload saved, {self.evictions} eviction(s)")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Retry policy and dead-letter queue for vision requests.
+
+- Classifies failures: timeouts, connection errors, 408, 5xx and 429 are
+  transient; other 4xx (bad image, content policy, 409...) are not retried
+- Exponential backoff with full jitter, never shorter than Retry-After
+- Per-run retry budget shared by every worker
+- Images that still fail land in a dead-letter folder that
+  --retry-failed reprocesses on its own
+"""
+
+import json
+import random
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from rate_limiter import parse_retry_after
+from run_journal import atomic_write_text
+
+TRANSIENT = "transient"
+RATE_LIMIT = "rate_limit"
+FATAL = "fatal"
+
+
+def classify(exc: BaseException) -> str:
+    """TRANSIENT, RATE_LIMIT or FATAL for an exception raised by a request."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429:
+        return RATE_LIMIT
+    if isinstance(status, int):
+        return TRANSIENT if status >= 500 or status == 408 else FATAL
+    # openai.APITimeoutError / APIConnectionError carry no status code
+    name = type(exc).__name__
+    if isinstance(exc, (TimeoutError, ConnectionError)) or name in ("APITimeoutError", "APIConnectionError"):
+        return TRANSIENT
+    return FATAL
+
+
+def retry_after_of(exc: BaseException) -> Optional[float]:
+    return parse_retry_after(getattr(getattr(exc, "response", None), "headers", None))
+
+
+class RetryPolicy:
+    """Decides whether and when to retry; counts what happened."""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        budget: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.rng = rng or random.Random()
+        # counters
+        self.retries = 0
+        self.retries_by_class = {TRANSIENT: 0, RATE_LIMIT: 0}
+        self.recovered = 0
+        self.gave_up = 0
+        self.not_retried = 0
+        self.budget_exhausted = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self.rng.uniform(0, cap)
+
+    def next_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after failed `attempt`, or None to give up."""
+        kind = classify(exc)
+        if kind == FATAL:
+            self.not_retried += 1
+            return None
+        if attempt >= self.max_attempts:
+            self.gave_up += 1
+            return None
+        if self.budget is not None and self.retries >= self.budget:
+            self.budget_exhausted += 1
+            return None
+        self.retries += 1
+        self.retries_by_class[kind] += 1
+        delay = self.backoff(attempt)
+        retry_after = retry_after_of(exc)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def on_success(self, attempt: int):
+        if attempt > 1:
+            self.recovered += 1
+
+    def stats(self) -> Dict:
+        return {
+            "max_attempts": self.max_attempts,
+            "budget": self.budget,
+            "retries": self.retries,
+            "retries_transient": self.retries_by_class[TRANSIENT],
+            "retries_rate_limit": self.retries_by_class[RATE_LIMIT],
+            "recovered": self.recovered,
+            "gave_up": self.gave_up,
+            "not_retried": self.not_retried,
+            "budget_exhausted": self.budget_exhausted,
+        }
+
+
+class DeadLetterQueue:
+    """One `<stem>.json` entry per image that failed for good."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _entry(self, img_path: Path) -> Path:
+        return self.path / f"{img_path.stem}.json"
+
+    def add(self, img_path: Path, exc: BaseException, attempts: int):
+        entry = {
+            "image": img_path.as_posix(),
+            "error": str(exc),
+            "error_type": type(exc).__name__,
+            "class": classify(exc),
+            "attempts": attempts,
+            "failed_at": datetime.utcnow().isoformat(),
+        }
+        atomic_write_text(self._entry(img_path), json.dumps(entry, ensure_ascii=False, indent=2))
+
+    def images(self) -> List[Path]:
+        if not self.path.exists():
+            return []
+        out = []
+        for p in sorted(self.path.glob("*.json")):
+            try:
+                out.append(Path(json.loads(p.read_text(encoding="utf-8"))["image"]))
+            except (OSError, json.JSONDecodeError, KeyError):
+                continue
+        return out
+
+    def resolve(self, img_path: Path):
+        try:
+            self._entry(img_path).unlink()
+        except FileNotFoundError:
+            pass
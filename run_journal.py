@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Append-only run journal for vision batches.
+
+- One JSONL record per image state transition:
+  queued -> sent -> succeeded | failed (with attempt count)
+- Replayed on start-up to resume exactly the unfinished images in
+  O(journal) time, without stat'ing every output file
+- A torn last line (killed mid-write) is ignored on replay and cut off
+  the file, so the next record starts on a line of its own
+- compact() rewrites the journal with only the latest state per image
+- Final states are fsync'ed; record_async() does that fsync in a worker
+  thread, so async workers never wait on the disk from the event loop
+"""
+
+import os
+import asyncio
+import json
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+STATES = ("queued", "sent", "succeeded", "failed")
+DONE = "succeeded"
+
+
+def atomic_write_text(path: Path, text: str):
+    """Write via a temp file in the same folder + rename, so readers never see half a file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class RunJournal:
+    """Latest state per image, backed by an append-only JSONL file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.states: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._fh = None
+        self.replayed = 0
+        self._replay()
+
+    def _replay(self):
+        if not self.path.exists():
+            return
+        end = 0  # offset just past the last line to keep
+        tail = b""
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # torn write from a killed run (only the last line can lack its newline)
+                    if line.endswith(b"\n"):
+                        end += len(line)
+                    continue
+                self._apply(rec)
+                self.replayed += 1
+                end += len(line)
+                tail = line[-1:]
+        size = self.path.stat().st_size
+        if end < size or tail not in (b"", b"\n"):
+            # appends would land on the fragment and make their record unreadable too
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+                if tail not in (b"", b"\n"):
+                    f.seek(end)
+                    f.write(b"\n")
+
+    def _apply(self, rec: Dict):
+        cur = self.states.setdefault(rec["image"], {"state": None, "attempts": 0})
+        cur["state"] = rec["state"]
+        cur["attempts"] = rec.get("attempt", cur["attempts"])
+        if rec.get("error"):
+            cur["error"] = rec["error"]
+        elif rec["state"] == DONE:
+            cur.pop("error", None)
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self.states)
+
+    def state_of(self, image: str) -> Optional[str]:
+        cur = self.states.get(image)
+        return cur["state"] if cur else None
+
+    def attempts(self, image: str) -> int:
+        cur = self.states.get(image)
+        return cur["attempts"] if cur else 0
+
+    def record(self, image: str, state: str, error: Optional[str] = None):
+        if self._append(image, state, error):
+            self.sync()
+
+    async def record_async(self, image: str, state: str, error: Optional[str] = None):
+        """record() for the event loop: the fsync of a final state runs in a thread."""
+        if self._append(image, state, error):
+            await asyncio.to_thread(self.sync)
+
+    def sync(self):
+        """fsync what was written so far (outside the lock: writers are not held up)."""
+        with self._lock:
+            if self._fh is None:
+                return
+            fd = os.dup(self._fh.fileno())  # stays valid even if the journal is closed meanwhile
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _append(self, image: str, state: str, error: Optional[str] = None) -> bool:
+        """Write and flush one record; True when it is a final state to fsync."""
+        if state not in STATES:
+            raise ValueError(f"Unknown journal state: {state}")
+        with self._lock:
+            attempt = self.attempts(image) + (1 if state == "sent" else 0)
+            rec = {"ts": datetime.utcnow().isoformat(), "image": image, "state": state, "attempt": attempt}
+            if error:
+                rec["error"] = error
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._fh.flush()
+            self._apply(rec)
+        return state in (DONE, "failed")
+
+    def record_many(self, images: Iterable[str], state: str):
+        for image in images:
+            self.record(image, state)
+
+    def unfinished(self, images: List[str]) -> List[str]:
+        """Images (in order) whose last recorded state is not succeeded."""
+        return [i for i in images if self.state_of(i) != DONE]
+
+    def compact(self):
+        """Replace the journal with one record per image (latest state)."""
+        with self._lock:
+            self.close()
+            lines = []
+            for image, cur in self.states.items():
+                rec = {"ts": datetime.utcnow().isoformat(), "image": image,
+                       "state": cur["state"], "attempt": cur["attempts"]}
+                if cur.get("error"):
+                    rec["error"] = cur["error"]
+                lines.append(json.dumps(rec, ensure_ascii=False) + "\n")
+            atomic_write_text(self.path, "".join(lines))
+
+    def summary(self) -> Dict:
+        counts = {s: 0 for s in STATES}
+        for cur in self.states.values():
+            counts[cur["state"]] += 1
+        counts["images"] = len(self.states)
+        counts["attempts"] = sum(cur["attempts"] for cur in self.states.values())
+        return counts
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -3,13 +3,23 @@
 """
 ArBot Vision Pipeline Execution Script
 Executes the pipeline using images_db.json, docs_index.json, and analysis results
+
+Phases run through a dependency-aware scheduler: phases switched off in
+pipeline.sequence.defaults_active are skipped, independent phases run
+concurrently, and per-phase timings plus the critical path are reported.
+Phase outputs are memoized under a hash of their inputs, so a rerun only
+recomputes the phases downstream of what changed, and each analysis's
+share of them under its file's digest, so only changed files are re-read.
 """
 
 import json
 import os
+import shutil
+import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Union
+from collections import defaultdict
 import sys
 
 # Import our vision analysis script functions
@@ -17,8 +27,18 @@ from run_vision_analysis import (
     load_images_db,
     load_docs_index,
     load_analysis_results,
+    load_json_file,
     analyze_defects
 )
+from concurrent.futures import ThreadPoolExecutor
+from analysis_loader import THREAD_CHUNK, AnalysisLoader, analysis_files, group_by_file_id, read_group
+from analysis_store import AnalysisStore
+from defect_table import CATEGORICAL, Categories, DefectTable
+from doc_lookup import DocLookup, normalize_norm, without_year
+from file_hash import sha256_file
+from phase_scheduler import Phase, PhaseScheduler
+from report_writer import JSONStreamWriter, maybe_gzip
+from pipeline_cache import DEFAULT_CACHE_DIR, Memo, PhaseCache, code_version, hash_parts
 
 # Pipeline configuration
 PACK = "ArBot-Vision-Pack_v0.7.1"
@@ -88,13 +108,139 @@ def execute_phase_ingestion(images_db: Dict, docs_index: Dict, controlpanel: Dic
     return ingestion_result
 
 
+def photos_dir_of(controlpanel: Optional[Dict]) -> Path:
+    return Path((controlpanel or {}).get("paths_filters", {}).get("paths", {}).get("photos_dir", "./images"))
+
+
+def analysis_frame(file_id: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """VISION_ANALYSIS frame of one analysis, its photo's sha256 still empty."""
+    vision_data = analysis.get("vision", {})
+    defects = vision_data.get("defects", [])
+    annotations = vision_data.get("annotations", [])
+    
+    source_file = analysis.get("source_file", {})
+    return {
+        "id": int(file_id) if file_id.isdigit() else 0,
+        "file": source_file.get("file_name", ""),
+        "sha256": "",
+        "width": source_file.get("file_img_width", 0),
+        "height": source_file.get("file_img_height", 0),
+        "annotations": annotations,
+        "defects_count": len(defects)
+    }
+
+
+def unknown_regle_ref() -> Dict[str, str]:
+    return {"doc_id": "UNKNOWN", "source_page": "", "article_id": ""}
+
+
+def def_all_row(defect: Dict[str, Any], categorie: Any, origin_layer: Any, gravite: Any, image_ref: Any) -> Dict[str, Any]:
+    """DEFECT_DETECTION's def_all entry for one defect."""
+    return {
+        "id_defaut": defect.get("id_defaut", ""),
+        "categorie": categorie,
+        "type_defaut": defect.get("type_defaut", ""),
+        "origin_layer": origin_layer,
+        "gravite_technique": gravite,
+        "image_ref": image_ref,
+        "style": defect.get("style", "MAJEUR"),
+        "incertitude": defect.get("incertitude", 0.0),
+        "regle_ref": defect.get("regle_ref") if "regle_ref" in defect else unknown_regle_ref(),
+        "polygons_norm": defect.get("polygons_norm", []),
+        "polylines_norm": defect.get("polylines_norm", [])
+    }
+
+
+def analysis_contribution(file_id: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """What one analysis adds to the phases: its frame, DefectTable row and def_all rows."""
+    defects = analysis.get("vision", {}).get("defects", []) or []
+    source_file = analysis.get("source_file", {})
+    image_ref = source_file.get("file_name", "")
+    return {
+        "frame": analysis_frame(file_id, analysis),
+        # only what DefectTable reads: the table is built without detail
+        "table_row": (file_id, {
+            "source_file": {k: source_file[k] for k in ("file_name", "zone_name") if k in source_file},
+            "vision": {"defects": [{name: d[name] for name in CATEGORICAL if name in d} for d in defects]},
+        }),
+        "def_all": [
+            def_all_row(d, d.get("categorie", "AUTRE"), d.get("origin_layer", "SURFACE"), d.get("gravite", 2), image_ref)
+            for d in defects
+        ],
+    }
+
+
+class AnalysisContributions:
+    """analysis_contribution() of each analysis, in file-id order."""
+
+    def __init__(self, shares: List[Dict[str, Any]]):
+        self.shares = [share for share in shares if "frame" in share]
+
+    def __len__(self) -> int:
+        return len(self.shares)
+
+    def frames(self) -> List[Dict[str, Any]]:
+        # copies: the shares are memoized, the phase fills in sha256
+        return [dict(share["frame"]) for share in self.shares]
+
+    def table(self) -> DefectTable:
+        return DefectTable.from_analyses((share["table_row"] for share in self.shares), detail=False)
+
+    def def_all(self) -> List[Dict[str, Any]]:
+        return [row for share in self.shares for row in share["def_all"]]
+
+
+def load_analysis_contributions(analysis_dir, memo: Memo, digest: Callable[[Path], str]) -> AnalysisContributions:
+    """Contributions of every analysis, memoized under the digests of its files.
+
+    Only file ids with a new or changed file (re-downloaded copies
+    included) are re-read, on a thread pool, and re-derived.
+    """
+    if not Path(analysis_dir).exists():
+        print(f"[WARNING] Analysis directory not found: {analysis_dir}")
+        return AnalysisContributions([])
+    groups = group_by_file_id(analysis_files(analysis_dir))
+    keys = {file_id: hash_parts(file_id, [(p.name, digest(p)) for p in paths]) for file_id, paths in groups.items()}
+    shares = {file_id: memo.get(key) for file_id, key in keys.items()}
+    changed = [file_id for file_id, share in shares.items() if share is None]
+
+    def derive(file_id: str) -> Dict[str, Any]:
+        _, kept, analysis, _, errors = read_group(file_id, groups[file_id])
+        share = analysis_contribution(file_id, analysis) if kept is not None else {}
+        share["errors"] = errors
+        return share
+
+    if len(changed) > THREAD_CHUNK:
+        with ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) + 4)) as pool:
+            derived = list(pool.map(derive, changed))
+    else:
+        derived = list(map(derive, changed))
+    for file_id, share in zip(changed, derived):
+        memo.put(keys[file_id], share)
+        shares[file_id] = share
+
+    for share in shares.values():
+        for name, error in share["errors"]:
+            print(f"[WARNING] Could not load {name}: {error}")
+    contributions = AnalysisContributions(list(shares.values()))
+    print(f"[OK] Loaded {len(contributions)} analysis results from {analysis_dir} "
+          f"({len(changed)} file id(s) re-read, the rest memoized)")
+    return contributions
+
+
 def execute_phase_vision_analysis(
     images_db: Dict,
-    analysis_results: Dict[str, Dict[str, Any]],
-    controlpanel: Dict
+    analysis_results: Union[Dict[str, Dict[str, Any]], AnalysisContributions],
+    controlpanel: Dict,
+    digest: Callable[[Path], str] = sha256_file,
 ) -> Dict[str, Any]:
-    """Execute VISION_ANALYSIS phase."""
+    """Execute VISION_ANALYSIS phase.
+
+    Frames get the SHA-256 of their photo; `digest` lets the caller
+    memoize it (PhaseCache.digests).
+    """
     print("\n=== PHASE 2: VISION_ANALYSIS ===")
+    photos_dir = photos_dir_of(controlpanel)
     
     vision_result = {
         "step": "VISION_ANALYSIS",
@@ -119,60 +265,42 @@ def execute_phase_vision_analysis(
     }
     
     # Process analysis results into frames
-    frames = []
-    for file_id, analysis in analysis_results.items():
-        vision_data = analysis.get("vision", {})
-        defects = vision_data.get("defects", [])
-        annotations = vision_data.get("annotations", [])
-        
-        source_file = analysis.get("source_file", {})
-        frame = {
-            "id": int(file_id) if file_id.isdigit() else 0,
-            "file": source_file.get("file_name", ""),
-            "sha256": "",  # Would be computed during ingestion
-            "width": source_file.get("file_img_width", 0),
-            "height": source_file.get("file_img_height", 0),
-            "annotations": annotations,
-            "defects_count": len(defects)
-        }
-        frames.append(frame)
+    if isinstance(analysis_results, AnalysisContributions):
+        frames = analysis_results.frames()
+    else:
+        frames = [analysis_frame(file_id, analysis) for file_id, analysis in analysis_results.items()]
+    for frame in frames:
+        photo = photos_dir / frame["file"]
+        if photo.name and photo.is_file():
+            frame["sha256"] = digest(photo)
     
     vision_result["outputs"]["frames"] = frames
     print(f"[OK] Vision analysis complete: {len(frames)} frames processed")
     return vision_result
 
 
-def execute_phase_defect_detection(analysis_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+def execute_phase_defect_detection(
+    analysis_results: Union[Dict[str, Dict[str, Any]], DefectTable, AnalysisContributions]
+) -> Dict[str, Any]:
     """Execute DEFECT_DETECTION phase."""
     print("\n=== PHASE 3: DEFECT_DETECTION ===")
     
-    defect_stats = analyze_defects(analysis_results)
-    
-    # Aggregate all defects
-    def_all = []
-    for file_id, analysis in analysis_results.items():
-        defects = analysis.get("vision", {}).get("defects", [])
-        source_file = analysis.get("source_file", {})
-        
-        for defect in defects:
-            defect_entry = {
-                "id_defaut": defect.get("id_defaut", ""),
-                "categorie": defect.get("categorie", "AUTRE"),
-                "type_defaut": defect.get("type_defaut", ""),
-                "origin_layer": defect.get("origin_layer", "SURFACE"),
-                "gravite_technique": defect.get("gravite", 2),
-                "image_ref": source_file.get("file_name", ""),
-                "style": defect.get("style", "MAJEUR"),
-                "incertitude": defect.get("incertitude", 0.0),
-                "regle_ref": defect.get("regle_ref", {
-                    "doc_id": "UNKNOWN",
-                    "source_page": "",
-                    "article_id": ""
-                }),
-                "polygons_norm": defect.get("polygons_norm", []),
-                "polylines_norm": defect.get("polylines_norm", [])
-            }
-            def_all.append(defect_entry)
+    table = analysis_results
+    if isinstance(table, AnalysisContributions):
+        table, def_all = analysis_results.table(), analysis_results.def_all()
+    else:
+        if not isinstance(table, DefectTable):
+            table = DefectTable.from_analyses(analysis_results)
+        # Aggregate all defects: categorical fields come decoded from the table
+        rows = zip(
+            table.defects,
+            table.decoded("categorie", "AUTRE"),
+            table.decoded("origin_layer", "SURFACE"),
+            table.decoded("gravite", 2),
+            table.per_row(table.file_names, ""),
+        )
+        def_all = [def_all_row(*row) for row in rows]
+    defect_stats = analyze_defects(table)
     
     defect_detection_result = {
         "step": "DEFECT_DETECTION",
@@ -180,7 +308,7 @@ def execute_phase_defect_detection(analysis_results: Dict[str, Dict[str, Any]])
         "skipped": False,
         "status": "success",
         "inputs": {
-            "analysis_results_count": len(analysis_results)
+            "analysis_results_count": table.n_images
         },
         "outputs": {
             "def_all_count": len(def_all),
@@ -193,33 +321,40 @@ def execute_phase_defect_detection(analysis_results: Dict[str, Dict[str, Any]])
     return defect_detection_result
 
 
-def execute_phase_norm_reference_link(def_all: List[Dict], docs_index: Dict) -> Dict[str, Any]:
+def execute_phase_norm_reference_link(
+    def_all: List[Dict],
+    docs_index: Dict,
+    lookup: Optional[DocLookup] = None
+) -> Dict[str, Any]:
     """Execute NORM_REFERENCE_LINK phase."""
     print("\n=== PHASE 4: NORM_REFERENCE_LINK ===")
     
-    # Link defects to document references
+    if lookup is None:
+        lookup = DocLookup.from_docs_index(docs_index)
+    
+    # Link defects to document references ({doc_id, ...} or {norme, partie})
     linked_count = 0
     citations = []
+    unresolved = defaultdict(int)
     
     for defect in def_all:
-        regle_ref = defect.get("regle_ref", {})
-        doc_id = regle_ref.get("doc_id", "UNKNOWN")
-        
-        if doc_id != "UNKNOWN":
-            # Find document in docs_index
-            for doc in docs_index.get("documents", []):
-                if doc.get("id") == doc_id or doc.get("code") == doc_id:
-                    citation = {
-                        "defect_id": defect.get("id_defaut", ""),
-                        "doc_id": doc_id,
-                        "doc_title": doc.get("title", ""),
-                        "doc_url": doc.get("url", ""),
-                        "source_page": regle_ref.get("source_page", ""),
-                        "article_id": regle_ref.get("article_id", "")
-                    }
-                    citations.append(citation)
-                    linked_count += 1
-                    break
+        regle_ref = defect.get("regle_ref") or {}
+        doc = lookup.resolve(regle_ref)
+        if doc is None:
+            ref = regle_ref.get("norme") or regle_ref.get("doc_id")
+            if ref and ref != "UNKNOWN":
+                unresolved[ref] += 1
+            continue
+        citation = {
+            "defect_id": defect.get("id_defaut", ""),
+            "doc_id": doc.get("id", ""),
+            "doc_title": doc.get("title", ""),
+            "doc_url": doc.get("url", ""),
+            "source_page": regle_ref.get("source_page", ""),
+            "article_id": regle_ref.get("article_id") or regle_ref.get("partie", "")
+        }
+        citations.append(citation)
+        linked_count += 1
     
     norm_link_result = {
         "step": "NORM_REFERENCE_LINK",
@@ -232,7 +367,8 @@ def execute_phase_norm_reference_link(def_all: List[Dict], docs_index: Dict) ->
         },
         "outputs": {
             "linked_defects": linked_count,
-            "citations": citations
+            "citations": citations,
+            "unresolved_refs": dict(sorted(unresolved.items(), key=lambda kv: -kv[1]))
         }
     }
     
@@ -279,8 +415,248 @@ def execute_phase_reporting(
     return report
 
 
-def main():
+def load_analysis_from_store(db_path: Path) -> Dict[str, Dict[str, Any]]:
+    with AnalysisStore(db_path) as store:
+        results = store.load_results()
+    print(f"[OK] Loaded {len(results)} analysis results from {db_path}")
+    return results
+
+
+def build_phases(
+    controlpanel: Optional[Dict] = None,
+    cache: Optional[PhaseCache] = None,
+    analysis_db: Optional[Path] = None,
+) -> List[Phase]:
+    """Pipeline phases with the artifacts each one reads and writes.
+
+    With a cache, phases that read files directly get a fingerprint of
+    those files, and every phase is versioned by the hash of its code.
+    With `analysis_db`, analyses come from that store instead of the
+    JSON directory (see analysis_store.py ingest).
+    """
+    photos_dir = photos_dir_of(controlpanel)
+    digest = cache.digests.digest if cache is not None else sha256_file
+
+    def files(*paths):
+        if cache is None:
+            return None
+        return lambda: cache.fingerprint_files(p for p in (Path(x) for x in paths) if p.exists())
+
+    def analysis_fingerprint():
+        if analysis_db is not None:
+            with AnalysisStore(analysis_db) as store:
+                return store.fingerprint()
+        if not Path(ANALYSIS_RESULTS_DIR).exists():
+            return None
+        return cache.fingerprint_files(analysis_files(ANALYSIS_RESULTS_DIR))
+
+    if analysis_db is not None:
+        load_analysis = Phase(
+            "LOAD_ANALYSIS", lambda: {"analysis_results": load_analysis_from_store(analysis_db)},
+            outputs=["analysis_results"], always=True,
+            version=code_version(load_analysis_from_store, AnalysisStore.load_results, AnalysisStore.iter_results),
+            fingerprint=analysis_fingerprint if cache is not None else None, store=False)
+    elif cache is not None:
+        # Never stored as a whole: each analysis's contribution is memoized
+        # under its files' digests, and only changed files are re-read
+        version = code_version(load_analysis_contributions, analysis_contribution, analysis_frame, def_all_row,
+                               unknown_regle_ref, read_group, analysis_files)
+        memo = cache.memo("analysis_contributions", version)
+        load_analysis = Phase(
+            "LOAD_ANALYSIS",
+            lambda: {"analysis_results": load_analysis_contributions(ANALYSIS_RESULTS_DIR, memo, digest)},
+            outputs=["analysis_results"], always=True, version=version,
+            fingerprint=analysis_fingerprint, store=False)
+    else:
+        load_analysis = Phase(
+            "LOAD_ANALYSIS", lambda: {"analysis_results": load_analysis_results(ANALYSIS_RESULTS_DIR)},
+            outputs=["analysis_results"], always=True,
+            version=code_version(load_analysis_results, AnalysisLoader, read_group, analysis_files),
+            fingerprint=analysis_fingerprint if cache is not None else None, store=False)
+
+    def photos_fingerprint():
+        # INGESTION only counts the photos: their names are enough
+        return hash_parts(sorted(p.name for p in photos_dir.glob("*.jpg")) if photos_dir.exists() else [])
+
+    def photos_content_fingerprint():
+        # VISION_ANALYSIS records each photo's SHA-256 (memoized on stat)
+        if not photos_dir.exists():
+            return None
+        return cache.fingerprint_files(sorted(p for p in photos_dir.iterdir() if p.is_file()))
+
+    return [
+        Phase("LOAD_IMAGES_DB", lambda: {"images_db": load_images_db()},
+              outputs=["images_db"], always=True,
+              version=code_version(load_json_file), fingerprint=files(IMAGES_DB_PATH)),
+        Phase("LOAD_DOCS_INDEX", lambda: {"docs_index": load_docs_index()},
+              outputs=["docs_index"], always=True,
+              version=code_version(load_json_file), fingerprint=files(DOCS_INDEX_PATH)),
+        load_analysis,
+        Phase("INGESTION",
+              lambda images_db, docs_index, controlpanel: {
+                  "ingestion": execute_phase_ingestion(images_db, docs_index, controlpanel)},
+              inputs=["images_db", "docs_index", "controlpanel"], outputs=["ingestion"],
+              version=code_version(execute_phase_ingestion), fingerprint=photos_fingerprint),
+        Phase("VISION_ANALYSIS",
+              lambda images_db, analysis_results, controlpanel: {
+                  "vision_analysis": execute_phase_vision_analysis(images_db, analysis_results, controlpanel, digest)},
+              inputs=["images_db", "analysis_results", "controlpanel"], outputs=["vision_analysis"],
+              version=code_version(execute_phase_vision_analysis, photos_dir_of, AnalysisContributions),
+              fingerprint=photos_content_fingerprint if cache is not None else None),
+        # One pass over the analyses, shared by the phases that count or list defects
+        # (contributions carry their table rows already)
+        Phase("DEFECT_TABLE",
+              lambda analysis_results: {"defect_table": analysis_results
+                                        if isinstance(analysis_results, AnalysisContributions)
+                                        else DefectTable.from_analyses(analysis_results)},
+              inputs=["analysis_results"], outputs=["defect_table"], always=True, store=False,
+              version=code_version(DefectTable, Categories)),
+        Phase("DEFECT_DETECTION",
+              lambda defect_table: {"defect_detection": execute_phase_defect_detection(defect_table)},
+              inputs=["defect_table"], outputs=["defect_detection"],
+              version=code_version(execute_phase_defect_detection, def_all_row, unknown_regle_ref, analyze_defects,
+                                   AnalysisContributions, DefectTable, Categories)),
+        # Built once and shared by every phase that links defects to documents
+        Phase("DOC_LOOKUP", lambda docs_index: {"doc_lookup": DocLookup.from_docs_index(docs_index)},
+              inputs=["docs_index"], outputs=["doc_lookup"], always=True, store=False,
+              version=code_version(DocLookup, normalize_norm, without_year)),
+        Phase("NORM_REFERENCE_LINK",
+              lambda defect_detection, docs_index, doc_lookup: {
+                  "norm_reference_link": execute_phase_norm_reference_link(
+                      defect_detection["outputs"]["def_all"], docs_index, doc_lookup)},
+              inputs=["defect_detection", "docs_index", "doc_lookup"], outputs=["norm_reference_link"],
+              version=code_version(execute_phase_norm_reference_link)),
+        Phase("REPORTING",
+              lambda ingestion, vision_analysis, defect_detection, norm_reference_link: {
+                  "report": execute_phase_reporting(ingestion, vision_analysis, defect_detection, norm_reference_link)},
+              inputs=["ingestion", "vision_analysis", "defect_detection", "norm_reference_link"],
+              outputs=["report"], version=code_version(execute_phase_reporting)),
+    ]
+
+
+# Phases the sequential pipeline always ran: on by default whatever defaults_active says
+ALWAYS_ON_PHASES = ("INGESTION", "VISION_ANALYSIS", "DEFECT_DETECTION", "NORM_REFERENCE_LINK", "REPORTING")
+
+
+def active_phases(controlpanel: Dict, enable: List[str] = (), disable: List[str] = ()) -> Dict[str, bool]:
+    """defaults_active from pipeline.sequence, with command-line overrides.
+
+    ALWAYS_ON_PHASES keep the full report of a plain run; --disable turns them off.
+    """
+    active = dict(controlpanel.get("pipeline", {}).get("defaults_active", {}))
+    active.update(dict.fromkeys(ALWAYS_ON_PHASES, True))
+    for name in enable:
+        active[name.upper()] = True
+    for name in disable:
+        active[name.upper()] = False
+    return active
+
+
+def skipped_result(step: str, reason: str) -> Dict[str, Any]:
+    return {"step": step, "active": False, "skipped": True, "status": "skipped", "reason": reason}
+
+
+def assemble_report(artifacts: Dict[str, Any], scheduler: PhaseScheduler) -> Dict[str, Any]:
+    """REPORTING's output when it ran, else the raw results of the phases that did."""
+    if scheduler.status.get("REPORTING") == "success":
+        return artifacts["report"]
+    results = {}
+    for name in ("INGESTION", "VISION_ANALYSIS", "DEFECT_DETECTION", "NORM_REFERENCE_LINK"):
+        key = name.lower()
+        results[key] = artifacts.get(key) or skipped_result(name, scheduler.reasons.get(name, ""))
+    return {
+        "meta": {
+            "generated_at": datetime.now().isoformat() + "Z",
+            "report_level": 0
+        },
+        "pipeline_results": results,
+    }
+
+
+def schedule_section(controlpanel: Dict, scheduler: PhaseScheduler, cache: Optional[PhaseCache]) -> Dict[str, Any]:
+    sequence = {name: scheduler.status.get(name, "not_implemented")
+                for name in controlpanel.get("pipeline", {}).get("sequence", [])}
+    # a reused report body keeps the meta.generated_at of the run that rendered it
+    section = dict(scheduler.summary(), generated_at=datetime.now().isoformat() + "Z", sequence=sequence)
+    if cache is not None:
+        section["cache"] = cache.stats()
+    return section
+
+
+def report_suffix(indent: Optional[int], compress: bool) -> str:
+    return (".json" if indent is not None else ".min.json") + (".gz" if compress else "")
+
+
+def write_report_body(out, report: Dict[str, Any], indent: Optional[int] = 2, compress: bool = False):
+    """Stream the report's members to `out`, leaving its object open."""
+    with maybe_gzip(out, compress) as f:
+        writer = JSONStreamWriter(f, indent)
+        writer.begin_object()
+        for name, value in report.items():
+            writer.member(name, value)
+        writer.flush()
+
+
+def render_report(artifacts, scheduler: PhaseScheduler, cache: Optional[PhaseCache],
+                  indent: Optional[int] = 2, compress: bool = False):
+    """(report body, summary or None). The body is the report to stream or,
+    with a cache, the file its members were streamed to; when no phase
+    result changed that file is reused from a previous run as-is, so its
+    meta.generated_at is the time it was rendered, not this run's time
+    (which is schedule.generated_at).
+    """
+    if cache is None:
+        report = assemble_report(artifacts, scheduler)
+        return report, report.get("summary")
+    key = hash_parts("report", code_version(assemble_report, write_report_body), indent, compress,
+                     sorted((n, scheduler.keys.get(n), s) for n, s in scheduler.status.items()))
+    suffix = report_suffix(indent, compress)
+    path = cache.text_path(key, suffix)
+    if path is not None:
+        return path, cache.load(key)
+    report = assemble_report(artifacts, scheduler)
+    with cache.open_text(key, suffix) as out:
+        write_report_body(out, report, indent, compress)
+    cache.store(key, report.get("summary"))
+    return cache.text_path(key, suffix), report.get("summary")
+
+
+def write_report(path: str, body, schedule: Dict[str, Any], indent: Optional[int] = 2, compress: bool = False):
+    """Write the report body, then append its "schedule" key and closing brace.
+
+    Compressed, the tail is a gzip member of its own after the body's.
+    """
+    with open(path, "wb") as out:
+        if isinstance(body, Path):
+            with open(body, "rb") as src:
+                shutil.copyfileobj(src, out, 1 << 20)
+        else:
+            write_report_body(out, body, indent, compress)
+        with maybe_gzip(out, compress) as f:
+            writer = JSONStreamWriter(f, indent)
+            writer.resume_object()
+            writer.member("schedule", schedule)
+            writer.end()
+            writer.flush()
+
+
+def main(argv: Optional[List[str]] = None):
     """Main pipeline execution."""
+    parser = argparse.ArgumentParser(description="Run the ArBot vision pipeline")
+    parser.add_argument("--workers", type=int, default=4, help="Phases run concurrently (default 4)")
+    parser.add_argument("--enable", action="append", default=[], metavar="PHASE",
+                        help="Run a phase even if defaults_active switches it off (repeatable)")
+    parser.add_argument("--disable", action="append", default=[], metavar="PHASE",
+                        help="Skip a phase (repeatable)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every phase")
+    parser.add_argument("--analysis-db", type=Path, default=None, metavar="DB",
+                        help="Read analyses from this store (analysis_store.py ingest) instead of the JSON directory")
+    parser.add_argument("--compact", action="store_true", help="Write the report without indentation")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the report (.json.gz)")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR,
+                        help=f"Phase result cache (default {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args(argv)
+
     print("=" * 60)
     print("ArBot Vision Pipeline Execution")
     print("=" * 60)
@@ -292,47 +668,42 @@ def main():
     print(f"[OK] Control panel loaded: version {controlpanel.get('schema_version', 'N/A')}")
     print()
     
-    # Load data
-    print("Loading project data...")
-    images_db = load_images_db()
-    docs_index = load_docs_index()
-    analysis_results = load_analysis_results(ANALYSIS_RESULTS_DIR)
-    print()
-    
     # Create output directory
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # Execute pipeline phases
-    ingestion_result = execute_phase_ingestion(images_db, docs_index, controlpanel)
-    vision_result = execute_phase_vision_analysis(images_db, analysis_results, controlpanel)
-    defect_result = execute_phase_defect_detection(analysis_results)
-    norm_link_result = execute_phase_norm_reference_link(
-        defect_result["outputs"]["def_all"],
-        docs_index
-    )
-    report = execute_phase_reporting(
-        ingestion_result,
-        vision_result,
-        defect_result,
-        norm_link_result
+    # Execute pipeline phases (data loading included) in dependency order
+    cache = None if args.no_cache else PhaseCache(args.cache_dir)
+    scheduler = PhaseScheduler(
+        build_phases(controlpanel, cache, args.analysis_db), active_phases(controlpanel, args.enable, args.disable),
+        workers=args.workers, cache=cache,
     )
+    artifacts = scheduler.run({"controlpanel": controlpanel})
+    indent = None if args.compact else 2
+    body, summary = render_report(artifacts, scheduler, cache, indent, args.gzip)
     
     # Save pipeline report
-    with open(REPORT_OUTPUT, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    report_path = REPORT_OUTPUT + (".gz" if args.gzip else "")
+    write_report(report_path, body, schedule_section(controlpanel, scheduler, cache), indent, args.gzip)
+    if cache is not None:
+        cache.save()
     
     print()
     print("=" * 60)
     print("[OK] Pipeline Execution Complete!")
     print("=" * 60)
-    print(f"Report saved to: {REPORT_OUTPUT}")
+    print(f"Report saved to: {report_path}")
     print()
-    print("Summary:")
-    print(f"  - Images processed: {report['summary']['total_images']}")
-    print(f"  - Documents indexed: {report['summary']['total_documents']}")
-    print(f"  - Frames analyzed: {report['summary']['frames_analyzed']}")
-    print(f"  - Defects detected: {report['summary']['defects_detected']}")
-    print(f"  - Defects linked to norms: {report['summary']['defects_linked']}")
+    print(scheduler.report())
+    if cache is not None:
+        print(f"Cache: {json.dumps(cache.stats())}")
+    if summary:
+        print()
+        print("Summary:")
+        print(f"  - Images processed: {summary['total_images']}")
+        print(f"  - Documents indexed: {summary['total_documents']}")
+        print(f"  - Frames analyzed: {summary['frames_analyzed']}")
+        print(f"  - Defects detected: {summary['defects_detected']}")
+        print(f"  - Defects linked to norms: {summary['defects_linked']}")
     print()
 
 
@@ -9,10 +9,14 @@ import json
 import os
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterable, Mapping, Optional, Tuple, Union
 from collections import defaultdict
 import argparse
 
+from analysis_loader import JSON_BACKEND, AnalysisLoader, analysis_files
+from analysis_store import AnalysisStore
+from defect_table import DefectTable
+
 # File paths
 IMAGES_DB_PATH = "json/images_db.json"
 DOCS_INDEX_PATH = "json/docs_index.json"
@@ -20,6 +24,9 @@ ANALYSIS_RESULTS_DIR = "docs/To validate/ArBot-Core,_v1.4_OUT_JSON"
 OUTPUT_REPORT_DIR = "reports"
 OUTPUT_REPORT_PATH = f"{OUTPUT_REPORT_DIR}/assessment_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
 
+# A results dict, or the (file_id, analysis) stream of AnalysisLoader.iter_results()
+AnalysisResults = Union[Mapping[str, Dict[str, Any]], Iterable[Tuple[str, Dict[str, Any]]]]
+
 
 def load_json_file(file_path: str) -> Dict[str, Any]:
     """Load a JSON file and return its contents."""
@@ -46,79 +53,63 @@ def load_docs_index() -> Dict[str, Any]:
     return load_json_file(DOCS_INDEX_PATH)
 
 
-def load_analysis_results(analysis_dir: str = ANALYSIS_RESULTS_DIR) -> Dict[str, Dict[str, Any]]:
-    """Load all analysis result JSON files."""
-    analysis_results = {}
+def load_analysis_results(
+    analysis_dir: str = ANALYSIS_RESULTS_DIR,
+    workers: Optional[int] = None,
+    processes: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """Load all analysis result JSON files (parsed in parallel, see analysis_loader)."""
     analysis_path = Path(analysis_dir)
     
     if not analysis_path.exists():
         print(f"[WARNING] Analysis directory not found: {analysis_dir}")
-        return analysis_results
-    
-    # Load all JSON files except DEF_ALL.json and other aggregate files
-    json_files = list(analysis_path.glob("*_analysis.json"))
-    json_files = [f for f in json_files if f.name not in ["DEF_ALL.json", "IMG_GEN_analysis.json"]]
+        return {}
     
-    for json_file in json_files:
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Extract file ID from filename or from data
-                file_id = json_file.stem.replace('_analysis', '').split('_')[0]
-                analysis_results[file_id] = data
-        except Exception as e:
-            print(f"[WARNING] Could not load {json_file.name}: {e}")
-    
-    print(f"[OK] Loaded {len(analysis_results)} analysis results from {analysis_dir}")
+    loader = AnalysisLoader(analysis_path, workers, processes)
+    analysis_results = loader.load()
+    report_loader(loader)
     return analysis_results
 
 
-def analyze_defects(analysis_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze defects from vision analysis results."""
-    defect_stats = {
-        'total_images_analyzed': len(analysis_results),
-        'total_defects': 0,
-        'defects_by_category': defaultdict(int),
-        'defects_by_severity': defaultdict(int),
-        'defects_by_zone': defaultdict(int),
-        'images_with_defects': 0,
-        'images_without_defects': 0,
-    }
-    
-    for file_id, analysis in analysis_results.items():
-        defects = analysis.get('vision', {}).get('defects', [])
-        if defects:
-            defect_stats['images_with_defects'] += 1
-            defect_stats['total_defects'] += len(defects)
-            
-            # Get zone from source_file
-            zone_name = analysis.get('source_file', {}).get('zone_name', 'UNKNOWN')
-            defect_stats['defects_by_zone'][zone_name] += len(defects)
-            
-            for defect in defects:
-                category = defect.get('categorie', 'UNKNOWN')
-                severity = defect.get('gravite', 'UNKNOWN')
-                defect_stats['defects_by_category'][category] += 1
-                defect_stats['defects_by_severity'][str(severity)] += 1
-        else:
-            defect_stats['images_without_defects'] += 1
-    
-    return defect_stats
+def report_loader(loader: AnalysisLoader):
+    """Print parse errors and duplicate resolution of a finished load."""
+    for name, error in loader.errors.items():
+        print(f"[WARNING] Could not load {name}: {error}")
+    if loader.duplicates:
+        print(f"[OK] Resolved re-downloaded copies for {len(loader.duplicates)} file id(s) "
+              f"(newest generated_at kept)")
+    print(f"[OK] Loaded {loader.loaded} analysis results from {loader.analysis_dir} "
+          f"({loader.workers} {'process' if loader.processes else 'thread'}(s), {JSON_BACKEND})")
+
+
+def analyze_defects(analysis_results: AnalysisResults) -> Dict[str, Any]:
+    """Analyze defects from vision analysis results (a dict, a single-pass stream or a DefectTable)."""
+    if not isinstance(analysis_results, DefectTable):
+        analysis_results = DefectTable.from_analyses(analysis_results, detail=False)
+    return analysis_results.stats()
 
 
 def generate_assessment_report(
     images_db: Dict[str, Any],
     docs_index: Dict[str, Any],
-    analysis_results: Dict[str, Dict[str, Any]],
+    analysis_results: Union[AnalysisResults, DefectTable],
     output_path: str = OUTPUT_REPORT_PATH
 ) -> str:
-    """Generate a comprehensive assessment report."""
+    """Generate a comprehensive assessment report.
+
+    `analysis_results` may be a stream: it is read once into a DefectTable
+    (without per-defect detail) that every section below is computed from.
+    """
     
     # Create reports directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
     
+    table = analysis_results
+    if not isinstance(table, DefectTable):
+        table = DefectTable.from_analyses(analysis_results, detail=False)
+
     # Analyze defects
-    defect_stats = analyze_defects(analysis_results)
+    defect_stats = analyze_defects(table)
     
     # Generate report
     report_lines = []
@@ -210,18 +201,8 @@ def generate_assessment_report(
     report_lines.append("| Image ID | File Name | Defect Count | Categories |")
     report_lines.append("|----------|-----------|--------------|------------|")
     
-    # Sort images by defect count
-    image_defect_counts = []
-    for file_id, analysis in analysis_results.items():
-        defects = analysis.get('vision', {}).get('defects', [])
-        if defects:
-            categories = set(d.get('categorie', 'UNKNOWN') for d in defects)
-            file_name = analysis.get('source_file', {}).get('file_name', 'N/A')
-            image_defect_counts.append((file_id, file_name, len(defects), categories))
-    
-    image_defect_counts.sort(key=lambda x: x[2], reverse=True)
-    
-    for file_id, file_name, defect_count, categories in image_defect_counts[:20]:  # Top 20
+    # Images with the most defects
+    for file_id, file_name, defect_count, categories in table.top_images(20):
         categories_str = ', '.join(sorted(categories))
         report_lines.append(f"| {file_id} | {file_name} | {defect_count} | {categories_str} |")
     
@@ -261,6 +242,10 @@ def main():
     parser.add_argument('--analysis-dir', default=ANALYSIS_RESULTS_DIR, help='Directory containing analysis results')
     parser.add_argument('--output', default=OUTPUT_REPORT_PATH, help='Output report path')
     parser.add_argument('--skip-analysis', action='store_true', help='Skip loading analysis results')
+    parser.add_argument('--load-workers', type=int, default=None, help='Parallel parsers for analysis files')
+    parser.add_argument('--processes', action='store_true', help='Parse analysis files in worker processes')
+    parser.add_argument('--analysis-db', default=None,
+                        help='Read analyses from this store (analysis_store.py ingest) instead of --analysis-dir')
     
     args = parser.parse_args()
     
@@ -279,11 +264,20 @@ def main():
     docs_index = load_docs_index()
     print()
     
-    # Step 3: Load analysis results
+    # Step 3: Load analysis results (streamed into the report, never held all at once)
     analysis_results = {}
+    loader = None
+    store = None
     if not args.skip_analysis:
-        print("Step 3: Loading vision analysis results...")
-        analysis_results = load_analysis_results(args.analysis_dir)
+        print("Step 3: Streaming vision analysis results into the report...")
+        if args.analysis_db:
+            store = AnalysisStore(args.analysis_db)
+            analysis_results = store.iter_results()
+        elif Path(args.analysis_dir).exists():
+            loader = AnalysisLoader(args.analysis_dir, args.load_workers, args.processes)
+            analysis_results = loader.iter_results()
+        else:
+            print(f"[WARNING] Analysis directory not found: {args.analysis_dir}")
         print()
     else:
         print("Step 3: Skipping analysis results (--skip-analysis)")
@@ -297,6 +291,13 @@ def main():
         analysis_results=analysis_results,
         output_path=args.output
     )
+    if loader is not None:
+        report_loader(loader)
+    loaded = loader.loaded if loader is not None else 0
+    if store is not None:
+        loaded = store.count()
+        print(f"[OK] Loaded {loaded} analysis results from {args.analysis_db}")
+        store.close()
     print()
     
     print("=" * 60)
@@ -307,7 +308,7 @@ def main():
     print("Summary:")
     print(f"  - Images in database: {images_db.get('count', 0)}")
     print(f"  - Documents indexed: {docs_index.get('total_documents', 0)}")
-    print(f"  - Analysis results loaded: {len(analysis_results)}")
+    print(f"  - Analysis results loaded: {loaded}")
     print()
 
 
@@ -9,11 +9,21 @@ Sorties :
 - manifest_images_parsed.json (ingestion)
 - manifest_report.json
 - unparsed_filenames.txt (si besoin)
+
+Incrémental : un cache (.manifest_cache.json dans --out-dir) garde sha256 et
+dimensions par fichier, clé (chemin, taille, mtime_ns, inode). Un fichier
+inchangé n'est jamais relu : un rescan à chaud ne coûte que des stat().
+Les fichiers nouveaux ou modifiés sont hachés et sondés en parallèle
+(--workers threads, ou processus avec --processes).
 """
 
-import os, re, json, argparse, hashlib
+import os, re, sys, json, argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image, ExifTags
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_probe import image_info  # lecture des en-têtes seulement, PIL en repli
+from file_hash import file_digests, refresh_digests
 
 # --------- Convention (STRICT) ----------
 NAME_PATTERN = re.compile(
@@ -30,39 +40,75 @@ ZONE = {0:"CHANTIER",1:"PLAN",2:"SDB",3:"WC"}
 CAT  = {0:"VUE GENERALE",1:"PLOMBERIE",2:"BAIGNOIRE",3:"CARRELAGE",4:"FENETRE",5:"PLAFOND",6:"PLATRERIE",7:"SANITAIRE",8:"PLACARD",9:"EXISTANT"}
 VIEW = {"PAN":"VUE PANORAMIQUE","GEN":"VUE GENERALE","DET":"VUE PROCHE","MAC":"VUE MACRO","MGM":"INTERACTION MUR-MUR","MGS":"INTERACTION MUR-SOL","MGP":"INTERACTION MUR-PLAFOND","MGB":"INTERACTION MUR-BAIGNOIRE","DEG":"DEGAT SUR EXISTANT"}
 
-# EXIF orientation tag id
-EXIF_ORIENT_TAG = next((k for k,v in ExifTags.TAGS.items() if v == 'Orientation'), 274)
-
-def sha256_file(p, bs=1<<20):
-    h = hashlib.sha256()
-    with open(p,'rb') as f:
-        for b in iter(lambda: f.read(bs), b''):
-            h.update(b)
-    return h.hexdigest()
+CACHE_NAME = ".manifest_cache.json"
+CACHE_VERSION = 2
 
 def image_meta(p):
     """retourne (w,h,exif_orientation:int|None,orientation:str)"""
-    try:
-        with Image.open(p) as im:
-            w, h = im.size
-            exif_o = None
-            try:
-                exif = im.getexif()
-                if exif:
-                    exif_o = int(exif.get(EXIF_ORIENT_TAG)) if exif.get(EXIF_ORIENT_TAG) else None
-            except Exception:
-                exif_o = None
-    except Exception:
+    info = image_info(p)
+    if info is None:
         return (0,0,None,"UNKNOWN")
+    w, h, exif_o, _ = info
+    exif_o = int(exif_o) if exif_o else None
     if w==h: orient = "square"
     elif w>h: orient = "landscape"
     else: orient = "portrait"
     return (int(w), int(h), exif_o, orient)
 
+def probe_file(p, old=None):
+    """(sha256, empreinte rapide, (w,h,exif_orientation,orientation)) : tout ce qui exige de lire le fichier.
+    old = entrée de cache périmée de même taille : si le contenu n'a pas changé
+    (touché seulement), ses métadonnées sont reprises sans rouvrir l'image"""
+    if old is not None:
+        file_hash, fast = refresh_digests(p, old[3], old[4])
+        if file_hash == old[3]:
+            return file_hash, fast, tuple(old[5:])
+    else:
+        file_hash, fast = file_digests(p)
+    return file_hash, fast, image_meta(p)
+
+def stat_key(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+def load_cache(path):
+    """{chemin absolu: [taille, mtime_ns, inode, sha256, rapide, w, h, exif_o, orient]} ; {} si absent/illisible"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("entries", {})
+
+def save_cache(path, entries):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        # dumps() compact passe par l'encodeur C ; dump() encode en Python
+        f.write(json.dumps({"version": CACHE_VERSION, "entries": entries}, ensure_ascii=False, separators=(",",":")))
+    os.replace(tmp, path)
+
+def probe_all(paths, olds, workers, processes=False):
+    """probe_file() sur chaque chemin, dans l'ordre ; en parallèle si workers > 1"""
+    if workers <= 1 or len(paths) <= 1:
+        return list(map(probe_file, paths, olds))
+    pool_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        # gros lots pour les processus : un aller-retour IPC par fichier coûte cher
+        chunk = max(1, len(paths) // (workers * 4)) if processes else 1
+        return list(pool.map(probe_file, paths, olds, chunksize=chunk))
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True, help="Racine à scanner")
     ap.add_argument("--out-dir", default=".", help="Dossier de sortie")
+    ap.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                    help="Fichiers hachés/sondés en parallèle (1 = séquentiel)")
+    ap.add_argument("--processes", action="store_true", help="Pool de processus au lieu de threads")
+    ap.add_argument("--cache", default=None, help=f"Cache de métadonnées (défaut : <out-dir>/{CACHE_NAME})")
+    ap.add_argument("--no-cache", action="store_true", help="Tout relire, sans lire ni écrire le cache")
     args = ap.parse_args()
 
     root = os.path.abspath(args.root)
@@ -73,6 +119,11 @@ def main():
     path_parsed   = os.path.join(out_dir, "manifest_images_parsed.json")
     path_report   = os.path.join(out_dir, "manifest_report.json")
     path_unparsed = os.path.join(out_dir, "unparsed_filenames.txt")
+    path_cache    = None if args.no_cache else (args.cache or os.path.join(out_dir, CACHE_NAME))
+
+    cache = load_cache(path_cache)
+    fresh = {}      # entrées du cache pour les fichiers vus ce tour-ci
+    pending = []    # (rec, chemin absolu, clé stat, entrée périmée) à hacher/sonder
 
     records = []
     unparsed = []
@@ -122,8 +173,13 @@ def main():
 
             full = os.path.join(r, fn)
             rel = os.path.relpath(full, root).replace("\\","/")
-            w, h, exif_o, orient = image_meta(full)
-            file_hash = sha256_file(full)
+            key = stat_key(os.stat(full))
+            hit = cache.get(full)
+            if hit is not None and hit[:3] == key:
+                file_hash, _, w, h, exif_o, orient = hit[3:]
+                fresh[full] = hit
+            else:
+                file_hash, w, h, exif_o, orient = None, 0, 0, None, "UNKNOWN"
 
             rec = {
                 "rel_path": rel,
@@ -153,10 +209,28 @@ def main():
                 }
             }
             records.append(rec)
+            if file_hash is None:
+                # même taille : peut-être seulement touché
+                old = hit if hit is not None and hit[0] == key[0] else None
+                pending.append((rec, full, key, old))
+
+    # fichiers nouveaux ou modifiés : hachage + sondage en parallèle
+    probed = probe_all([p[1] for p in pending], [p[3] for p in pending], args.workers, args.processes)
+    for (rec, full, key, _), (file_hash, fast, (w, h, exif_o, orient)) in zip(pending, probed):
+        rec.update({
+            "sha256": file_hash,
+            "image_width_px": w,
+            "image_height_px": h,
+            "orientation": orient,
+            "exif_orientation": exif_o,
+        })
+        fresh[full] = key + [file_hash, fast, w, h, exif_o, orient]
+    if path_cache:
+        save_cache(path_cache, fresh)
 
     # manifest complet
     with open(path_manifest, "w", encoding="utf-8") as f:
-        json.dump(records, f, ensure_ascii=False, indent=2)
+        f.write(json.dumps(records, ensure_ascii=False, indent=2))
 
     # manifest ingestion minimal + dimensions/orientation
     parsed = []
@@ -178,7 +252,7 @@ def main():
             "exif_orientation": r["exif_orientation"]
         })
     with open(path_parsed, "w", encoding="utf-8") as f:
-        json.dump(parsed, f, ensure_ascii=False, indent=2)
+        f.write(json.dumps(parsed, ensure_ascii=False, indent=2))
 
     # report
     report = {
@@ -188,6 +262,8 @@ def main():
         "parsed": len(records),
         "ignored_non_conform": total_seen - len(records),
         "unparsed_listed": len(unparsed),  # devrait rester 0 en mode strict
+        "files_read": len(pending),
+        "cache_hits": len(records) - len(pending),
         "pattern_strict": NAME_PATTERN.pattern
     }
     with open(path_report, "w", encoding="utf-8") as f:
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# make_evidence_crops.py
+# Vignettes de preuve par annotation (bbox_xyxy_norm + marge, polygon_norm en masque
+# optionnel) à côté des previews, et références dans les analyses, relatives au dossier
+# des previews comme leurs url (par défaut "crops/<ann_ID>.webp") :
+#   annotation["evidence_crop"] = "crops/<ann_ID>.webp", vision["evidence_crops"] = [...]
+#
+# Lecture de tous les *_analysis.json (pour un même file id, la copie retenue par
+# analysis_loader.read_group ; les copies écartées ne sont pas modifiées). Les
+# annotations sont regroupées par photo source : chaque photo est décodée une seule
+# fois (orientation EXIF appliquée), toutes ses vignettes en sont découpées, et les
+# photos sont traitées en parallèle (pool de processus).
+#
+# Incrémental : <crops_dir>/.crops.json garde, par vignette, (sha256 de la source,
+# empreinte de la géométrie et des réglages). Une vignette est refaite seulement si
+# l'une des deux a changé ; une photo dont aucune vignette n'est à refaire n'est pas
+# décodée. Le sha256 d'une source n'est recalculé que si sa taille/mtime a changé.
+
+from pathlib import Path
+import argparse, hashlib, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw, ImageOps  # pip install pillow
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis_loader import analysis_files, group_by_file_id, read_group
+from file_hash import sha256_file
+from make_previews_and_augment_json import ensure_dir, scan_sources
+
+ANALYSIS_DIR = "docs/To validate/ArBot-Core,_v1.4_OUT_JSON"
+STATE_NAME = ".crops.json"
+STATE_VERSION = 1
+WEBP_METHOD = 4  # fixé : la méthode fait partie du résultat
+
+def crop_geometry(ann):
+    """(bbox [x0,y0,x1,y1] normalisée, polygone normalisé|None) d'une annotation ; None si rien à découper"""
+    poly = ann.get("polygon_norm") or None
+    if poly is not None:
+        poly = [[float(x), float(y)] for x, y in poly]
+    box = ann.get("bbox_xyxy_norm")
+    if box and len(box) == 4:
+        box = [float(v) for v in box]
+    elif poly:
+        xs, ys = [x for x, _ in poly], [y for _, y in poly]
+        box = [min(xs), min(ys), max(xs), max(ys)]
+    else:
+        return None
+    return box, poly
+
+def padded_box(box, pad:float):
+    """bbox élargie de `pad` (fraction de sa largeur/hauteur) de chaque côté, bornée à l'image"""
+    x0, y0, x1, y1 = box
+    dx, dy = (x1 - x0) * pad, (y1 - y0) * pad
+    return [max(0.0, x0 - dx), max(0.0, y0 - dy), min(1.0, x1 + dx), min(1.0, y1 + dy)]
+
+def geometry_hash(box, poly, params):
+    """Empreinte de ce qui définit les pixels d'une vignette, hors source"""
+    data = json.dumps([box, poly, params], separators=(",",":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+def cut_crop(im, box, poly, max_side:int, mask:bool):
+    """Vignette de `im` (déjà orientée) : bbox normalisée -> pixels, masque polygone, réduction à max_side"""
+    w, h = im.size
+    # arrondi au pixel le plus proche (0.12 * 400 ne doit pas donner 49)
+    left, top = min(round(box[0] * w), w - 1), min(round(box[1] * h), h - 1)
+    right, bottom = max(left + 1, round(box[2] * w)), max(top + 1, round(box[3] * h))
+    crop = im.crop((left, top, min(right, w), min(bottom, h)))
+    if mask and poly and len(poly) >= 3:
+        alpha = Image.new("L", crop.size, 0)
+        ImageDraw.Draw(alpha).polygon([(x * w - left, y * h - top) for x, y in poly], fill=255)
+        crop = crop.convert("RGBA")
+        crop.putalpha(alpha)
+    scale = max_side / max(crop.size)
+    if scale < 1.0:
+        crop = crop.resize((max(1, round(crop.width * scale)), max(1, round(crop.height * scale))), Image.LANCZOS)
+    return crop
+
+def build_crops(job):
+    """Tâche du pool : (src, crops_dir, [(nom, bbox, polygone)], max_side, quality, mask)
+    -> (src, secondes, [noms écrits], erreur|None) ; la source n'est décodée qu'une fois"""
+    src, crops_dir, crops, max_side, quality, mask = job
+    t0 = time.perf_counter()
+    written = []
+    try:
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            if im.mode not in ("RGB", "RGBA", "L"):
+                im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+            im.load()
+        for name, box, poly in crops:
+            dst = Path(crops_dir) / name
+            ensure_dir(dst)
+            # écriture atomique : une vignette interrompue ne remplace jamais la bonne
+            tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+            try:
+                cut_crop(im, box, poly, max_side, mask).save(tmp, "WEBP", quality=quality, method=WEBP_METHOD)
+                os.replace(tmp, dst)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+            written.append(name)
+        return src, time.perf_counter() - t0, written, None
+    except Exception as e:
+        return src, time.perf_counter() - t0, written, f"{type(e).__name__}: {e}"
+
+def run_jobs(jobs, workers:int):
+    if workers <= 1 or len(jobs) <= 1:
+        return list(map(build_crops, jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(build_crops, jobs))
+
+def load_state(path:Path):
+    """({source posix: [taille, mtime_ns, sha256]}, {vignette: [sha256 source, empreinte géométrie]})"""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}, {}
+    if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+        return {}, {}
+    return data.get("sources", {}), data.get("crops", {})
+
+def save_state(path:Path, sources, crops):
+    ensure_dir(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": STATE_VERSION, "sources": sources, "crops": crops},
+                              ensure_ascii=False, separators=(",",":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+def source_sha(p:Path, rec):
+    """sha256 de la source ; celui noté si taille et mtime n'ont pas bougé"""
+    st = p.stat()
+    if rec is not None and rec[:2] == [st.st_size, st.st_mtime_ns]:
+        return rec
+    return [st.st_size, st.st_mtime_ns, sha256_file(p)]
+
+def write_analysis(path:Path, analysis):
+    """Réécrit une analyse (même format : indent 2, UTF-8) seulement si elle a changé ; atomique"""
+    text = json.dumps(analysis, ensure_ascii=False, indent=2)
+    if path.read_text(encoding="utf-8") == text:
+        return False
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+    return True
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--analysis_dir", default=ANALYSIS_DIR)
+    ap.add_argument("--images", default="images")
+    ap.add_argument("--crops_dir", default="images/preview/crops")
+    ap.add_argument("--preview_dir", default="images/preview",
+                    help="Exclu du scan des photos ; base des chemins écrits dans les analyses")
+    ap.add_argument("--tiles_dir", default="images/tiles", help="Exclu du scan des photos")
+    ap.add_argument("--max_side", type=int, default=512, help="Plus grand côté d'une vignette (jamais agrandie)")
+    ap.add_argument("--pad", type=float, default=0.10, help="Marge autour de la bbox, en fraction de sa taille")
+    ap.add_argument("--quality", type=int, default=85)
+    ap.add_argument("--mask", action="store_true", help="Transparence hors du polygone de l'annotation")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus de découpe (1 = séquentiel)")
+    ap.add_argument("--force", action="store_true", help="Refaire toutes les vignettes")
+    args = ap.parse_args()
+
+    crops_root = Path(args.crops_dir)
+    state_path = crops_root / STATE_NAME
+    src_state, crop_state = ({}, {}) if args.force else load_state(state_path)
+    new_src_state, new_crop_state = {}, {}
+    params = [args.pad, args.max_side, args.quality, args.mask, WEBP_METHOD]
+
+    photos = {}
+    for p in scan_sources(Path(args.images), [crops_root, args.preview_dir, args.tiles_dir]):
+        photos.setdefault(p.name, p)
+
+    analyses = []  # (chemin retenu, analyse, source, [(annotation, nom)])
+    jobs = {}      # source posix -> vignettes à refaire
+    pending = {}   # nom -> [sha256 source, empreinte]
+    missing = skipped = 0
+    for file_id, paths in group_by_file_id(analysis_files(args.analysis_dir)).items():
+        _, kept, analysis, _, errors = read_group(file_id, paths)
+        for name, error in errors:
+            print(f"[WARN] {name}: {error}")
+        vision = analysis.get("vision") if isinstance(analysis, dict) else None
+        source = (analysis.get("source_file") or {}).get("file_name") if isinstance(vision, dict) else None
+        if not source:
+            continue
+        p = photos.get(source)
+        if p is None:
+            missing += 1
+            continue
+        key = p.as_posix()
+        if key not in new_src_state:
+            new_src_state[key] = source_sha(p, src_state.get(key))
+        sha = new_src_state[key][2]
+        refs = []
+        for ann in vision.get("annotations") or []:
+            geom = crop_geometry(ann)
+            if geom is None or not ann.get("ann_ID"):
+                continue
+            box, poly = padded_box(geom[0], args.pad), geom[1]
+            name = f"{ann['ann_ID']}.webp"
+            rec = [sha, geometry_hash(box, poly, params)]
+            refs.append((ann, name))
+            if crop_state.get(name) == rec and (crops_root / name).exists():
+                new_crop_state[name] = rec
+                skipped += 1
+            else:
+                jobs.setdefault(key, []).append((name, box, poly))
+                pending[name] = rec
+        analyses.append((kept, analysis, key, refs))
+
+    timings = []
+    failed = set()
+    generated = 0
+    t0 = time.perf_counter()
+    work = [(src, str(crops_root), crops, args.max_side, args.quality, args.mask) for src, crops in jobs.items()]
+    for src, seconds, written, error in run_jobs(work, args.workers):
+        for name in written:
+            new_crop_state[name] = pending[name]
+        generated += len(written)
+        if error:
+            print(f"[WARN] vignettes {src}: {error}")
+            failed.add(src)
+            continue
+        timings.append((seconds, src))
+        print(f"[crops] {src} {len(written)} vignettes, {seconds:.2f}s")
+    wall = time.perf_counter() - t0
+
+    # vignettes qui ne correspondent plus à aucune annotation
+    for name in set(crop_state) - set(new_crop_state) - set(pending):
+        (crops_root / name).unlink(missing_ok=True)
+    save_state(state_path, new_src_state, new_crop_state)
+
+    # références dans les analyses (photos en erreur : laissées telles quelles)
+    prefix = Path(os.path.relpath(crops_root, args.preview_dir)).as_posix()
+    rewritten = 0
+    for kept, analysis, key, refs in analyses:
+        if key in failed:
+            continue
+        for ann, name in refs:
+            ann["evidence_crop"] = f"{prefix}/{name}"
+        analysis["vision"]["evidence_crops"] = [f"{prefix}/{name}" for _, name in refs]
+        rewritten += write_analysis(kept, analysis)
+
+    print(f"[OK] vignettes: {generated} générées, "
+          f"{skipped} à jour, {len(failed)} photos en erreur, {missing} analyses sans photo -> {crops_root}")
+    if timings:
+        print(f"[OK] découpe : {wall:.2f}s ({args.workers} processus, {len(timings)} photos décodées une fois chacune), "
+              f"la plus lente {max(timings)[0]:.2f}s")
+    print(f"[OK] analyses mises à jour : {rewritten}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
 #!/usr/bin/env python3
 # make_previews_and_augment_json.py
 # Previews WebP + orientation EXIF + url_preview + roi_hints
+# Incrémental : <preview_dir>/.previews.json garde, par source, (taille, mtime_ns,
+# sha256, réglages). Une preview est refaite seulement si sa source a changé de
+# contenu ou si --max_side/--quality ont changé ; sinon aucun pixel n'est touché.
+# Les previews à refaire sont générées en parallèle (pool de processus).
+# Les JPEG sont décodés en mode draft (réduction dans le domaine DCT à 1/2, 1/4
+# ou 1/8, la plus petite taille >= cible) avant le LANCZOS final ; --quality-check
+# mesure PSNR/SSIM et temps contre le décodage complet, sans rien écrire.
 
 from pathlib import Path
-import argparse, json, re
+from array import array
+import argparse, json, math, os, re, sys, time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-from PIL import Image, ImageOps  # pip install pillow
+from PIL import Image, ImageChops, ImageMath, ImageOps  # pip install pillow
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_hash import sha256_file
 
 EXTS = {".jpg",".jpeg",".png",".webp",".tiff"}
+STATE_NAME = ".previews.json"
+STATE_VERSION = 1
 
 RX_A = re.compile(r'^(\d{4})_([A-Z0-9]+(?:-[A-Z0-9]+)*)_([A-Z0-9]{2,6})_(\d{8})\.(jpg|jpeg|png|webp|tiff)$', re.I)
 RX_B = re.compile(r'^(\d{4})_([A-Z0-9]+(?:-[A-Z0-9]+)*)_(\d{4})\.(jpg|jpeg|png|webp|tiff)$', re.I)
@@ -31,18 +45,150 @@ def first4_id(fname:str):
 def build_raw(owner, repo, branch, relposix:str):
     return f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{relposix}"
 
+def scan_sources(images_root:Path, excluded):
+    """Photos sous images_root, triées ; hors dossiers générés (previews, tuiles) souvent placés dessous"""
+    excluded = [Path(d).resolve() for d in excluded]
+    return [p for p in sorted(images_root.rglob("*"))
+            if p.is_file() and p.suffix.lower() in EXTS
+            and not any(p.resolve().is_relative_to(d) for d in excluded)]
+
 def ensure_dir(p:Path):
     p.parent.mkdir(parents=True, exist_ok=True)
 
-def gen_preview(src:Path, dst:Path, max_side:int=1280, quality:int=85):
+def render_preview(src:Path, max_side:int=1280, draft:bool=True):
+    """Image de la preview en mémoire (orientée, redimensionnée), avant encodage"""
     with Image.open(src) as im:
-        im = ImageOps.exif_transpose(im)
         w, h = im.size
         scale = max_side / max(w, h)
+        if draft and scale < 1.0 and im.format == "JPEG":
+            # décodage réduit : libjpeg ne calcule que 1/2, 1/4 ou 1/8 des pixels
+            im.draft(im.mode, (math.ceil(w*scale), math.ceil(h*scale)))
+        if im.getexif().get(0x0112) in (5, 6, 7, 8):
+            w, h = h, w
+        im = ImageOps.exif_transpose(im)
         if scale < 1.0:
             im = im.resize((int(w*scale), int(h*scale)), Image.LANCZOS)
-        ensure_dir(dst)
-        im.save(dst, "WEBP", quality=quality, method=6)
+        im.load()
+        return im
+
+def gen_preview(src:Path, dst:Path, max_side:int=1280, quality:int=85, draft:bool=True):
+    im = render_preview(src, max_side, draft)
+    ensure_dir(dst)
+    # écriture atomique : une preview interrompue ne remplace jamais la bonne
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        im.save(tmp, "WEBP", quality=quality, method=6)
+        os.replace(tmp, dst)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+# --------- contrôle qualité du mode draft ----------
+SSIM_BLOCK = 8
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+def _floats(im):
+    return array("f", im.tobytes())  # mode "F" : float32 natifs
+
+def _product(x, y):
+    if hasattr(ImageMath, "lambda_eval"):  # Pillow >= 10.3
+        return ImageMath.lambda_eval(lambda a: a["x"] * a["y"], x=x, y=y)
+    return ImageMath.eval("x * y", x=x, y=y)
+
+def psnr(a, b):
+    """PSNR (dB) entre deux images de même taille, tous canaux"""
+    hist = ImageChops.difference(a.convert("RGB"), b.convert("RGB")).histogram()
+    sq = sum(n * (i % 256) ** 2 for i, n in enumerate(hist))
+    mse = sq / (a.width * a.height * 3)
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def ssim(a, b, block=SSIM_BLOCK):
+    """SSIM moyen de la luminance, fenêtres block x block disjointes (moyennes par Image.reduce)"""
+    x = a.convert("L").convert("F")
+    y = b.convert("L").convert("F")
+    mx, my = _floats(x.reduce(block)), _floats(y.reduce(block))
+    mxx = _floats(_product(x, x).reduce(block))
+    myy = _floats(_product(y, y).reduce(block))
+    mxy = _floats(_product(x, y).reduce(block))
+    total = 0.0
+    for ux, uy, xx, yy, xy in zip(mx, my, mxx, myy, mxy):
+        vx, vy, cov = xx - ux * ux, yy - uy * uy, xy - ux * uy
+        total += ((2 * ux * uy + SSIM_C1) * (2 * cov + SSIM_C2)) / ((ux * ux + uy * uy + SSIM_C1) * (vx + vy + SSIM_C2))
+    return total / len(mx)
+
+def compare_decodes(src:Path, max_side:int=1280):
+    """(psnr, ssim, secondes décodage complet, secondes draft) de la preview draft contre la complète"""
+    t0 = time.perf_counter()
+    full = render_preview(src, max_side, draft=False)
+    t1 = time.perf_counter()
+    reduced = render_preview(src, max_side, draft=True)
+    t2 = time.perf_counter()
+    return psnr(full, reduced), ssim(full, reduced), t1 - t0, t2 - t1
+
+def quality_check(sources, max_side:int):
+    rows = []
+    for p in sources:
+        q = compare_decodes(p, max_side)
+        rows.append(q)
+        print(f"[check] {p.name}: PSNR {q[0]:.2f} dB, SSIM {q[1]:.4f}, complet {q[2]:.2f}s, draft {q[3]:.2f}s")
+    if rows:
+        full_t = sum(r[2] for r in rows)
+        draft_t = sum(r[3] for r in rows)
+        print(f"[OK] {len(rows)} images : PSNR min {min(r[0] for r in rows):.2f} dB, "
+              f"SSIM min {min(r[1] for r in rows):.4f} / moyen {sum(r[1] for r in rows)/len(rows):.4f}, "
+              f"rendu {full_t:.2f}s -> {draft_t:.2f}s (x{full_t/draft_t:.1f})")
+
+def build_preview(job):
+    """Tâche du pool : (src, dst, max_side, quality, draft) -> (src, secondes, sha256 de la source, erreur|None)"""
+    src, dst, max_side, quality, draft = job
+    t0 = time.perf_counter()
+    try:
+        gen_preview(Path(src), Path(dst), max_side=max_side, quality=quality, draft=draft)
+        # noté pour le prochain tour : une source seulement touchée sera reconnue
+        return src, time.perf_counter() - t0, sha256_file(src), None
+    except Exception as e:
+        return src, time.perf_counter() - t0, None, f"{type(e).__name__}: {e}"
+
+def load_state(path:Path):
+    """{source posix: [taille, mtime_ns, sha256|None, réglages]} ; {} si absent/illisible"""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+        return {}
+    return data.get("sources", {})
+
+def save_state(path:Path, sources):
+    ensure_dir(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": STATE_VERSION, "sources": sources}, ensure_ascii=False, separators=(",",":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+def preview_is_current(src:Path, dst:Path, st, rec, params):
+    """(à jour ?, sha256 connu) sans décoder : stat d'abord, sha256 seulement si la source a été touchée"""
+    if not dst.exists():
+        return False, None
+    if rec is None:
+        # preview d'avant le suivi : on la garde si elle est plus récente que sa source
+        return dst.stat().st_mtime_ns >= st.st_mtime_ns, None
+    size, mtime_ns, sha, rec_params = rec
+    if rec_params != params:
+        return False, None
+    if [size, mtime_ns] == [st.st_size, st.st_mtime_ns]:
+        return True, sha
+    if sha is not None and size == st.st_size:
+        cur = sha256_file(src)
+        return cur == sha, cur
+    return False, None
+
+def build_previews(jobs, workers:int):
+    """Génère les previews (en parallèle si workers > 1) ; résultats de build_preview() dans l'ordre des jobs"""
+    if workers <= 1 or len(jobs) <= 1:
+        return list(map(build_preview, jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(build_preview, jobs))
 
 def default_roi(spec:str):
     s = 0.30
@@ -62,14 +208,26 @@ def main():
     ap.add_argument("--repo", required=True)
     ap.add_argument("--branch", default="main")
     ap.add_argument("--preview_dir", default="images/preview")
+    ap.add_argument("--tiles_dir", default="images/tiles", help="Tuiles de make_tiles.py, exclues du scan")
     ap.add_argument("--max_side", type=int, default=1280)
     ap.add_argument("--quality", type=int, default=85)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus de génération (1 = séquentiel)")
+    ap.add_argument("--force", action="store_true", help="Refaire toutes les previews")
+    ap.add_argument("--no-draft", dest="draft", action="store_false",
+                    help="Décoder les JPEG en pleine résolution (plus lent)")
+    ap.add_argument("--quality-check", action="store_true",
+                    help="Comparer draft et décodage complet (PSNR/SSIM, temps) sans rien écrire")
     args = ap.parse_args()
 
     images_root = Path(args.images)
     preview_root = Path(args.preview_dir)
     out_json = Path(args.out_json)
 
+    sources = scan_sources(images_root, [preview_root, args.tiles_dir])
+    if args.quality_check:
+        quality_check(sources, args.max_side)
+        return
+
     # Charger JSON existant si présent
     items = []
     by_basename = {}
@@ -85,20 +243,29 @@ def main():
             items = []
 
     updated = set()
-    count_previews = 0
-
-    for p in sorted(images_root.rglob("*")):
-        if not p.is_file() or p.suffix.lower() not in EXTS:
-            continue
+    state_path = preview_root / STATE_NAME
+    state = {} if args.force else load_state(state_path)
+    new_state = {}
+    params = [args.max_side, args.quality, args.draft]
+    jobs = []
+    skipped = 0
 
+    for p in sources:
         rel_from_repo = p.relative_to(Path(".")).as_posix()       # images/xxx.jpg
         basename = p.name
 
-        # Générer preview
+        # Preview : à refaire seulement si la source ou les réglages ont changé
         preview_rel = Path(args.preview_dir) / p.relative_to(images_root)
         preview_rel = preview_rel.with_suffix(".webp")
-        gen_preview(p, preview_rel, max_side=args.max_side, quality=args.quality)
-        count_previews += 1
+        st = p.stat()
+        key = p.as_posix()
+        current, sha = (False, None) if args.force else preview_is_current(p, preview_rel, st, state.get(key), params)
+        if current:
+            skipped += 1
+        else:
+            jobs.append((str(p), str(preview_rel), args.max_side, args.quality, args.draft))
+            sha = None
+        new_state[key] = [st.st_size, st.st_mtime_ns, sha, params]
 
         # URLs
         url_orig = build_raw(args.owner, args.repo, args.branch, rel_from_repo)
@@ -131,6 +298,23 @@ def main():
 
         updated.add(basename)
 
+    timings = []
+    failed = set()
+    t0 = time.perf_counter()
+    for src, seconds, sha, error in build_previews(jobs, args.workers):
+        if error:
+            print(f"[WARN] preview {src}: {error}")
+            failed.add(Path(src).as_posix())
+            continue
+        timings.append((seconds, src))
+        print(f"[preview] {src} {seconds:.2f}s")
+        new_state[Path(src).as_posix()][2] = sha
+    wall = time.perf_counter() - t0
+    for key in failed:
+        new_state.pop(key, None)
+    save_state(state_path, new_state)
+    count_previews = len(timings)
+
     payload = {
         "db_name": "ArbotMiniDB_Augmented",
         "created_at": datetime.now(timezone.utc).date().isoformat(),
@@ -140,7 +324,12 @@ def main():
     out_json.parent.mkdir(parents=True, exist_ok=True)
     out_json.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    print(f"[OK] previews: {count_previews} -> {preview_root}")
+    print(f"[OK] previews: {count_previews} générées, {skipped} à jour, {len(failed)} en erreur -> {preview_root}")
+    if timings:
+        slowest = max(timings)
+        print(f"[OK] génération : {wall:.2f}s ({args.workers} processus), "
+              f"{sum(t for t, _ in timings)/len(timings):.2f}s/preview en moyenne, "
+              f"la plus lente {slowest[0]:.2f}s ({Path(slowest[1]).name})")
     print(f"[OK] JSON: {out_json} (items={len(items)})")
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# make_tiles.py
+# Pyramide de tuiles par image (tuiles 256px, moitiés successives) à côté de images/preview
+# + entrée "tiles" dans json/images_db.json : un client ne charge que les tuiles visibles.
+#
+# <tiles_dir>/<chemin sans extension>/tiles.json      description de la pyramide
+# <tiles_dir>/<chemin sans extension>/<niveau>/<col>_<ligne>.webp
+# niveau 0 = pleine résolution (orientation EXIF appliquée), chaque niveau suivant
+# est la moitié du précédent (Image.reduce(2)), jusqu'à tenir dans une seule tuile.
+#
+# Incrémental : même suivi que les previews (<tiles_dir>/.tiles.json : taille, mtime_ns,
+# sha256, réglages, + dossier de la pyramide) ; une image inchangée n'est pas relue. Déterministe : à source et
+# réglages égaux, les tuiles sont identiques octet pour octet, même avec --force.
+# Une pyramide est construite dans un dossier temporaire puis mise en place d'un bloc.
+
+from pathlib import Path
+import argparse, json, os, shutil, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps  # pip install pillow
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_hash import sha256_file
+from make_previews_and_augment_json import build_raw, load_state, preview_is_current, save_state, scan_sources
+
+STATE_NAME = ".tiles.json"
+MANIFEST_NAME = "tiles.json"
+WEBP_METHOD = 4  # fixé : la méthode fait partie du résultat
+
+def pyramid_levels(width:int, height:int, tile_size:int):
+    """[(largeur, hauteur, colonnes, lignes)] du niveau 0 (pleine résolution) au niveau 1 tuile"""
+    levels = []
+    w, h = width, height
+    while True:
+        levels.append((w, h, -(-w // tile_size), -(-h // tile_size)))
+        if w <= tile_size and h <= tile_size:
+            return levels
+        w, h = -(-w // 2), -(-h // 2)  # comme Image.reduce(2)
+
+def write_pyramid(im, out_dir:Path, tile_size:int, quality:int):
+    """Découpe `im` et ses réductions successives dans out_dir ; renvoie la description (tiles.json)"""
+    levels = pyramid_levels(im.width, im.height, tile_size)
+    for level, (w, h, cols, rows) in enumerate(levels):
+        if level:
+            im = im.reduce(2)
+        assert im.size == (w, h)
+        level_dir = out_dir / str(level)
+        level_dir.mkdir(parents=True, exist_ok=True)
+        for row in range(rows):
+            for col in range(cols):
+                box = (col * tile_size, row * tile_size, min((col + 1) * tile_size, w), min((row + 1) * tile_size, h))
+                im.crop(box).save(level_dir / f"{col}_{row}.webp", "WEBP", quality=quality, method=WEBP_METHOD)
+    return {
+        "width": levels[0][0],
+        "height": levels[0][1],
+        "tile_size": tile_size,
+        "overlap": 0,
+        "format": "webp",
+        "levels": [{"level": i, "width": w, "height": h, "cols": c, "rows": r} for i, (w, h, c, r) in enumerate(levels)],
+    }
+
+def replace_dir(staging:Path, dst:Path):
+    """Met staging à la place de dst (l'ancienne pyramide n'est retirée qu'après)"""
+    old = dst.with_name(f".{dst.name}.old")
+    if old.exists():
+        shutil.rmtree(old)
+    if dst.exists():
+        os.replace(dst, old)
+    os.replace(staging, dst)
+    if old.exists():
+        shutil.rmtree(old)
+
+def build_tiles(job):
+    """Tâche du pool : (src, out_dir, tile_size, quality) -> (src, secondes, sha256, description|None, erreur|None)"""
+    src, out_dir, tile_size, quality = job
+    out_dir = Path(out_dir)
+    staging = out_dir.with_name(f".{out_dir.name}.{os.getpid()}.tmp")
+    t0 = time.perf_counter()
+    try:
+        if staging.exists():
+            shutil.rmtree(staging)
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            if im.mode not in ("RGB", "RGBA", "L"):
+                im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+            info = write_pyramid(im, staging, tile_size, quality)
+        (staging / MANIFEST_NAME).write_text(json.dumps(info, indent=2), encoding="utf-8")
+        replace_dir(staging, out_dir)
+        return src, time.perf_counter() - t0, sha256_file(src), info, None
+    except Exception as e:
+        if staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+        return src, time.perf_counter() - t0, None, None, f"{type(e).__name__}: {e}"
+
+def run_jobs(jobs, workers:int):
+    if workers <= 1 or len(jobs) <= 1:
+        return list(map(build_tiles, jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(build_tiles, jobs))
+
+def tiles_entry(info, url:str):
+    """Entrée "tiles" d'un item de images_db.json"""
+    return {
+        "url": url,
+        "tile_size": info["tile_size"],
+        "levels": len(info["levels"]),
+        "width": info["width"],
+        "height": info["height"],
+        "format": info["format"],
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--images", default="images")
+    ap.add_argument("--out_json", default="json/images_db.json")
+    ap.add_argument("--owner", required=True)
+    ap.add_argument("--repo", required=True)
+    ap.add_argument("--branch", default="main")
+    ap.add_argument("--tiles_dir", default="images/tiles")
+    ap.add_argument("--preview_dir", default="images/preview", help="Exclu du scan (comme --tiles_dir)")
+    ap.add_argument("--tile_size", type=int, default=256)
+    ap.add_argument("--quality", type=int, default=80)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus de découpe (1 = séquentiel)")
+    ap.add_argument("--force", action="store_true", help="Refaire toutes les pyramides")
+    args = ap.parse_args()
+
+    images_root = Path(args.images)
+    tiles_root = Path(args.tiles_dir)
+    out_json = Path(args.out_json)
+
+    state_path = tiles_root / STATE_NAME
+    state = {} if args.force else load_state(state_path)
+    new_state = {}
+    params = [args.tile_size, args.quality, WEBP_METHOD]
+    jobs = []
+    sources = {}  # basename -> dossier de la pyramide
+    skipped = 0
+
+    for p in scan_sources(images_root, [tiles_root, args.preview_dir]):
+        out_dir = tiles_root / p.relative_to(images_root).with_suffix("")
+        st = p.stat()
+        key = p.as_posix()
+        rec = state.get(key)
+        current, sha = (False, None) if args.force else preview_is_current(p, out_dir / MANIFEST_NAME, st, rec and rec[:4], params)
+        if current:
+            skipped += 1
+        else:
+            jobs.append((str(p), str(out_dir), args.tile_size, args.quality))
+            sha = None
+        new_state[key] = [st.st_size, st.st_mtime_ns, sha, params, out_dir.as_posix()]
+        sources[p.name] = out_dir
+
+    # pyramides des sources disparues : dossier noté dans l'état (les clés dépendent de
+    # la forme de --images au dernier passage) ; jamais celui d'une source encore présente
+    kept = {Path(rec[4]).resolve() for rec in new_state.values()}
+    for key in set(state) - set(new_state):
+        rec = state[key]
+        if len(rec) > 4:
+            gone = Path(rec[4])
+        else:  # état d'avant le dossier noté
+            try:
+                gone = tiles_root / Path(key).relative_to(images_root).with_suffix("")
+            except ValueError:
+                continue
+        if gone.is_dir() and gone.resolve() not in kept:
+            shutil.rmtree(gone)
+
+    timings = []
+    failed = set()
+    t0 = time.perf_counter()
+    for src, seconds, sha, info, error in run_jobs(jobs, args.workers):
+        if error:
+            print(f"[WARN] tuiles {src}: {error}")
+            failed.add(Path(src).as_posix())
+            continue
+        n = sum(l["cols"] * l["rows"] for l in info["levels"])
+        timings.append((seconds, src))
+        print(f"[tiles] {src} {len(info['levels'])} niveaux, {n} tuiles, {seconds:.2f}s")
+        new_state[Path(src).as_posix()][2] = sha
+    wall = time.perf_counter() - t0
+    for key in failed:
+        new_state.pop(key, None)
+        sources.pop(Path(key).name, None)
+    save_state(state_path, new_state)
+
+    # entrée "tiles" des items de images_db.json (créés par make_previews_and_augment_json.py)
+    if out_json.exists():
+        data = json.loads(out_json.read_text(encoding="utf-8"))
+        missing = 0
+        for it in data.get("items", []):
+            base = it.get("url", "").split("/")[-1]
+            out_dir = sources.get(base)
+            manifest = out_dir / MANIFEST_NAME if out_dir is not None else None
+            if manifest is None or not manifest.exists():
+                it.pop("tiles", None)
+                missing += 1
+                continue
+            info = json.loads(manifest.read_text(encoding="utf-8"))
+            it["tiles"] = tiles_entry(info, build_raw(args.owner, args.repo, args.branch, manifest.as_posix()))
+        out_json.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[OK] JSON: {out_json} ({len(data.get('items', [])) - missing} items avec tuiles)")
+    else:
+        print(f"[WARN] {out_json} absent : lancer make_previews_and_augment_json.py d'abord")
+
+    print(f"[OK] pyramides: {len(timings)} construites, {skipped} à jour, {len(failed)} en erreur -> {tiles_root}")
+    if timings:
+        print(f"[OK] découpe : {wall:.2f}s ({args.workers} processus), la plus lente {max(timings)[0]:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -179,6 +179,47 @@ with open(os.path.join(SCHEMAS, "vision_analysis.schema.json"), "w", encoding="u
     json.dump(vision_analysis_schema, f, indent=2, ensure_ascii=False)
 print(f"[OK] Created {SCHEMAS}/vision_analysis.schema.json")
 
+# Schema: image_analysis 1.0.0 (per-image answer of gpt4o_batch_analysis_oauth.ANALYSIS_PROMPT)
+image_analysis_schema = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "$id": "urn:arbot:schema:image_analysis:1.0.0",
+    "$anchor": "imageAnalysis",
+    "title": "ArBot Image Analysis Response",
+    "type": "object",
+    "required": ["defects", "probable_causes", "recommended_actions", "estimated_impact"],
+    "properties": {
+        "defects": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["type", "location", "severity", "confidence"],
+                "properties": {
+                    "type": {"type": "string"},
+                    "location": {"type": "string"},
+                    "severity": {"type": "number", "minimum": 1, "maximum": 5},
+                    "confidence": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+                    "notes": {"type": "string"}
+                }
+            }
+        },
+        "probable_causes": {"type": "array", "items": {"type": "string"}},
+        "recommended_actions": {"type": "array", "items": {"type": "string"}},
+        "estimated_impact": {
+            "type": "object",
+            "required": ["cost_low_eur", "cost_high_eur", "urgency"],
+            "properties": {
+                "cost_low_eur": {"type": "number", "minimum": 0},
+                "cost_high_eur": {"type": "number", "minimum": 0},
+                "urgency": {"type": "number", "minimum": 1, "maximum": 5}
+            }
+        }
+    }
+}
+
+with open(os.path.join(SCHEMAS, "image_analysis.schema.json"), "w", encoding="utf-8") as f:
+    json.dump(image_analysis_schema, f, indent=2, ensure_ascii=False)
+print(f"[OK] Created {SCHEMAS}/image_analysis.schema.json")
+
 # ==================== MODULES ====================
 
 # Module: runtime.paths_filters (ADAPTED to current project structure)
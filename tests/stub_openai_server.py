@@ -0,0 +1,250 @@
+"""
+Local stub of the OpenAI chat completions endpoint for tests and benchmarks.
+
+Each request sleeps for a configurable latency before answering, and the
+server records how many requests were in flight at once. FakeBatchServer
+adds the Files and Batches endpoints, completing every batch immediately.
+FakeTokenServer answers OAuth refresh_token grants with fresh tokens.
+
+Standalone use (then pass --base-url http://127.0.0.1:8765/v1):
+    python tests/stub_openai_server.py --port 8765 --latency 0.5
+"""
+
+import json
+import time
+import argparse
+import threading
+from email.parser import BytesParser
+from urllib.parse import parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_CONTENT = json.dumps({
+    "defects": [],
+    "probable_causes": [],
+    "recommended_actions": [],
+    "estimated_impact": {"cost_low_eur": 0, "cost_high_eur": 0, "urgency": 1},
+})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        if self.headers.get("Content-Type", "").startswith("multipart/"):
+            body = _parse_multipart(self.headers["Content-Type"], raw)
+        elif self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            body = {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+        else:
+            body = json.loads(raw or b"{}")
+        stub._enter(self.path, body)
+        try:
+            time.sleep(stub.latency)
+            status, headers, payload = stub.authorize(self.headers.get("Authorization")) or stub.respond(self.path, body)
+        finally:
+            stub._leave()
+        self._reply(status, headers, payload)
+
+    def do_GET(self):
+        status, headers, payload = self.server.stub.respond_get(self.path)
+        self._reply(status, headers, payload)
+
+    def _reply(self, status, headers, payload):
+        if isinstance(payload, bytes):
+            data, ctype = payload, "application/octet-stream"
+        else:
+            data, ctype = json.dumps(payload).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        return
+
+
+def _parse_multipart(content_type: str, raw: bytes) -> dict:
+    """Form fields by name; file parts as bytes."""
+    msg = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + raw)
+    fields = {}
+    for part in msg.get_payload():
+        fields[part.get_param("name", header="content-disposition")] = part.get_payload(decode=True)
+    return fields
+
+
+class StubOpenAIServer:
+    """Threaded HTTP stub; use as a context manager and read `base_url`."""
+
+    def __init__(self, latency: float = 0.0, content: str = DEFAULT_CONTENT, port: int = 0):
+        self.latency = latency
+        self.content = content
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _enter(self, path, body):
+        with self._lock:
+            self.requests.append((path, body))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def authorize(self, authorization):
+        """None to accept the request, or a (status, headers, json_payload) rejection."""
+        return None
+
+    def respond(self, path, body):
+        """Return (status, headers, json_payload). Override in tests as needed."""
+        return 200, {}, chat_completion(body.get("model", "gpt-4o"), self.content)
+
+    def respond_get(self, path):
+        return 404, {}, {"error": {"message": f"no route for {path}"}}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeBatchServer(StubOpenAIServer):
+    """Files + Batches API stub. Each batch completes as soon as it is created."""
+
+    def __init__(self, *args, fail_ids=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.files = {}
+        self.batches = {}
+        self.fail_ids = set(fail_ids)
+
+    def _new_file(self, data: bytes) -> str:
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = data
+        return file_id
+
+    def respond(self, path, body):
+        if path == "/v1/files":
+            file_id = self._new_file(body["file"])
+            return 200, {}, {"id": file_id, "object": "file", "bytes": len(body["file"]),
+                             "created_at": int(time.time()), "filename": "batch.jsonl",
+                             "purpose": "batch", "status": "processed"}
+        if path == "/v1/batches":
+            out, err = [], []
+            for line in self.files[body["input_file_id"]].decode("utf-8").splitlines():
+                req = json.loads(line)
+                cid = req["custom_id"]
+                if cid in self.fail_ids:
+                    err.append({"custom_id": cid, "response": None,
+                                "error": {"code": "invalid_image", "message": "could not decode"}})
+                    continue
+                out.append({"custom_id": cid, "error": None, "response": {
+                    "status_code": 200,
+                    "body": chat_completion(req["body"]["model"], self.content)}})
+            batch_id = f"batch-{len(self.batches) + 1}"
+            self.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": body["endpoint"],
+                "input_file_id": body["input_file_id"], "completion_window": "24h",
+                "status": "completed", "created_at": int(time.time()),
+                "output_file_id": self._new_file("\n".join(json.dumps(r) for r in out).encode()),
+                "error_file_id": self._new_file("\n".join(json.dumps(r) for r in err).encode()) if err else None,
+            }
+            return 200, {}, self.batches[batch_id]
+        return super().respond(path, body)
+
+    def respond_get(self, path):
+        parts = path.strip("/").split("/")
+        if parts[:2] == ["v1", "batches"] and parts[2] in self.batches:
+            return 200, {}, self.batches[parts[2]]
+        if parts[:2] == ["v1", "files"] and parts[-1] == "content":
+            return 200, {}, self.files[parts[2]]
+        return super().respond_get(path)
+
+
+class FakeTokenServer(StubOpenAIServer):
+    """OAuth token endpoint stub: every refresh_token grant yields a new token.
+
+    With `rotate=True` each refresh token is single-use, as with providers
+    that rotate them; replaying an old one gets a 400 (invalid_grant).
+    """
+
+    def __init__(self, *args, expires_in: int = 3600, rotate: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expires_in = expires_in
+        self.rotate = rotate
+        self.issued = 0
+        self.valid_refresh = {"refresh-0"}
+
+    @property
+    def token_url(self) -> str:
+        return self.base_url.rsplit("/v1", 1)[0] + "/oauth/token"
+
+    def respond(self, path, body):
+        if path != "/oauth/token" or body.get("grant_type") != "refresh_token":
+            return 404, {}, {"error": "unsupported"}
+        with self._lock:
+            if body.get("refresh_token") not in self.valid_refresh:
+                return 400, {}, {"error": "invalid_grant"}
+            self.issued += 1
+            token = {"access_token": f"access-{self.issued}", "token_type": "bearer",
+                     "expires_in": self.expires_in}
+            if self.rotate:
+                self.valid_refresh.discard(body["refresh_token"])
+                token["refresh_token"] = f"refresh-{self.issued}"
+                self.valid_refresh.add(token["refresh_token"])
+        return 200, {}, token
+
+
+def chat_completion(model: str, content: str) -> dict:
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local OpenAI chat completions stub.")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.5, help="Seconds per request.")
+    args = ap.parse_args()
+    stub = StubOpenAIServer(latency=args.latency, port=args.port)
+    print(f"Stub listening on {stub.base_url} (latency {args.latency}s)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def _analysis(generated_at: str, defects: int, tag: str = "") -> dict:
+    return {
+        "meta": {"generated_at": generated_at, "tag": tag},
+        "source_file": {"file_name": "x.jpg", "zone_name": "SDB"},
+        "vision": {"defects": [{"categorie": "JOINT", "gravite": 2}] * defects},
+    }
+
+
+def _write(path: Path, data):
+    path.write_text(json.dumps(data) if not isinstance(data, str) else data, encoding="utf-8")
+
+
+def test_duplicates_resolved_deterministically(tmp_path: Path):
+    _import()
+    from analysis_loader import AnalysisLoader
+
+    # Copy (1) was regenerated later: it wins
+    _write(tmp_path / "0008_SDB_GEN_analysis.json", _analysis("2025-10-17T11:59:45Z", 1, "old"))
+    _write(tmp_path / "0008_SDB_GEN_analysis(1).json", _analysis("2025-10-17T12:59:45Z", 1, "new"))
+    # Same generation: the original download wins over its copies
+    _write(tmp_path / "3702_CUVETTE_DEG_analysis(2).json", _analysis("2025-10-16T16:55:00Z", 1, "copy2"))
+    _write(tmp_path / "3702_CUVETTE_DEG_analysis.json", _analysis("2025-10-16T16:55:00Z", 1, "original"))
+    _write(tmp_path / "3702_CUVETTE_DEG_analysis(1).json", _analysis("2025-10-16T16:55:00Z", 1, "copy1"))
+    _write(tmp_path / "0001_WC_analysis.json", "{not json")
+    _write(tmp_path / "DEF_ALL.json", [])
+
+    loader = AnalysisLoader(tmp_path)
+    results = loader.load()
+    assert list(results) == ["0008", "3702"]
+    assert results["0008"]["meta"]["tag"] == "new"
+    assert results["3702"]["meta"]["tag"] == "original"
+    assert loader.duplicates["3702"] == {
+        "kept": "3702_CUVETTE_DEG_analysis.json",
+        "shadowed": ["3702_CUVETTE_DEG_analysis(1).json", "3702_CUVETTE_DEG_analysis(2).json"],
+    }
+    assert list(loader.errors) == ["0001_WC_analysis.json"]
+    assert loader.loaded == 2
+
+
+def test_pools_and_stream_agree(tmp_path: Path):
+    _import()
+    from analysis_loader import AnalysisLoader
+    from run_vision_analysis import analyze_defects, generate_assessment_report
+
+    for i in range(40):
+        _write(tmp_path / f"{i:04d}_SDB_analysis.json", _analysis("2025-10-16T10:00:00Z", i % 3))
+
+    serial = AnalysisLoader(tmp_path, workers=1).load()
+    assert AnalysisLoader(tmp_path, workers=4).load() == serial
+    assert AnalysisLoader(tmp_path, workers=2, processes=True).load() == serial
+    assert list(serial) == [f"{i:04d}" for i in range(40)]
+
+    # Aggregation over the stream matches aggregation over the dict
+    loader = AnalysisLoader(tmp_path, workers=4)
+    stream = loader.iter_results()
+    assert analyze_defects(stream) == analyze_defects(serial)
+    assert loader.loaded == 40
+
+    report = generate_assessment_report({"items": []}, {"documents": []}, AnalysisLoader(tmp_path).iter_results(),
+                                        output_path=str(tmp_path / "report.md"))
+    text = Path(report).read_text(encoding="utf-8")
+    assert "**Images Analyzed:** 40" in text
+    assert "| 0002 | x.jpg | 2 | JOINT |" in text
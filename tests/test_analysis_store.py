@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def _analysis(generated_at: str, zone: str, defects, tag: str = "") -> dict:
+    return {
+        "meta": {"generated_at": generated_at, "tag": tag},
+        "source_file": {"file_name": f"{zone}.jpg", "zone_name": zone},
+        "vision": {
+            "defects": defects,
+            "annotations": [{"ann_ID": "A1", "ann_linked_def_ID": "D1", "polygon_norm": [[0, 0], [1, 1]]}],
+        },
+    }
+
+
+def _defect(id_defaut: str, categorie: str, gravite: int, norme: str = None) -> dict:
+    d = {"id_defaut": id_defaut, "categorie": categorie, "gravite": gravite}
+    if norme:
+        d["regle_ref"] = {"norme": norme, "partie": "P1"}
+    return d
+
+
+def _write(path: Path, data):
+    path.write_text(json.dumps(data) if not isinstance(data, str) else data, encoding="utf-8")
+
+
+def _populate(d: Path):
+    _write(d / "0001_SDB_analysis.json", _analysis("2025-10-16T10:00:00Z", "SDB", [
+        _defect("D1", "étanchéité", 1, "DTU 25.41"), _defect("D2", "JOINT", 2)]))
+    _write(d / "0002_WC_analysis.json", _analysis("2025-10-16T10:00:00Z", "WC", [_defect("D1", "étanchéité", 1)]))
+    _write(d / "0003_SDB_analysis.json", _analysis("2025-10-16T10:00:00Z", "SDB", []))
+    _write(d / "0003_SDB_analysis(1).json", _analysis("2025-10-16T09:00:00Z", "SDB", [], "older"))
+    _write(d / "DEF_ALL.json", [])
+
+
+def test_ingest_matches_directory_loader(tmp_path: Path):
+    _import()
+    from analysis_loader import AnalysisLoader
+    from analysis_store import AnalysisStore
+
+    _populate(tmp_path)
+    with AnalysisStore(tmp_path / "store.sqlite") as store:
+        stats = store.ingest(tmp_path)
+        assert stats == {"files": 4, "hashed": 4, "ingested": 3, "unchanged": 0, "removed": 0, "errors": 0}
+        assert store.count() == 3
+        assert store.load_results() == AnalysisLoader(tmp_path).load()
+        assert [file_id for file_id, _ in store.iter_results()] == ["0001", "0002", "0003"]
+
+
+def test_query_defects_filters(tmp_path: Path):
+    _import()
+    from analysis_store import AnalysisStore
+
+    _populate(tmp_path)
+    with AnalysisStore(tmp_path / "store.sqlite") as store:
+        store.ingest(tmp_path)
+        rows = store.query_defects(zone="SDB", categorie="étanchéité", gravite=1)
+        assert [(r["file_id"], r["id_defaut"], r["norme"]) for r in rows] == [("0001", "D1", "DTU 25.41")]
+        assert [r["file_id"] for r in store.query_defects(id_defaut="D1")] == ["0001", "0002"]
+        assert len(store.query_defects()) == 3
+        assert store.query_defects(zone="CUISINE") == []
+
+
+def test_ingest_is_incremental(tmp_path: Path):
+    _import()
+    from analysis_store import AnalysisStore
+
+    _populate(tmp_path)
+    with AnalysisStore(tmp_path / "store.sqlite") as store:
+        store.ingest(tmp_path)
+        before = store.fingerprint()
+
+        # Nothing changed: nothing is hashed
+        stats = store.ingest(tmp_path)
+        assert (stats["hashed"], stats["unchanged"], stats["ingested"]) == (0, 3, 0)
+
+        # Touched but identical: rehashed, not re-ingested
+        p = tmp_path / "0002_WC_analysis.json"
+        st = p.stat()
+        os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        stats = store.ingest(tmp_path)
+        assert (stats["hashed"], stats["ingested"]) == (1, 0)
+        assert store.fingerprint() == before
+
+        # New content is re-ingested
+        _write(p, _analysis("2025-10-16T10:00:00Z", "WC", [_defect("D9", "JOINT", 3)]))
+        stats = store.ingest(tmp_path)
+        assert stats["ingested"] == 1
+        assert [r["id_defaut"] for r in store.query_defects(zone="WC")] == ["D9"]
+        assert store.fingerprint() != before
+
+        # A newer copy replaces the kept source
+        _write(tmp_path / "0001_SDB_analysis(1).json",
+               _analysis("2025-10-17T10:00:00Z", "SDB", [], "regenerated"))
+        stats = store.ingest(tmp_path)
+        assert stats["ingested"] == 1
+        assert store.load_results()["0001"]["meta"]["tag"] == "regenerated"
+        assert store.query_defects(zone="SDB") == []
+
+        # Deleted files disappear from the store
+        p.unlink()
+        stats = store.ingest(tmp_path)
+        assert stats["removed"] == 1
+        assert list(store.load_results()) == ["0001", "0003"]
+        assert store.conn.execute("SELECT COUNT(*) FROM annotations WHERE file_id = '0002'").fetchone()[0] == 0
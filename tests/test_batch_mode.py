@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def test_shard_lines_respects_size_and_count():
+    _import()
+    from batch_jobs import shard_lines
+
+    lines = [(str(i), "x" * 99) for i in range(10)]  # 100 bytes each with newline
+    assert [len(s) for s in shard_lines(lines, max_bytes=350)] == [3, 3, 3, 1]
+    assert [len(s) for s in shard_lines(lines, max_requests=4)] == [4, 4, 2]
+
+
+def test_batch_round_trip(tmp_path: Path):
+    from openai import OpenAI
+    from stub_openai_server import FakeBatchServer
+
+    _import()
+    from gpt4o_batch_analysis_oauth import collect_batch, submit_batch
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    for i in range(5):
+        (imgs / f"{i:04d}_SDB_GEN.jpg").write_bytes(b"fakejpg" * (i + 1))
+    images = sorted(imgs.glob("*.jpg"))
+    out_dir = tmp_path / "out"
+    state = out_dir / "batch_state.json"
+
+    with FakeBatchServer(fail_ids={images[4].as_posix()}) as stub:
+        client = OpenAI(api_key="test", base_url=stub.base_url)
+        summary = submit_batch(client, images, out_dir, "gpt-4o", state, max_shard_bytes=200)
+        assert summary["submitted"] == 5
+        assert len(summary["batch_ids"]) > 1
+
+        # Resubmitting does not duplicate in-flight requests
+        again = submit_batch(client, images, out_dir, "gpt-4o", state)
+        assert again["submitted"] == 0
+
+        result = collect_batch(client, out_dir, state)
+
+    assert result == {"processed": 4, "failed": 1, "jobs_pending": 0}
+    for img in images[:4]:
+        data = json.loads((out_dir / f"{img.stem}_analysis.json").read_text(encoding="utf-8"))
+        assert "defects" in data
+    assert (out_dir / f"{images[4].stem}_error.txt").exists()
+    assert all(j["collected"] for j in json.loads(state.read_text(encoding="utf-8"))["jobs"])
@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure scripts/ on path
+    scripts = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "scripts"))
+    if scripts not in sys.path:
+        sys.path.insert(0, scripts)
+
+
+def _image(path: Path, size=(40, 30)):
+    from PIL import Image
+
+    Image.new("RGB", size, (200, 10, 10)).save(path, "JPEG")
+
+
+def _run(monkeypatch, root: Path, out: Path, *extra):
+    import build_manifest_strict
+
+    monkeypatch.setattr(sys, "argv", ["build_manifest_strict.py", "--root", str(root), "--out-dir", str(out), *extra])
+    build_manifest_strict.main()
+    records = json.loads((out / "manifest_images.json").read_text(encoding="utf-8"))
+    report = json.loads((out / "manifest_report.json").read_text(encoding="utf-8"))
+    return {r["file_name"]: r for r in records}, report
+
+
+def test_warm_run_reads_no_files(tmp_path: Path, monkeypatch):
+    _import()
+    import build_manifest_strict
+
+    root = tmp_path / "images"
+    (root / "sub").mkdir(parents=True)
+    _image(root / "2311_JOINT_MGB.jpg")
+    _image(root / "sub" / "0005_WC_GEN_20250818.jpg", (30, 40))
+    (root / "notes.txt").write_text("ignored")
+    out = tmp_path / "out"
+
+    cold, report = _run(monkeypatch, root, out, "--workers", "4")
+    assert (report["files_read"], report["cache_hits"]) == (2, 0)
+    assert cold["0005_WC_GEN_20250818.jpg"]["orientation"] == "portrait"
+
+    def no_reads(p, old=None):
+        raise AssertionError(f"{p} was read")
+
+    monkeypatch.setattr(build_manifest_strict, "probe_file", no_reads)
+    warm, report = _run(monkeypatch, root, out)
+    assert (report["files_read"], report["cache_hits"]) == (0, 2)
+    assert warm == cold
+
+
+def test_changed_file_is_probed_again(tmp_path: Path, monkeypatch):
+    _import()
+
+    root = tmp_path / "images"
+    root.mkdir()
+    _image(root / "2311_JOINT_MGB.jpg")
+    _image(root / "3805_DORMANT_DEG.jpg")
+    out = tmp_path / "out"
+    cold, _ = _run(monkeypatch, root, out, "--workers", "1")
+
+    _image(root / "3805_DORMANT_DEG.jpg", (64, 64))
+    warm, report = _run(monkeypatch, root, out)
+    assert (report["files_read"], report["cache_hits"]) == (1, 1)
+    changed = warm["3805_DORMANT_DEG.jpg"]
+    assert (changed["image_width_px"], changed["orientation"]) == (64, "square")
+    assert changed["sha256"] != cold["3805_DORMANT_DEG.jpg"]["sha256"]
+    assert warm["2311_JOINT_MGB.jpg"] == cold["2311_JOINT_MGB.jpg"]
+
+    # --no-cache reads everything again
+    _, report = _run(monkeypatch, root, out, "--no-cache")
+    assert report["files_read"] == 2
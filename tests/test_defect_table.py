@@ -0,0 +1,82 @@
+import os
+import sys
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def _analysis(zone, name, defects):
+    return {"source_file": {"zone_name": zone, "file_name": name}, "vision": {"defects": defects}}
+
+
+RESULTS = {
+    "0001": _analysis("SDB", "0001_SDB.jpg", [
+        {"id_defaut": "0001_D01", "categorie": "JOINT", "gravite": 2},
+        {"id_defaut": "0001_D02", "categorie": "JOINT", "gravite": 2.0, "origin_layer": "SUPPORT"},
+    ]),
+    "0002": _analysis("WC", "0002_WC.jpg", []),
+    "0003": {"vision": {"defects": [
+        {"gravite": "2", "regle_ref": {"norme": "DTU 60.1"}},
+        {"categorie": "PEINTURE", "gravite": True},
+        {"categorie": "JOINT", "gravite": 1},
+    ]}},
+}
+
+
+def test_table_matches_per_defect_counting():
+    _import()
+    from defect_table import DefectTable
+    from run_vision_analysis import analyze_defects
+
+    table = DefectTable.from_analyses(iter(RESULTS.items()))  # a single-pass stream is enough
+    stats = table.stats()
+    assert stats == {
+        "total_images_analyzed": 3,
+        "total_defects": 5,
+        "defects_by_category": {"JOINT": 3, "UNKNOWN": 1, "PEINTURE": 1},
+        # 2 and "2" share the "2" key, as str(gravite) always did; 2.0 and True stay apart
+        "defects_by_severity": {"2": 2, "2.0": 1, "True": 1, "1": 1},
+        "defects_by_zone": {"SDB": 2, "UNKNOWN": 3},
+        "images_with_defects": 2,
+        "images_without_defects": 1,
+    }
+    assert analyze_defects(RESULTS) == stats
+    assert list(stats["defects_by_category"]) == ["JOINT", "UNKNOWN", "PEINTURE"]  # first-seen order
+    assert table.top_images(2) == [
+        ("0003", "N/A", 3, {"UNKNOWN", "PEINTURE", "JOINT"}),
+        ("0001", "0001_SDB.jpg", 2, {"JOINT"}),
+    ]
+
+
+def test_defect_detection_reads_the_table():
+    _import()
+    from defect_table import DefectTable
+    from run_pipeline import execute_phase_defect_detection
+
+    result = execute_phase_defect_detection(DefectTable.from_analyses(RESULTS))
+    def_all = result["outputs"]["def_all"]
+    assert [d["gravite_technique"] for d in def_all] == [2, 2.0, "2", True, 1]
+    assert [d["categorie"] for d in def_all] == ["JOINT", "JOINT", "AUTRE", "PEINTURE", "JOINT"]
+    assert [d["origin_layer"] for d in def_all] == ["SURFACE", "SUPPORT", "SURFACE", "SURFACE", "SURFACE"]
+    assert [d["image_ref"] for d in def_all] == ["0001_SDB.jpg", "0001_SDB.jpg", "", "", ""]
+    assert def_all[2]["regle_ref"] == {"norme": "DTU 60.1"}
+    assert def_all[0]["regle_ref"] == {"doc_id": "UNKNOWN", "source_page": "", "article_id": ""}
+    assert def_all[0]["regle_ref"] is not def_all[1]["regle_ref"]
+    assert result["inputs"]["analysis_results_count"] == 3
+    assert result["stats"]["total_defects"] == 5
+    assert execute_phase_defect_detection(RESULTS) == result
+
+
+def test_one_code_per_value_across_batches():
+    _import()
+    from defect_table import MISSING, Categories
+
+    c = Categories()
+    assert c.encode([None, "a", MISSING]) == [0, 1, 2]
+    assert c.encode([None, 2.5, MISSING, [1]]) == [0, 3, 2, 4]  # a batch with float/list values
+    assert c.encode([None, True, 1, "a"]) == [0, 5, 6, 1]
+    assert c.values == [None, "a", MISSING, 2.5, [1], True, 1]
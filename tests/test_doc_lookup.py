@@ -0,0 +1,57 @@
+import os
+import sys
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+DOCS = [
+    {"id": "DTU-007", "filename": "DTU_25.41_1993.pdf", "code": "DTU", "title": "DTU 25.41 1993"},
+    {"id": "DTU-008", "filename": "DTU_25.42.P2_2012.pdf", "code": "DTU", "title": "DTU 25.42.P2 2012"},
+    {"id": "DTU-010", "filename": "DTU_60.1_2012.pdf", "code": "DTU", "title": "DTU 60.1 2012"},
+    {"id": "FT-015", "filename": "FT_Vidange_E6D124.pdf", "code": "FT", "title": "FT Vidange E6D124"},
+]
+
+
+def test_norm_spellings_resolve_to_one_document():
+    _import()
+    from doc_lookup import DocLookup, normalize_norm
+
+    assert normalize_norm("DTU 25.41_1993") == normalize_norm("DTU-25-41:1993") \
+        == normalize_norm("DTU_25.41_1993.pdf") == "DTU 25 41 1993"
+
+    lookup = DocLookup(DOCS)
+    assert lookup.find("dtu 25.41-1993")["id"] == "DTU-007"
+    assert lookup.find("DTU 25.42_P2_2012")["id"] == "DTU-008"
+    assert lookup.find("NF DTU 60.1")["id"] == "DTU-010"  # single edition indexed
+    assert lookup.find("FT-015")["id"] == "FT-015"
+    assert lookup.find("DTU")["id"] == "DTU-007"  # shared code: first document, as before
+    assert lookup.find("SDB_REF_DOC.pdf") is None
+
+    assert lookup.resolve({"norme": "DTU 25.41_1993", "partie": "Annexe A.1"})["id"] == "DTU-007"
+    assert lookup.resolve({"doc_id": "UNKNOWN", "source_page": "", "article_id": ""}) is None
+    assert lookup.resolve({"doc_id": "FT_Vidange_E6D124.pdf"})["id"] == "FT-015"
+
+
+def test_norm_reference_link_uses_norme_and_partie():
+    _import()
+    from run_pipeline import execute_phase_norm_reference_link
+
+    def_all = [
+        {"id_defaut": "0001_D01", "regle_ref": {"norme": "DTU 60.1_2012", "partie": "Chapitre 5.3.1"}},
+        {"id_defaut": "0001_D02", "regle_ref": {"norme": "SDB_REF_DOC.pdf", "partie": "Interfaces"}},
+        {"id_defaut": "0002_D01", "regle_ref": {"doc_id": "DTU-008", "source_page": "12", "article_id": "4.1"}},
+    ]
+    result = execute_phase_norm_reference_link(def_all, {"documents": DOCS, "total_documents": len(DOCS)})
+
+    out = result["outputs"]
+    assert out["linked_defects"] == 2
+    assert [(c["defect_id"], c["doc_id"], c["article_id"]) for c in out["citations"]] == [
+        ("0001_D01", "DTU-010", "Chapitre 5.3.1"),
+        ("0002_D01", "DTU-008", "4.1"),
+    ]
+    assert out["unresolved_refs"] == {"SDB_REF_DOC.pdf": 1}
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def test_mmap_and_buffered_paths_agree(tmp_path: Path, monkeypatch):
+    _import()
+    import file_hash
+
+    monkeypatch.setattr(file_hash, "BUFFER_BYTES", 4096)
+    monkeypatch.setattr(file_hash, "_local", type(file_hash._local)())
+    for size in (0, 1, 4095, 4096, 4097, 3 * 4096 + 5, 64 * 1024):
+        p = tmp_path / f"f{size}.bin"
+        data = os.urandom(size)
+        p.write_bytes(data)
+        expected = hashlib.sha256(data).hexdigest()
+        for mmap_min in (1, 1 << 30):
+            monkeypatch.setattr(file_hash, "MMAP_MIN_BYTES", mmap_min)
+            assert file_hash.sha256_file(p) == expected, (size, mmap_min)
+            assert file_hash.hash_file(p, ("sha256", "sha256")) == [expected, expected]
+
+
+def test_fast_digest_skips_sha256_for_touched_files(tmp_path: Path, monkeypatch):
+    _import()
+    import file_hash
+    from pipeline_cache import FileDigests
+
+    # Stand-in fast algorithm: md5 is always available
+    monkeypatch.setitem(file_hash.HASHERS, "md5", hashlib.md5)
+    monkeypatch.setattr(file_hash, "FAST_ALGORITHM", "md5")
+    p = tmp_path / "photo.jpg"
+    p.write_bytes(b"x" * 5000)
+    sha, fast = file_hash.file_digests(p)
+    assert (sha, fast) == (hashlib.sha256(b"x" * 5000).hexdigest(), hashlib.md5(b"x" * 5000).hexdigest())
+
+    calls = []
+    real = file_hash.hash_file
+
+    def spy(p, algorithms=("sha256",)):
+        calls.append(tuple(algorithms))
+        return real(p, algorithms)
+
+    monkeypatch.setattr(file_hash, "hash_file", spy)
+
+    digests = FileDigests(tmp_path / "digests.json")
+    assert digests.digest(p) == sha
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    calls.clear()
+    assert digests.digest(p) == sha
+    assert calls == [("md5",)]  # only the fast pre-check ran
+
+    p.write_bytes(b"y" * 5000)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+    calls.clear()
+    assert digests.digest(p) == hashlib.sha256(b"y" * 5000).hexdigest()
+    assert calls == [("md5",), ("sha256", "md5")]
+
+    # Without a fast algorithm, a refresh is a plain SHA-256
+    monkeypatch.setattr(file_hash, "FAST_ALGORITHM", None)
+    assert file_hash.refresh_digests(p, "stale", "stale") == (hashlib.sha256(b"y" * 5000).hexdigest(), None)
@@ -33,3 +33,77 @@ def test_collect_and_save(tmp_path: Path):
     assert out_path.exists()
     data = json.loads(out_path.read_text(encoding="utf-8"))
     assert data == result
+
+
+def _make_images(root: Path, n: int):
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        (root / f"{i:04d}_SDB_GEN.jpg").write_bytes(b"fakejpg")
+    return sorted(root.glob("*.jpg"))
+
+
+def test_async_batch_scales_with_concurrency(tmp_path: Path):
+    import asyncio
+    import time
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+    from gpt4o_batch_analysis_oauth import run_batch_async
+
+    images = _make_images(tmp_path / "imgs", 8)
+    timings = {}
+    with StubOpenAIServer(latency=0.2) as stub:
+        for n in (1, 4):
+            out_dir = tmp_path / f"out_{n}"
+            stub.max_in_flight = 0
+            client = AsyncOpenAI(api_key="test", base_url=stub.base_url)
+            started = time.perf_counter()
+            processed = asyncio.run(run_batch_async(client, images, out_dir, "gpt-4o", concurrency=n))
+            timings[n] = time.perf_counter() - started
+            assert processed == len(images)
+            assert len(list(out_dir.glob("*_analysis.json"))) == len(images)
+            assert stub.max_in_flight == n
+
+    assert timings[4] < timings[1] / 2
+
+
+def test_async_batch_writes_error_file(tmp_path: Path, monkeypatch):
+    import asyncio
+    import threading
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+    import gpt4o_batch_analysis_oauth
+    from gpt4o_batch_analysis_oauth import run_batch_async
+
+    images = _make_images(tmp_path / "imgs", 2)
+    threads = []
+    real_save_error = gpt4o_batch_analysis_oauth.save_error
+
+    def save_error(*args):
+        threads.append(threading.current_thread())
+        return real_save_error(*args)
+
+    monkeypatch.setattr(gpt4o_batch_analysis_oauth, "save_error", save_error)
+
+    class FailingStub(StubOpenAIServer):
+        def respond(self, path, body):
+            return 400, {}, {"error": {"message": "bad image", "type": "invalid_request_error"}}
+
+    out_dir = tmp_path / "out"
+    with FailingStub() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        processed = asyncio.run(run_batch_async(client, images, out_dir, "gpt-4o", concurrency=2))
+
+    assert processed == 0
+    assert sorted(p.name for p in out_dir.glob("*_error.txt")) == [f"{p.stem}_error.txt" for p in images]
+    # Error files are written off the event loop, which keeps serving the other requests
+    assert len(threads) == 2 and threading.main_thread() not in threads
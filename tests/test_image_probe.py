@@ -0,0 +1,67 @@
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def _save(path: Path, fmt: str, size=(120, 80), orientation=None, mode="RGB", **kw):
+    from PIL import Image
+
+    im = Image.new(mode, size, (10, 120, 200) if mode == "RGB" else 128)
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kw["exif"] = exif
+    im.save(path, fmt, **kw)
+    return path
+
+
+def test_probe_matches_pil(tmp_path: Path):
+    _import()
+    from image_probe import pil_info, probe
+
+    files = [
+        _save(tmp_path / "plain.jpg", "JPEG"),
+        _save(tmp_path / "rotated.jpg", "JPEG", orientation=6),
+        _save(tmp_path / "progressive.jpg", "JPEG", (300, 200), progressive=True),
+        _save(tmp_path / "gray.jpg", "JPEG", mode="L"),
+        _save(tmp_path / "plain.png", "PNG", (17, 3)),
+        _save(tmp_path / "rotated.png", "PNG", orientation=8),
+        _save(tmp_path / "lossy.webp", "WEBP", (99, 51)),
+        _save(tmp_path / "lossless.webp", "WEBP", (99, 51), lossless=True),
+        _save(tmp_path / "rotated.webp", "WEBP", orientation=3),
+        _save(tmp_path / "plain.tiff", "TIFF", (70, 90)),
+        _save(tmp_path / "rotated.tiff", "TIFF", orientation=5),
+    ]
+    for p in files:
+        info = probe(p)
+        assert info is not None, p.name
+        assert info == pil_info(p), p.name
+
+    assert probe(tmp_path / "rotated.jpg") == (120, 80, 6, "JPEG")
+    assert probe(tmp_path / "lossless.webp") == (99, 51, None, "WEBP")
+
+
+def test_fallback_and_unreadable(tmp_path: Path):
+    _import()
+    from image_probe import image_info, oriented_size, probe
+
+    gif = _save(tmp_path / "anim.gif", "GIF", (33, 44), mode="L")
+    assert probe(gif) is None
+    assert image_info(gif) == (33, 44, None, "GIF")
+
+    truncated = tmp_path / "truncated.jpg"
+    truncated.write_bytes(b"\xff\xd8\xff\xe0\x00")
+    assert probe(truncated) is None
+    assert image_info(truncated) is None
+    assert image_info(tmp_path / "missing.jpg") is None
+
+    assert oriented_size(120, 80, 6) == (80, 120)
+    assert oriented_size(120, 80, 3) == (120, 80)
+    assert oriented_size(120, 80, None) == (120, 80)
@@ -0,0 +1,129 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+SCHEMA = Path(REPO_ROOT) / "ArBot-Vision-Pack_v0.7.1" / "schemas" / "image_analysis.schema.json"
+
+VALID = {
+    "defects": [{"type": "fissure", "location": "joint", "severity": 3, "confidence": 0.8, "notes": ""}],
+    "probable_causes": ["retrait"],
+    "recommended_actions": ["refaire le joint"],
+    "estimated_impact": {"cost_low_eur": 100, "cost_high_eur": 300, "urgency": 2},
+}
+
+
+def _import():
+    # Ensure repository root on path
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def test_local_repairs():
+    _import()
+    from json_repair import repair_json
+
+    text = json.dumps(VALID)
+    assert repair_json("```json\n" + text + "\n```")[0] == VALID
+    assert repair_json('Here it is: {"a": [1, 2,], "b": 3,}')[0] == {"a": [1, 2], "b": 3}
+    obj, steps = repair_json('{"defects": [{"type": "x"}, {"type": "y", "loc')
+    assert obj == {"defects": [{"type": "x"}]}
+    assert "truncation" in steps
+    assert repair_json("no json here")[0] is None
+
+
+def test_schema_validation():
+    _import()
+    from json_repair import load_schema, validate
+
+    schema = load_schema(SCHEMA)
+    assert validate(VALID, schema) == []
+    bad = dict(VALID, estimated_impact={"cost_low_eur": 1, "cost_high_eur": 2, "urgency": 9})
+    assert validate(bad, schema) == ["$.estimated_impact.urgency: 9 > 5"]
+    assert "$: missing 'defects'" in validate({}, schema)
+
+
+def test_reask_only_when_local_repair_fails(tmp_path: Path):
+    import asyncio
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer, chat_completion
+
+    _import()
+    from gpt4o_batch_analysis_oauth import run_batch_async
+    from json_repair import ResponseRepairer, load_schema
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    (imgs / "0001_SDB_GEN.jpg").write_bytes(b"fenced")
+    (imgs / "0002_SDB_GEN.jpg").write_bytes(b"garbage")
+    images = sorted(imgs.glob("*.jpg"))
+
+    class SloppyStub(StubOpenAIServer):
+        def respond(self, path, body):
+            content = body["messages"][0]["content"]
+            if isinstance(content, str):  # text-only re-ask
+                return 200, {}, chat_completion(body["model"], json.dumps(VALID))
+            url = content[0]["image_url"]["url"]
+            if url.endswith("ZmVuY2Vk"):  # base64("fenced")
+                return 200, {}, chat_completion(body["model"], "```json\n" + json.dumps(VALID) + ",\n```")
+            return 200, {}, chat_completion(body["model"], "Sorry, I cannot see any damage.")
+
+    repairer = ResponseRepairer(load_schema(SCHEMA), max_reasks=1)
+    out_dir = tmp_path / "out"
+    with SloppyStub() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url)
+        asyncio.run(run_batch_async(client, images, out_dir, "gpt-4o", concurrency=2, repairer=repairer))
+        assert all(b.get("response_format") == {"type": "json_object"} for _, b in stub.requests)
+
+    stats = repairer.stats()
+    assert stats["repaired_locally"] == 1
+    assert (stats["reasks"], stats["reask_fixed"]) == (1, 1)
+    for img in images:
+        assert json.loads((out_dir / f"{img.stem}_analysis.json").read_text(encoding="utf-8")) == VALID
+
+
+def test_reask_goes_through_limiter_policy_and_meter(tmp_path: Path):
+    import asyncio
+    from openai import AsyncOpenAI, OpenAI
+    from stub_openai_server import StubOpenAIServer, chat_completion
+
+    _import()
+    from gpt4o_batch_analysis_oauth import UsageMeter, analyze_image, run_batch_async
+    from json_repair import ResponseRepairer, load_schema
+    from rate_limiter import RateLimiter
+    from retry_policy import RetryPolicy
+
+    img = tmp_path / "0001_SDB_GEN.jpg"
+    img.write_bytes(b"garbage")
+
+    class ThrottledReaskStub(StubOpenAIServer):
+        throttled = False
+
+        def respond(self, path, body):
+            if isinstance(body["messages"][0]["content"], str):  # text-only re-ask
+                if not self.throttled:
+                    self.throttled = True
+                    return 429, {"retry-after": "0.05"}, {"error": {"message": "slow down"}}
+                return 200, {}, chat_completion(body["model"], json.dumps(VALID))
+            return 200, {}, chat_completion(body["model"], "Sorry, I cannot see any damage.")
+
+    repairer = ResponseRepairer(load_schema(SCHEMA), max_reasks=1)
+    limiter = RateLimiter(rpm=600, tpm=100000)
+    meter = UsageMeter()
+    with ThrottledReaskStub() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        asyncio.run(run_batch_async(client, [img], tmp_path / "out", "gpt-4o", concurrency=1,
+                                    limiter=limiter, repairer=repairer, meter=meter))
+    assert json.loads((tmp_path / "out" / f"{img.stem}_analysis.json").read_text(encoding="utf-8")) == VALID
+    assert limiter.stats()["throttled_429"] == 1
+    assert limiter.stats()["requests_granted"] == 3
+    assert (meter.requests, meter.images) == (2, 1)
+
+    meter = UsageMeter()
+    with ThrottledReaskStub() as stub:
+        client = OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        result = analyze_image(client, img, "gpt-4o", policy=RetryPolicy(base_delay=0.01),
+                               repairer=ResponseRepairer(load_schema(SCHEMA), max_reasks=1), meter=meter)
+    assert result == VALID
+    assert (meter.requests, meter.images) == (2, 1)
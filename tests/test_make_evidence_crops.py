@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure scripts/ on path
+    scripts = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "scripts"))
+    if scripts not in sys.path:
+        sys.path.insert(0, scripts)
+
+
+def _image(path: Path, size=(400, 200), color=(200, 10, 10)):
+    from PIL import Image
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", size, color).save(path, "JPEG")
+
+
+def _analysis(path: Path, file_name: str, annotations, generated_at="2025-10-17T11:08:15Z"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "meta": {"generated_at": generated_at},
+        "source_file": {"file_ID": file_name[:4], "file_name": file_name},
+        "vision": {"annotations": annotations, "evidence_crops": []},
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _polygon(ann_id, box):
+    x0, y0, x1, y1 = box
+    return {"ann_ID": ann_id, "ann_type": "polygon", "evidence_crop": "", "bbox_xyxy_norm": box,
+            "polygon_norm": [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]}
+
+
+def _run(monkeypatch, *extra):
+    import make_evidence_crops as mc
+
+    decoded = []
+    real = mc.build_crops
+
+    def counting(job):
+        decoded.append((Path(job[0]).name, sorted(name for name, _, _ in job[2])))
+        return real(job)
+
+    monkeypatch.setattr(mc, "build_crops", counting)
+    monkeypatch.setattr(sys, "argv", ["make_evidence_crops.py", "--analysis_dir", "analyses",
+                                      "--workers", "1", *extra])
+    mc.main()
+    return sorted(decoded)
+
+
+def test_crops_are_grouped_per_image_and_incremental(tmp_path: Path, monkeypatch):
+    _import()
+    from PIL import Image
+
+    monkeypatch.chdir(tmp_path)
+    _image(tmp_path / "images" / "0001_SDB_GEN_20250818.jpg")
+    _image(tmp_path / "images" / "0002_WC_GEN_20250818.jpg", (100, 100))
+    analyses = tmp_path / "analyses"
+    first = analyses / "0001_SDB_GEN_20250818_analysis.json"
+    _analysis(first, "0001_SDB_GEN_20250818.jpg", [
+        _polygon("0001_D01_A01", [0.25, 0.25, 0.75, 0.75]),
+        {"ann_ID": "0001_D01_A02", "ann_type": "point", "evidence_crop": "", "bbox_xyxy_norm": [0.0, 0.0, 0.1, 0.1]},
+    ])
+    # Stale re-download: never read for crops, never rewritten
+    stale = analyses / "0001_SDB_GEN_20250818_analysis(1).json"
+    _analysis(stale, "0001_SDB_GEN_20250818.jpg", [_polygon("0001_OLD", [0, 0, 1, 1])], "2025-01-01T00:00:00Z")
+    _analysis(analyses / "0002_WC_GEN_20250818_analysis.json", "0002_WC_GEN_20250818.jpg",
+              [_polygon("0002_D01_A01", [0.1, 0.1, 0.5, 0.5])])
+    _analysis(analyses / "0003_SDB_GEN_20250818_analysis.json", "0003_SDB_GEN_20250818.jpg",
+              [_polygon("0003_D01_A01", [0.1, 0.1, 0.5, 0.5])])  # no photo
+
+    # One decode per image, every crop of it in the same job
+    assert _run(monkeypatch, "--max_side", "100", "--pad", "0.2") == [
+        ("0001_SDB_GEN_20250818.jpg", ["0001_D01_A01.webp", "0001_D01_A02.webp"]),
+        ("0002_WC_GEN_20250818.jpg", ["0002_D01_A01.webp"]),
+    ]
+    crops = tmp_path / "images" / "preview" / "crops"
+    with Image.open(crops / "0001_D01_A01.webp") as im:
+        assert im.size == (100, 50)  # 280x140 padded box, downscaled to 100 on its long side
+    with Image.open(crops / "0001_D01_A02.webp") as im:
+        assert im.size == (48, 24)  # clipped to the image, never upscaled
+    data = json.loads(first.read_text(encoding="utf-8"))
+    assert data["vision"]["evidence_crops"] == ["crops/0001_D01_A01.webp", "crops/0001_D01_A02.webp"]
+    assert [a["evidence_crop"] for a in data["vision"]["annotations"]] == data["vision"]["evidence_crops"]
+    assert json.loads(stale.read_text(encoding="utf-8"))["vision"]["evidence_crops"] == []
+    assert not (crops / "0003_D01_A01.webp").exists()
+
+    # Unchanged source and geometry: no image is decoded
+    assert _run(monkeypatch, "--max_side", "100", "--pad", "0.2") == []
+    src = tmp_path / "images" / "0001_SDB_GEN_20250818.jpg"
+    st = src.stat()
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert _run(monkeypatch, "--max_side", "100", "--pad", "0.2") == []
+
+    # Moved polygon: only that crop; new pixels: every crop of that image; removed annotation: crop deleted
+    data["vision"]["annotations"][0] = _polygon("0001_D01_A01", [0.5, 0.5, 1.0, 1.0])
+    del data["vision"]["annotations"][1]
+    first.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    assert _run(monkeypatch, "--max_side", "100", "--pad", "0.2") == [
+        ("0001_SDB_GEN_20250818.jpg", ["0001_D01_A01.webp"])]
+    assert not (crops / "0001_D01_A02.webp").exists()
+    assert json.loads(first.read_text(encoding="utf-8"))["vision"]["evidence_crops"] == ["crops/0001_D01_A01.webp"]
+    _image(tmp_path / "images" / "0002_WC_GEN_20250818.jpg", (100, 100), (10, 200, 10))
+    assert _run(monkeypatch, "--max_side", "100", "--pad", "0.2") == [
+        ("0002_WC_GEN_20250818.jpg", ["0002_D01_A01.webp"])]
+
+    # New settings redo everything
+    assert len(_run(monkeypatch, "--max_side", "100", "--pad", "0.2", "--mask")) == 2
+    assert not list(crops.glob(".*.tmp"))
+
+    # Crops elsewhere: the references still resolve from the previews folder
+    _run(monkeypatch, "--max_side", "100", "--pad", "0.2", "--crops_dir", "evidence")
+    ref = json.loads(first.read_text(encoding="utf-8"))["vision"]["evidence_crops"][0]
+    assert ref == "../../evidence/0001_D01_A01.webp"
+    assert (tmp_path / "images" / "preview" / ref).resolve().exists()
+
+
+def test_polygon_mask_and_exif_orientation(tmp_path: Path):
+    _import()
+    from PIL import Image
+    import make_evidence_crops as mc
+
+    im = Image.new("RGB", (300, 200), (240, 240, 240))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # stored landscape, displayed portrait (200x300)
+    src = tmp_path / "0001_SDB_GEN.jpg"
+    im.save(src, "JPEG", exif=exif)
+
+    triangle = [[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]]
+    _, _, written, error = mc.build_crops((str(src), str(tmp_path / "crops"),
+                                           [("t.webp", [0.0, 0.0, 1.0, 1.0], triangle)], 1000, 90, True))
+    assert (written, error) == (["t.webp"], None)
+    with Image.open(tmp_path / "crops" / "t.webp") as crop:
+        assert crop.size == (200, 300)
+        assert crop.mode == "RGBA"
+        assert crop.getpixel((10, 10))[3] == 255
+        assert crop.getpixel((190, 290))[3] == 0
+    assert mc.crop_geometry({"polygon_norm": triangle}) == ([0.0, 0.0, 1.0, 1.0], triangle)
+    assert mc.crop_geometry({"ann_type": "point"}) is None
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure scripts/ on path
+    scripts = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "scripts"))
+    if scripts not in sys.path:
+        sys.path.insert(0, scripts)
+
+
+def _image(path: Path, size=(200, 100), color=(200, 10, 10)):
+    from PIL import Image
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", size, color).save(path, "JPEG")
+
+
+def _run(monkeypatch, *extra):
+    import make_previews_and_augment_json as mp
+
+    generated = []
+    real = mp.gen_preview
+
+    def counting(src, dst, **kw):
+        generated.append(Path(src).name)
+        real(src, dst, **kw)
+
+    monkeypatch.setattr(mp, "gen_preview", counting)
+    monkeypatch.setattr(sys, "argv", ["make_previews_and_augment_json.py", "--owner", "o", "--repo", "r",
+                                      "--out_json", "json/db.json", "--max_side", "64", "--workers", "1", *extra])
+    mp.main()
+    return sorted(generated)
+
+
+def test_rerun_touches_no_pixels(tmp_path: Path, monkeypatch):
+    _import()
+    monkeypatch.chdir(tmp_path)
+    _image(tmp_path / "images" / "0001_SDB_GEN_20250818.jpg")
+    _image(tmp_path / "images" / "sub" / "0002_WC_DET.jpg", (50, 80))
+
+    assert _run(monkeypatch) == ["0001_SDB_GEN_20250818.jpg", "0002_WC_DET.jpg"]
+    preview = tmp_path / "images" / "preview" / "0001_SDB_GEN_20250818.webp"
+    from PIL import Image
+    with Image.open(preview) as im:
+        assert im.size == (64, 32)
+    assert (tmp_path / "images" / "preview" / "sub" / "0002_WC_DET.webp").exists()
+    db = json.loads((tmp_path / "json" / "db.json").read_text(encoding="utf-8"))
+    assert db["count"] == 2  # previews under images/ are not taken for photos
+
+    # Nothing new: no preview is rebuilt
+    assert _run(monkeypatch) == []
+
+    # Touched only: the recorded hash matches, still nothing to do
+    src = tmp_path / "images" / "0001_SDB_GEN_20250818.jpg"
+    st = src.stat()
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert _run(monkeypatch) == []
+
+    # New content, or new settings, rebuild
+    _image(src, color=(10, 200, 10))
+    assert _run(monkeypatch) == ["0001_SDB_GEN_20250818.jpg"]
+    assert _run(monkeypatch, "--quality", "70") == ["0001_SDB_GEN_20250818.jpg", "0002_WC_DET.jpg"]
+    assert _run(monkeypatch, "--quality", "70", "--force") == ["0001_SDB_GEN_20250818.jpg", "0002_WC_DET.jpg"]
+    assert not list((tmp_path / "images" / "preview").glob(".*.tmp"))
+
+
+def test_draft_decode_matches_full_decode(tmp_path: Path):
+    _import()
+    from PIL import Image, ImageDraw
+    import make_previews_and_augment_json as mp
+
+    im = Image.new("RGB", (1600, 1000), (240, 240, 240))
+    draw = ImageDraw.Draw(im)
+    for i in range(0, 1600, 40):
+        draw.rectangle([i, 100, i + 20, 900], fill=(i % 255, 80, 160))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # stored landscape, displayed portrait
+    src = tmp_path / "0001_SDB_GEN.jpg"
+    im.save(src, "JPEG", quality=92, exif=exif)
+
+    full = mp.render_preview(src, 300, draft=False)
+    reduced = mp.render_preview(src, 300, draft=True)
+    assert full.size == reduced.size == (187, 300)
+    assert mp.psnr(full, full) == float("inf")
+    assert abs(mp.ssim(full, full) - 1.0) < 1e-6
+    assert mp.psnr(full, reduced) > 30
+    assert mp.ssim(full, reduced) > 0.95
+
+    # Not JPEG, or no downscale: nothing to draft
+    png = tmp_path / "0002_SDB_GEN.png"
+    im.save(png)
+    assert mp.render_preview(png, 300).size == (300, 187)
+    assert mp.render_preview(src, 4000).size == (1000, 1600)
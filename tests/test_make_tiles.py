@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure scripts/ on path
+    scripts = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "scripts"))
+    if scripts not in sys.path:
+        sys.path.insert(0, scripts)
+
+
+def _image(path: Path, size, color=(200, 10, 10)):
+    from PIL import Image, ImageDraw
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    im = Image.new("RGB", size, color)
+    ImageDraw.Draw(im).ellipse([10, 10, size[0] - 10, size[1] - 10], fill=(20, 20, 220))
+    im.save(path, "JPEG")
+
+
+def _run(monkeypatch, script, *extra):
+    monkeypatch.setattr(sys, "argv", [f"{script.__name__}.py", "--owner", "o", "--repo", "r",
+                                      "--out_json", "json/db.json", "--workers", "1", *extra])
+    script.main()
+
+
+def _tile_hashes(root: Path):
+    return {p.relative_to(root).as_posix(): hashlib.sha256(p.read_bytes()).hexdigest()
+            for p in sorted(root.rglob("*.webp"))}
+
+
+def test_pyramid_is_incremental_and_deterministic(tmp_path: Path, monkeypatch):
+    _import()
+    import make_previews_and_augment_json as mp
+    import make_tiles
+
+    monkeypatch.chdir(tmp_path)
+    _image(tmp_path / "images" / "0001_SDB_GEN_20250818.jpg", (600, 300))
+    _image(tmp_path / "images" / "0002_WC_DET.jpg", (100, 90))
+    _run(monkeypatch, mp, "--max_side", "64")
+    _run(monkeypatch, make_tiles, "--tile_size", "128")
+
+    tiles = tmp_path / "images" / "tiles"
+    info = json.loads((tiles / "0001_SDB_GEN_20250818" / "tiles.json").read_text(encoding="utf-8"))
+    assert [(l["width"], l["height"], l["cols"], l["rows"]) for l in info["levels"]] == [
+        (600, 300, 5, 3), (300, 150, 3, 2), (150, 75, 2, 1), (75, 38, 1, 1)]
+    assert len(list((tiles / "0001_SDB_GEN_20250818").rglob("*.webp"))) == 15 + 6 + 2 + 1
+    assert sorted(p.name for p in (tiles / "0002_WC_DET").rglob("*.webp")) == ["0_0.webp"]
+
+    db = json.loads((tmp_path / "json" / "db.json").read_text(encoding="utf-8"))
+    entry = db["items"][0]["tiles"]
+    assert entry == {"url": "https://raw.githubusercontent.com/o/r/main/images/tiles/0001_SDB_GEN_20250818/tiles.json",
+                     "tile_size": 128, "levels": 4, "width": 600, "height": 300, "format": "webp"}
+    # Tiles are neither previewed nor tiled again
+    _run(monkeypatch, mp, "--max_side", "64")
+    assert json.loads((tmp_path / "json" / "db.json").read_text(encoding="utf-8"))["count"] == 2
+
+    before = _tile_hashes(tiles)
+    mtimes = {p: p.stat().st_mtime_ns for p in tiles.rglob("*.webp")}
+    _run(monkeypatch, make_tiles, "--tile_size", "128")
+    assert {p: p.stat().st_mtime_ns for p in tiles.rglob("*.webp")} == mtimes  # nothing rewritten
+    _run(monkeypatch, make_tiles, "--tile_size", "128", "--force")
+    assert _tile_hashes(tiles) == before  # rebuilt byte for byte
+
+    (tmp_path / "images" / "0002_WC_DET.jpg").unlink()
+    _run(monkeypatch, make_tiles, "--tile_size", "128")
+    assert not (tiles / "0002_WC_DET").exists()
+    db = json.loads((tmp_path / "json" / "db.json").read_text(encoding="utf-8"))
+    assert "tiles" not in db["items"][1]
+    assert not [p for p in tiles.iterdir() if p.name.endswith((".tmp", ".old"))]
+
+
+def test_images_root_given_differently_from_last_run(tmp_path: Path, monkeypatch):
+    _import()
+    import make_previews_and_augment_json as mp
+    import make_tiles
+
+    monkeypatch.chdir(tmp_path)
+    _image(tmp_path / "images" / "0001_SDB_GEN_20250818.jpg", (300, 200))
+    _image(tmp_path / "images" / "0002_WC_DET.jpg", (100, 90))
+    _run(monkeypatch, mp, "--max_side", "64")
+    _run(monkeypatch, make_tiles, "--tile_size", "128")
+
+    # Absolute paths this time, and one source is gone: its pyramid goes, the other stays
+    (tmp_path / "images" / "0002_WC_DET.jpg").unlink()
+    tiles = tmp_path / "images" / "tiles"
+    _run(monkeypatch, make_tiles, "--tile_size", "128", "--images", str(tmp_path / "images"),
+         "--tiles_dir", str(tiles), "--preview_dir", str(tmp_path / "images" / "preview"))
+    assert not (tiles / "0002_WC_DET").exists()
+    assert (tiles / "0001_SDB_GEN_20250818" / "tiles.json").exists()
+
+    # Back to relative paths: the absolute keys are resolved through their stored folder
+    _run(monkeypatch, make_tiles, "--tile_size", "128")
+    assert (tiles / "0001_SDB_GEN_20250818" / "tiles.json").exists()
@@ -26,3 +26,200 @@ def test_oauth_manager_builds_auth_url(monkeypatch):
     assert qs.get("client_id", [None])[0] == "test_client_id"
     assert qs.get("redirect_uri", [None])[0] == "http://localhost:8000/callback"
     assert qs.get("response_type", [None])[0] == "code"
+
+
+def _manager(monkeypatch, tmp_path, token_url):
+    monkeypatch.setenv("OPENAI_CLIENT_ID", "test_client_id")
+    monkeypatch.setenv("OPENAI_CLIENT_SECRET", "test_client_secret")
+    monkeypatch.chdir(tmp_path)
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+    import oauth_token_manager as otm
+    mgr = otm.OAuthTokenManager(token_file=tmp_path / ".oauth" / "openai_token.json")
+    mgr.TOKEN_URL = token_url
+    return otm, mgr
+
+
+def _stored_token(expires_in, age_s):
+    from datetime import datetime, timedelta
+    obtained = datetime.utcnow() - timedelta(seconds=age_s)
+    return {"access_token": "access-0", "refresh_token": "refresh-0",
+            "expires_in": expires_in, "obtained_at": obtained.isoformat()}
+
+
+def test_concurrent_callers_share_one_refresh(monkeypatch, tmp_path):
+    import threading
+    from stub_openai_server import FakeTokenServer
+
+    with FakeTokenServer(latency=0.2) as server:
+        otm, mgr = _manager(monkeypatch, tmp_path, server.token_url)
+        mgr.save_token(_stored_token(expires_in=60, age_s=120))  # expired
+
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(mgr.get_valid_token())) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert tokens == ["access-1"] * 16
+        assert len(server.requests) == 1
+        # Served from memory afterwards, even if the file disappears
+        mgr.token_file.unlink()
+        assert mgr.get_valid_token() == "access-1"
+        assert len(server.requests) == 1
+        mgr.close()
+
+
+def test_token_near_expiry_is_refreshed_in_background(monkeypatch, tmp_path):
+    from stub_openai_server import FakeTokenServer
+
+    with FakeTokenServer() as server:
+        otm, mgr = _manager(monkeypatch, tmp_path, server.token_url)
+        # Still valid for ~100s, inside the proactive refresh margin
+        mgr.save_token(_stored_token(expires_in=otm.REFRESH_MARGIN_S + 100, age_s=otm.REFRESH_MARGIN_S))
+
+        assert mgr.get_valid_token() == "access-0"  # first load, blocking
+        assert mgr.get_valid_token() == "access-0"  # near expiry: served, refresh kicked off
+        mgr._refresh_thread.join(timeout=5)
+        assert mgr.get_valid_token() == "access-1"
+        assert server.issued == 1
+        assert mgr.load_token()["access_token"] == "access-1"
+        mgr.close()
+
+
+def _worker_tokens(token_file, token_url, calls, out_queue):
+    # Runs in a separate process
+    from oauth_token_manager import OAuthTokenManager
+
+    mgr = OAuthTokenManager(token_file=token_file)
+    mgr.TOKEN_URL = token_url
+    tokens = {mgr.get_valid_token() for _ in range(calls)}
+    out_queue.put((sorted(tokens), mgr.refresh_count))
+    mgr.close()
+
+
+def test_processes_share_one_refresh_through_the_token_file(monkeypatch, tmp_path):
+    import multiprocessing
+    from stub_openai_server import FakeTokenServer
+
+    # Rotating refresh tokens: a second refresh with the old one would fail
+    with FakeTokenServer(latency=0.2, rotate=True) as server:
+        otm, mgr = _manager(monkeypatch, tmp_path, server.token_url)
+        mgr.save_token(_stored_token(expires_in=60, age_s=120))  # expired
+        generation = mgr.load_token()["generation"]
+
+        ctx = multiprocessing.get_context("spawn")
+        out = ctx.Queue()
+        procs = [ctx.Process(target=_worker_tokens, args=(mgr.token_file, server.token_url, 20, out))
+                 for _ in range(6)]
+        for proc in procs:
+            proc.start()
+        results = [out.get(timeout=60) for _ in procs]
+        for proc in procs:
+            proc.join(timeout=10)
+
+    assert all(tokens == ["access-1"] for tokens, _ in results)
+    assert sum(refreshes for _, refreshes in results) == 1
+    assert server.issued == 1
+    stored = mgr.load_token()
+    assert stored["refresh_token"] == "refresh-1"
+    assert stored["generation"] == generation + 1
+    # The first process' manager picks the peer's token up without refreshing
+    assert mgr.get_valid_token() == "access-1"
+    assert mgr.refresh_count == 0
+
+
+def _expiring_api(tokens, expire_after):
+    """Chat stub accepting only the token server's latest token; "access-0" expires mid-run."""
+    from stub_openai_server import StubOpenAIServer
+
+    class ExpiringApi(StubOpenAIServer):
+        def __init__(self):
+            super().__init__()
+            self.expired = set()
+            self.rejected = 0
+
+        def authorize(self, authorization):
+            with self._lock:
+                if len(self.requests) > expire_after:
+                    self.expired.add("Bearer access-0")
+                if authorization in self.expired or authorization != f"Bearer access-{tokens.issued}":
+                    self.rejected += 1
+                    return 401, {}, {"error": {"message": "token expired", "type": "invalid_request_error"}}
+            return None
+
+    return ExpiringApi()
+
+
+def test_batch_refreshes_a_token_expiring_mid_run(monkeypatch, tmp_path):
+    import asyncio
+    from stub_openai_server import FakeTokenServer
+
+    with FakeTokenServer() as server:
+        otm, mgr = _manager(monkeypatch, tmp_path, server.token_url)
+        mgr.save_token(_stored_token(expires_in=3600, age_s=0))  # valid by its own deadline
+        import gpt4o_batch_analysis_oauth as g
+
+        imgs = tmp_path / "imgs"
+        imgs.mkdir()
+        for i in range(6):
+            (imgs / f"{i:04d}_SDB_GEN.jpg").write_bytes(b"img%d" % i)
+        images = sorted(imgs.glob("*.jpg"))
+
+        with _expiring_api(server, expire_after=2) as api:
+            client = g.get_async_openai_client(api.base_url, max_retries=0, manager=mgr)
+            processed = asyncio.run(g.run_batch_async(client, images, tmp_path / "out", "gpt-4o", concurrency=2))
+            assert processed == 6
+            assert api.rejected >= 1
+            assert server.issued == 1  # concurrent 401s share one refresh
+            assert not list((tmp_path / "out").glob("*_error.txt"))
+
+            # Same for the synchronous client
+            api.expired.add("Bearer access-1")
+            monkeypatch.setattr(g, "_token_manager", mgr)
+            processed = g.run_batch(g.get_openai_client(api.base_url, max_retries=0), images[:2],
+                                    tmp_path / "out", "gpt-4o")
+            assert processed == 2
+            assert server.issued == 2
+        mgr.close()
+
+
+def test_batch_token_is_refreshed_ahead_of_expiry(monkeypatch, tmp_path):
+    import asyncio
+    from stub_openai_server import FakeTokenServer, StubOpenAIServer
+
+    class RecordingApi(StubOpenAIServer):
+        def __init__(self):
+            super().__init__(latency=0.05)
+            self.tokens = []
+
+        def authorize(self, authorization):
+            with self._lock:
+                self.tokens.append(authorization)
+            return None
+
+    with FakeTokenServer() as server:
+        otm, mgr = _manager(monkeypatch, tmp_path, server.token_url)
+        # Still valid for a minute, inside the proactive refresh margin
+        mgr.save_token(_stored_token(expires_in=otm.REFRESH_MARGIN_S + 60, age_s=otm.REFRESH_MARGIN_S))
+        import gpt4o_batch_analysis_oauth as g
+
+        imgs = tmp_path / "imgs"
+        imgs.mkdir()
+        for i in range(8):
+            (imgs / f"{i:04d}_SDB_GEN.jpg").write_bytes(b"img%d" % i)
+
+        with RecordingApi() as api:
+            client = g.get_async_openai_client(api.base_url, max_retries=0, manager=mgr)
+            processed = asyncio.run(g.run_batch_async(client, sorted(imgs.glob("*.jpg")), tmp_path / "out",
+                                                      "gpt-4o", concurrency=2))
+        assert processed == 8
+        # Early requests go out with the old token while the refresh runs; the later ones use the new one
+        assert api.tokens[-1] == "Bearer access-1"
+        assert set(api.tokens) == {"Bearer access-0", "Bearer access-1"}
+        assert server.issued == 1
+        assert mgr.load_token()["access_token"] == "access-1"
+        mgr.close()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def test_group_for_packing_by_zone_and_category():
+    _import()
+    from gpt4o_batch_analysis_oauth import group_for_packing
+
+    names = ["0101_SDB.jpg", "0102_SDB.jpg", "0103_SDB.jpg", "0150_SDB.jpg",
+             "0201_SDB.jpg", "1101_WC.jpg", "notes.jpg"]
+    packs = group_for_packing([Path("imgs") / n for n in names], 3)
+    assert [[p.name for p in pack] for pack in packs] == [
+        ["0101_SDB.jpg", "0102_SDB.jpg", "0103_SDB.jpg"],
+        ["0150_SDB.jpg"],
+        ["0201_SDB.jpg"],
+        ["1101_WC.jpg"],
+        ["notes.jpg"],
+    ]
+
+
+def test_packed_run_splits_results_per_image(tmp_path: Path):
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer, chat_completion
+
+    _import()
+    from gpt4o_batch_analysis_oauth import UsageMeter, make_cache, run_packed_async
+    from retry_policy import DeadLetterQueue, RetryPolicy
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    for name in ("0101_SDB.jpg", "0102_SDB.jpg", "0103_SDB.jpg", "1201_WC.jpg"):
+        (imgs / name).write_bytes(name.encode())
+    images = sorted(imgs.glob("*.jpg"))
+
+    class PackStub(StubOpenAIServer):
+        def respond(self, path, body):
+            parts = body["messages"][0]["content"]
+            labels = [p["text"].split(": ") for p in parts if p["type"] == "text" and p["text"].startswith("image_")]
+            answer = {label: {"defects": [{"type": name}]} for label, name in labels
+                      if name != "0103_SDB.jpg"}  # the model forgets one photo
+            return 200, {}, chat_completion(body["model"], json.dumps(answer))
+
+    out_dir = tmp_path / "out"
+    dlq = DeadLetterQueue(out_dir / "dead_letter")
+    meter = UsageMeter()
+    cache = make_cache(tmp_path / "cache")
+    with PackStub() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        processed = asyncio.run(run_packed_async(
+            client, images, out_dir, "gpt-4o", pack_size=3, concurrency=2, cache=cache,
+            policy=RetryPolicy(max_attempts=1), dead_letters=dlq, meter=meter))
+        assert len(stub.requests) == 2  # 3 related photos + 1 on its own
+
+        # The split results are cached per image: a second run only re-sends the missing one
+        processed_again = asyncio.run(run_packed_async(
+            client, images, tmp_path / "out2", "gpt-4o", pack_size=3, cache=cache))
+        assert len(stub.requests) == 3
+
+    assert processed == 3
+    assert processed_again == 3
+    for img in images:
+        if img.name == "0103_SDB.jpg":
+            assert (out_dir / "0103_SDB_error.txt").exists()
+            continue
+        result = json.loads((out_dir / f"{img.stem}_analysis.json").read_text(encoding="utf-8"))
+        assert result["defects"][0]["type"] == img.name
+    assert dlq.images() == [imgs / "0103_SDB.jpg"]
+    assert meter.stats()["requests"] == 2
+    assert meter.stats()["images"] == 4
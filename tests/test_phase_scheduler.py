@@ -0,0 +1,225 @@
+import os
+import sys
+import time
+
+import pytest
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def _sleep_phase(Phase, name, seconds, inputs=(), outputs=()):
+    def fn(**kwargs):
+        time.sleep(seconds)
+        return {out: name for out in outputs}
+    return Phase(name, fn, inputs, outputs)
+
+
+def test_independent_phases_overlap_and_critical_path():
+    _import()
+    from phase_scheduler import Phase, PhaseScheduler
+
+    phases = [
+        _sleep_phase(Phase, "LOAD", 0.05, outputs=["data"]),
+        _sleep_phase(Phase, "COUNT", 0.3, inputs=["data"], outputs=["counts"]),
+        _sleep_phase(Phase, "DETECT", 0.1, inputs=["data"], outputs=["defects"]),
+        _sleep_phase(Phase, "LINK", 0.1, inputs=["defects"], outputs=["links"]),
+        _sleep_phase(Phase, "REPORT", 0.01, inputs=["counts", "links"], outputs=["report"]),
+    ]
+    scheduler = PhaseScheduler(phases, workers=4)
+    artifacts = scheduler.run()
+
+    assert artifacts["report"] == "REPORT"
+    summary = scheduler.summary()
+    assert summary["sum_phase_s"] >= 0.55
+    assert summary["wall_s"] < 0.5  # COUNT ran alongside DETECT -> LINK
+    assert summary["critical_path"] == ["LOAD", "COUNT", "REPORT"]
+
+
+def test_inactive_phase_skips_its_dependents():
+    _import()
+    from phase_scheduler import Phase, PhaseScheduler
+
+    ran = []
+
+    def record(name, outputs):
+        return Phase(name, lambda **kw: ran.append(name) or {o: 1 for o in outputs},
+                     inputs=[] if name == "A" else ["a"], outputs=outputs)
+
+    phases = [record("A", ["a"]), record("B", ["b"]), Phase("C", lambda b: {}, inputs=["b"])]
+    scheduler = PhaseScheduler(phases, active={"B": False})
+    scheduler.run()
+
+    assert ran == ["A"]
+    assert scheduler.status == {"A": "success", "B": "skipped", "C": "skipped"}
+    assert "B" in scheduler.reasons["C"]
+
+    with pytest.raises(ValueError):
+        PhaseScheduler([Phase("X", lambda y: {}, inputs=["y"], outputs=["x"]),
+                        Phase("Y", lambda x: {}, inputs=["x"], outputs=["y"])]).run()
+
+
+def test_cached_rerun_executes_only_what_changed(tmp_path):
+    _import()
+    from phase_scheduler import Phase, PhaseScheduler
+    from pipeline_cache import PhaseCache
+
+    src = tmp_path / "src.json"
+    src.write_text("1")
+    calls = []
+
+    def phases(summary_version="1"):
+        cache = PhaseCache(tmp_path / "cache")
+
+        def load():
+            calls.append("LOAD")
+            return {"raw": int(src.read_text())}
+
+        def double(raw):
+            calls.append("DOUBLE")
+            return {"doubled": raw * 2}
+
+        def count(controlpanel):
+            calls.append("COUNT")
+            return {"count": len(controlpanel)}
+
+        def summary(doubled, count):
+            calls.append("SUMMARY")
+            return {"summary": (doubled, count)}
+
+        return cache, [
+            Phase("LOAD", load, outputs=["raw"], store=False,
+                  fingerprint=lambda: cache.fingerprint_files([src])),
+            Phase("DOUBLE", double, inputs=["raw"], outputs=["doubled"]),
+            Phase("COUNT", count, inputs=["controlpanel"], outputs=["count"]),
+            Phase("SUMMARY", summary, inputs=["doubled", "count"], outputs=["summary"],
+                  version=summary_version),
+        ]
+
+    def run(summary_version="1"):
+        calls.clear()
+        cache, ps = phases(summary_version)
+        artifacts = PhaseScheduler(ps, cache=cache).run({"controlpanel": {"a": 1}})
+        cache.save()
+        return artifacts
+
+    assert run()["summary"] == (2, 1)
+    assert sorted(calls) == ["COUNT", "DOUBLE", "LOAD", "SUMMARY"]
+
+    artifacts = run()
+    assert calls == []
+    assert not artifacts.is_loaded("summary")
+    assert artifacts["summary"] == (2, 1)  # unpickled on demand
+
+    src.write_text("5")
+    assert run()["summary"] == (10, 1)
+    assert sorted(calls) == ["DOUBLE", "LOAD", "SUMMARY"]
+
+    # New SUMMARY code: its stored inputs are loaded, nothing upstream reruns
+    assert run(summary_version="2")["summary"] == (10, 1)
+    assert calls == ["SUMMARY"]
+
+
+def test_unstored_phase_is_recomputed_on_demand(tmp_path):
+    _import()
+    from phase_scheduler import Phase, PhaseScheduler
+    from pipeline_cache import PhaseCache
+
+    calls = []
+
+    def run(version):
+        cache = PhaseCache(tmp_path / "cache")
+        ps = [
+            Phase("PARSE", lambda: calls.append("PARSE") or {"parsed": [1, 2, 3]},
+                  outputs=["parsed"], store=False),
+            Phase("SUM", lambda parsed: calls.append("SUM") or {"total": sum(parsed)},
+                  inputs=["parsed"], outputs=["total"], version=version),
+        ]
+        return PhaseScheduler(ps, cache=cache).run()
+
+    run("1")
+    calls.clear()
+    assert run("2")["total"] == 6
+    assert calls == ["PARSE", "SUM"]  # PARSE was a hit, but SUM needed its output
+
+
+def test_only_the_changed_analysis_is_reprocessed(tmp_path, monkeypatch):
+    _import()
+    import json
+    import run_pipeline
+    from phase_scheduler import PhaseScheduler
+    from pipeline_cache import PhaseCache
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "json").mkdir()
+    (tmp_path / "json" / "images_db.json").write_text('{"items": []}')
+    (tmp_path / "json" / "docs_index.json").write_text('{"documents": [], "total_documents": 0}')
+    analyses = tmp_path / "analyses"
+    analyses.mkdir()
+
+    def write(file_id, defects):
+        data = {"source_file": {"file_name": f"{file_id}_SDB.jpg", "zone_name": "SDB"},
+                "vision": {"defects": [{"id_defaut": f"{file_id}_D{i:02d}", "categorie": c}
+                                       for i, c in enumerate(defects)], "annotations": []}}
+        (analyses / f"{file_id}_SDB_analysis.json").write_text(json.dumps(data))
+
+    for file_id in ("0001", "0002", "0003"):
+        write(file_id, ["JOINT"])
+
+    read = []
+    real_read_group = run_pipeline.read_group
+    monkeypatch.setattr(run_pipeline, "ANALYSIS_RESULTS_DIR", str(analyses))
+    monkeypatch.setattr(run_pipeline, "read_group",
+                        lambda file_id, paths: read.append(file_id) or real_read_group(file_id, paths))
+    controlpanel = {"paths_filters": {"paths": {"photos_dir": str(tmp_path / "images")}}}
+
+    def run(cache):
+        artifacts = PhaseScheduler(run_pipeline.build_phases(controlpanel, cache), cache=cache).run(
+            {"controlpanel": controlpanel})
+        if cache is not None:
+            cache.save()
+        return artifacts["vision_analysis"], artifacts["defect_detection"]
+
+    run(PhaseCache(tmp_path / "cache"))
+    assert sorted(read) == ["0001", "0002", "0003"]
+
+    write("0002", ["JOINT", "PEINTURE"])
+    read.clear()
+    cache = PhaseCache(tmp_path / "cache")
+    vision, defects = run(cache)
+    assert read == ["0002"]
+    assert cache.stats()["files_rederived"] == 1 and cache.stats()["files_memoized"] == 2
+    assert defects["stats"]["defects_by_category"] == {"JOINT": 3, "PEINTURE": 1}
+    assert (vision, defects) == run(None)  # same phase results as a full recompute
+
+
+def test_save_prunes_entries_the_run_did_not_use(tmp_path):
+    _import()
+    from phase_scheduler import Phase, PhaseScheduler
+    from pipeline_cache import PhaseCache
+
+    def run(value):
+        cache = PhaseCache(tmp_path / "cache")
+        scheduler = PhaseScheduler([Phase("SQUARE", lambda value: {"square": value * value},
+                                          inputs=["value"], outputs=["square"])], cache=cache)
+        assert scheduler.run({"value": value})["square"] == value * value
+        key = scheduler.keys["SQUARE"]
+        with cache.open_text(key) as out:
+            out.write(b"{}")
+        cache.save()
+        return cache, key
+
+    _, first = run(2)
+    cache, second = run(3)
+    assert first != second
+    assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == sorted(
+        [f"{second}.pkl", f"{second}.json", "last_SQUARE.key"])
+    assert cache.stats()["entries_pruned"] == 2  # the first run's output and report body
+
+    cache, key = run(3)  # unchanged: the hit is kept
+    assert key == second and cache.stats()["entries_pruned"] == 0
+    assert (tmp_path / "cache" / f"{second}.pkl").exists()
@@ -0,0 +1,96 @@
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_buckets_budget_requests_and_tokens():
+    _import()
+    from rate_limiter import RateLimiter
+
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=60, tpm=6000, clock=clock)
+
+    # Token budget allows two 3000-token requests, then refills at 100 tok/s
+    assert limiter.reserve(3000) == 0
+    assert limiter.reserve(3000) == 0
+    assert abs(limiter.reserve(3000) - 30.0) < 1e-6
+    clock.now = 30.0
+    assert limiter.reserve(3000) == 0
+    assert limiter.stats()["requests_granted"] == 3
+
+
+def test_rate_limited_pauses_and_halves_rate():
+    _import()
+    from rate_limiter import RateLimiter, parse_retry_after
+
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=60, clock=clock)
+    limiter.on_rate_limited(parse_retry_after({"retry-after": "2"}))
+    assert limiter.factor == 0.5
+    assert limiter.reserve(1) == 2.0
+    clock.now = 2.0
+    assert limiter.reserve(1) == 0
+    limiter.on_success()
+    assert limiter.factor == 0.55
+    assert limiter.stats()["throttled_429"] == 1
+    assert parse_retry_after({"retry-after-ms": "250"}) == 0.25
+
+
+def test_image_tokens_follow_tile_grid():
+    _import()
+    from rate_limiter import image_tokens
+
+    # 2731x3146 -> 768x885 after scaling -> 2x2 tiles
+    assert image_tokens(2731, 3146) == 85 + 170 * 4
+    assert image_tokens(512, 512) == 85 + 170
+
+
+def test_async_batch_recovers_from_429(tmp_path: Path):
+    import asyncio
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer, chat_completion
+
+    _import()
+    from gpt4o_batch_analysis_oauth import run_batch_async
+    from rate_limiter import RateLimiter
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    for i in range(3):
+        (imgs / f"{i:04d}_SDB_GEN.jpg").write_bytes(b"fakejpg")
+    images = sorted(imgs.glob("*.jpg"))
+
+    class ThrottlingStub(StubOpenAIServer):
+        def respond(self, path, body):
+            if len(self.requests) == 1:
+                return 429, {"retry-after": "0.1"}, {"error": {"message": "slow down"}}
+            return 200, {}, chat_completion(body["model"], self.content)
+
+    limiter = RateLimiter(rpm=600, tpm=100000)
+    out_dir = tmp_path / "out"
+    with ThrottlingStub() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        processed = asyncio.run(
+            run_batch_async(client, images, out_dir, "gpt-4o", concurrency=1, limiter=limiter)
+        )
+
+    assert processed == 3
+    assert not list(out_dir.glob("*_error.txt"))
+    stats = limiter.stats()
+    assert stats["throttled_429"] == 1
+    assert stats["requests_granted"] == 4
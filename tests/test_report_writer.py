@@ -0,0 +1,73 @@
+import gzip
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+REPORT = {
+    "meta": {"generated_at": "2026-01-01T00:00:00Z", "report_level": 0},
+    "pipeline_results": {
+        "defect_detection": {"outputs": {"def_all_count": 2, "def_all": [
+            {"id_defaut": "0001_D01", "type_defaut": "Fissure\nsur joint", "polygons_norm": [[[0.1, 0.2]]]},
+            {"id_defaut": "0001_D02", "regle_ref": {}, "polylines_norm": []},
+        ]}},
+        "empty": {"list": [], "dict": {}},
+    },
+    "summary": {"defects_detected": 2, "ratio": 0.5, "ok": True, "none": None},
+}
+
+
+def test_stream_matches_json_dumps():
+    _import()
+    from report_writer import write_json
+
+    for indent, separators in ((2, None), (None, (",", ":"))):
+        out = io.BytesIO()
+        write_json(out, REPORT, indent)
+        assert out.getvalue().decode("utf-8") == json.dumps(REPORT, indent=indent, separators=separators,
+                                                            ensure_ascii=False)
+
+    out = io.BytesIO()
+    write_json(out, {"ids": (i * i for i in range(4))}, None)  # generators stream as arrays
+    assert out.getvalue() == b'{"ids":[0,1,4,9]}'
+
+
+def test_cached_gzip_body_gets_schedule_member_appended(tmp_path: Path):
+    _import()
+    from run_pipeline import write_report, write_report_body
+
+    body = tmp_path / "body.json.gz"
+    with open(body, "wb") as out:
+        write_report_body(out, REPORT, indent=None, compress=True)
+
+    schedule = {"workers": 4, "critical_path": ["LOAD_ANALYSIS"]}
+    for source in (body, REPORT):
+        path = tmp_path / "report.json.gz"
+        write_report(str(path), source, schedule, indent=None, compress=True)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            assert json.load(f) == dict(REPORT, schedule=schedule)
+
+    plain = tmp_path / "report.json"
+    write_report(str(plain), REPORT, schedule)
+    assert plain.read_text(encoding="utf-8") == json.dumps(dict(REPORT, schedule=schedule), indent=2,
+                                                           ensure_ascii=False)
+
+
+def test_plain_run_schedules_reporting():
+    _import()
+    from run_pipeline import active_phases, load_controlpanel
+
+    controlpanel = load_controlpanel()
+    active = active_phases(controlpanel)
+    assert active["REPORTING"] and active["NORM_REFERENCE_LINK"]
+    assert active["CONTEXT_INTEGRATION"] == controlpanel["pipeline"]["defaults_active"]["CONTEXT_INTEGRATION"]
+    assert not active_phases(controlpanel, disable=["REPORTING"])["REPORTING"]
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def test_renamed_image_costs_no_api_call(tmp_path: Path):
+    import asyncio
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer
+
+    _import()
+    from gpt4o_batch_analysis_oauth import make_cache, run_batch_async
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    (imgs / "0201_SDB_GEN.jpg").write_bytes(b"same-bytes")
+    cache = make_cache(tmp_path / "cache")
+
+    with StubOpenAIServer() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url)
+        asyncio.run(run_batch_async(client, sorted(imgs.glob("*.jpg")), tmp_path / "out", "gpt-4o", cache=cache))
+        (imgs / "0201_SDB_GEN.jpg").rename(imgs / "0201_BAIGNOIRE_DET.jpg")
+        asyncio.run(run_batch_async(client, sorted(imgs.glob("*.jpg")), tmp_path / "out", "gpt-4o", cache=cache))
+        assert len(stub.requests) == 1
+
+    assert (tmp_path / "out" / "0201_BAIGNOIRE_DET_analysis.json").exists()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["bytes_saved"] == len(b"same-bytes")
+
+
+def test_key_depends_on_model_and_prompt(tmp_path: Path):
+    _import()
+    from response_cache import ResponseCache
+
+    img = tmp_path / "a.jpg"
+    img.write_bytes(b"x")
+    a = ResponseCache(tmp_path / "c", prompt="p1", params={"temperature": 0.2})
+    b = ResponseCache(tmp_path / "c", prompt="p2", params={"temperature": 0.2})
+    assert a.key_for(img, "gpt-4o") != a.key_for(img, "gpt-4o-mini")
+    assert a.key_for(img, "gpt-4o") != b.key_for(img, "gpt-4o")
+
+
+def test_schema_invalid_answer_is_not_cached(tmp_path: Path):
+    import asyncio
+    import json
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer
+
+    _import()
+    from gpt4o_batch_analysis_oauth import DEFAULT_SCHEMA_PATH, make_cache, run_batch_async
+    from json_repair import ResponseRepairer, load_schema
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    (imgs / "0201_SDB_GEN.jpg").write_bytes(b"same-bytes")
+    images = sorted(imgs.glob("*.jpg"))
+    cache = make_cache(tmp_path / "cache")
+    repairer = ResponseRepairer(load_schema(os.path.join(os.path.dirname(__file__), os.pardir, DEFAULT_SCHEMA_PATH)),
+                                max_reasks=0)
+
+    with StubOpenAIServer(content=json.dumps({"defects": "none"})) as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url)
+        for _ in range(2):
+            asyncio.run(run_batch_async(client, images, tmp_path / "out", "gpt-4o", cache=cache, repairer=repairer))
+        assert len(stub.requests) == 2  # the invalid answer was kept on disk but never served from the cache
+        assert repairer.stats()["invalid_kept"] == 2
+        assert cache.stats()["stores"] == 0
+
+        stub.content = json.dumps({"defects": [], "probable_causes": [], "recommended_actions": [],
+                                   "estimated_impact": {"cost_low_eur": 0, "cost_high_eur": 0, "urgency": 1}})
+        for _ in range(2):
+            asyncio.run(run_batch_async(client, images, tmp_path / "out", "gpt-4o", cache=cache, repairer=repairer))
+        assert len(stub.requests) == 3
+        assert cache.stats()["stores"] == 1
+
+
+def test_key_params_follow_json_mode_support():
+    _import()
+    from gpt4o_batch_analysis_oauth import request_body, sampling_params
+
+    for model in ("gpt-4o", "llava-13b"):
+        sent = "response_format" in request_body(model, "data:image/jpeg;base64,")
+        assert ("response_format" in sampling_params(model)) == sent
+    assert "response_format" not in sampling_params("llava-13b")
+
+
+def test_lru_eviction_respects_size_cap(tmp_path: Path):
+    _import()
+    from response_cache import ResponseCache
+
+    cache = ResponseCache(tmp_path / "c", max_bytes=250)
+    cache.put("old", "x" * 80)
+    cache.put("used", "y" * 80)
+    past = time.time() - 100
+    os.utime(cache._path("old"), (past, past))
+    os.utime(cache._path("used"), (past, past))
+    assert cache.get("used") is not None  # refreshes its mtime
+    cache.put("new", "z" * 80)
+
+    assert cache.get("old") is None
+    assert cache.get("used") is not None
+    assert cache.get("new") is not None
+    assert cache.total_bytes <= 250
+    assert cache.evictions == 1
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("R", (), {"headers": headers or {}, "status_code": status_code})()
+
+
+def test_classification_and_budget():
+    _import()
+    from retry_policy import FATAL, RATE_LIMIT, TRANSIENT, RetryPolicy, classify
+
+    assert classify(_StatusError(503)) == TRANSIENT
+    assert classify(_StatusError(429)) == RATE_LIMIT
+    assert classify(_StatusError(400)) == FATAL
+    assert classify(_StatusError(408)) == TRANSIENT
+    assert classify(_StatusError(409)) == FATAL
+    assert classify(TimeoutError()) == TRANSIENT
+    assert classify(ValueError()) == FATAL
+
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0, budget=2, rng=random.Random(0))
+    assert policy.next_delay(_StatusError(400), 1) is None
+    d1 = policy.next_delay(_StatusError(503), 1)
+    assert 0 <= d1 <= 1.0
+    assert policy.next_delay(_StatusError(429, {"retry-after": "7"}), 2) >= 7
+    assert policy.next_delay(_StatusError(503), 3) is None  # budget spent
+    stats = policy.stats()
+    assert (stats["retries"], stats["not_retried"], stats["budget_exhausted"]) == (2, 1, 1)
+
+
+def test_transient_errors_retried_and_dead_lettered(tmp_path: Path):
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer, chat_completion
+
+    _import()
+    from gpt4o_batch_analysis_oauth import run_batch_async
+    from retry_policy import DeadLetterQueue, RetryPolicy
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    (imgs / "0001_SDB_GEN.jpg").write_bytes(b"flaky")
+    (imgs / "0002_SDB_GEN.jpg").write_bytes(b"broken")
+    images = sorted(imgs.glob("*.jpg"))
+
+    class FlakyStub(StubOpenAIServer):
+        def respond(self, path, body):
+            url = body["messages"][0]["content"][0]["image_url"]["url"]
+            flaky_calls = sum(1 for _, b in self.requests
+                              if b["messages"][0]["content"][0]["image_url"]["url"] == url)
+            if url.endswith("Zmxha3k=") and flaky_calls < 3:  # base64("flaky")
+                return 503, {}, {"error": {"message": "overloaded"}}
+            if url.endswith("YnJva2Vu"):  # base64("broken")
+                return 400, {}, {"error": {"message": "invalid image"}}
+            return 200, {}, chat_completion(body["model"], self.content)
+
+    out_dir = tmp_path / "out"
+    dlq = DeadLetterQueue(out_dir / "dead_letter")
+    policy = RetryPolicy(max_attempts=4, base_delay=0.01)
+    with FlakyStub() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        processed = asyncio.run(run_batch_async(
+            client, images, out_dir, "gpt-4o", concurrency=2, policy=policy, dead_letters=dlq))
+
+    assert processed == 1
+    assert policy.stats()["retries_transient"] == 2
+    assert policy.stats()["recovered"] == 1
+    assert dlq.images() == [images[1]]
+    entry = json.loads((out_dir / "dead_letter" / "0002_SDB_GEN.json").read_text(encoding="utf-8"))
+    assert entry["class"] == "fatal" and entry["attempts"] == 1
+    assert (out_dir / "0002_SDB_GEN_error.txt").exists()
+
+    # A later success clears the dead letter
+    dlq.resolve(images[1])
+    assert dlq.images() == []
@@ -0,0 +1,144 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def test_replay_ignores_torn_line_and_counts_attempts(tmp_path: Path):
+    _import()
+    from run_journal import RunJournal
+
+    path = tmp_path / "journal.jsonl"
+    j = RunJournal(path)
+    j.record_many(["a.jpg", "b.jpg", "c.jpg"], "queued")
+    j.record("a.jpg", "sent")
+    j.record("a.jpg", "failed", "timeout")
+    j.record("a.jpg", "sent")
+    j.record("a.jpg", "succeeded")
+    j.record("b.jpg", "sent")
+    j.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"image": "c.jpg", "sta')  # killed mid-write
+
+    j2 = RunJournal(path)
+    assert j2.state_of("a.jpg") == "succeeded"
+    assert j2.attempts("a.jpg") == 2
+    assert j2.unfinished(["a.jpg", "b.jpg", "c.jpg"]) == ["b.jpg", "c.jpg"]
+
+    j2.compact()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 3
+    assert RunJournal(path).summary()["succeeded"] == 1
+
+
+def test_append_after_torn_tail_survives_replay(tmp_path: Path):
+    _import()
+    from run_journal import RunJournal
+
+    path = tmp_path / "journal.jsonl"
+    j = RunJournal(path)
+    j.record_many(["a.jpg", "b.jpg", "c.jpg"], "queued")
+    j.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"ts":"x","image":"b.jpg","sta')  # killed mid-write
+
+    j2 = RunJournal(path)
+    j2.record("c.jpg", "sent")
+    j2.record("c.jpg", "succeeded")
+    j2.close()
+
+    j3 = RunJournal(path)
+    assert j3.replayed == 5
+    assert (j3.state_of("c.jpg"), j3.attempts("c.jpg")) == ("succeeded", 1)
+    assert j3.state_of("b.jpg") == "queued"
+    assert all(json.loads(line) for line in path.read_text(encoding="utf-8").splitlines())
+
+    # a whole record that only lost its newline is kept and terminated
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": "x", "image": "b.jpg", "state": "sent", "attempt": 1}))
+    j4 = RunJournal(path)
+    j4.record("b.jpg", "succeeded")
+    j4.close()
+    j4 = RunJournal(path)
+    assert (j4.state_of("b.jpg"), j4.attempts("b.jpg")) == ("succeeded", 1)
+
+
+def test_select_pending_trusts_journal(tmp_path: Path):
+    _import()
+    from gpt4o_batch_analysis_oauth import select_pending
+    from run_journal import RunJournal
+
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    imgs = [tmp_path / f"{i:04d}_SDB_GEN.jpg" for i in range(3)]
+    (out_dir / f"{imgs[2].stem}_analysis.json").write_text("{}", encoding="utf-8")
+
+    journal = RunJournal(tmp_path / "journal.jsonl")
+    journal.record(imgs[0].as_posix(), "succeeded")
+    journal.record(imgs[1].as_posix(), "sent")
+
+    # imgs[0] done per journal (no output stat), imgs[1] unfinished,
+    # imgs[2] unknown to the journal but present on disk -> bootstrapped
+    assert select_pending(imgs, out_dir, False, journal) == [imgs[1]]
+    assert journal.state_of(imgs[2].as_posix()) == "succeeded"
+
+
+def test_async_run_journals_transitions(tmp_path: Path):
+    import asyncio
+    from openai import AsyncOpenAI
+    from stub_openai_server import StubOpenAIServer
+
+    _import()
+    from gpt4o_batch_analysis_oauth import run_batch_async
+    from run_journal import RunJournal
+
+    imgs = tmp_path / "imgs"
+    imgs.mkdir()
+    for i in range(3):
+        (imgs / f"{i:04d}_SDB_GEN.jpg").write_bytes(b"fakejpg")
+    images = sorted(imgs.glob("*.jpg"))
+    journal = RunJournal(tmp_path / "journal.jsonl")
+
+    with StubOpenAIServer() as stub:
+        client = AsyncOpenAI(api_key="test", base_url=stub.base_url)
+        asyncio.run(run_batch_async(client, images, tmp_path / "out", "gpt-4o", concurrency=2, journal=journal))
+    journal.close()
+
+    states = [json.loads(l)["state"] for l in (tmp_path / "journal.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert states.count("sent") == 3 and states.count("succeeded") == 3
+    assert not list((tmp_path / "out").glob("*.tmp"))
+
+
+def test_async_record_fsyncs_off_the_event_loop(tmp_path: Path, monkeypatch):
+    import asyncio
+    import threading
+
+    _import()
+    import run_journal
+    from run_journal import RunJournal
+
+    synced = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        synced.append(threading.current_thread())
+        real_fsync(fd)
+
+    monkeypatch.setattr(run_journal.os, "fsync", fsync)
+    j = RunJournal(tmp_path / "journal.jsonl")
+
+    async def run():
+        await j.record_async("a.jpg", "sent")  # not final: no fsync at all
+        await asyncio.gather(j.record_async("a.jpg", "succeeded"), j.record_async("b.jpg", "failed", "HTTP 400"))
+
+    asyncio.run(run())
+    j.close()
+    assert len(synced) == 2 and threading.main_thread() not in synced
+    assert RunJournal(tmp_path / "journal.jsonl").summary()["succeeded"] == 1
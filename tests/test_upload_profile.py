@@ -0,0 +1,77 @@
+import io
+import os
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+
+def _import():
+    # Ensure repository root on path
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+
+def _camera_jpeg(path: Path, size=(4080, 1884), orientation=6):
+    im = Image.effect_noise(size, 40).convert("RGB")
+    exif = Image.Exif()
+    exif[274] = orientation
+    im.save(path, "JPEG", quality=95, exif=exif)
+
+
+def test_resized_upload_follows_tile_grid_and_exif(tmp_path: Path):
+    _import()
+    from upload_profile import UploadProfile
+
+    src = tmp_path / "0001_SDB_GEN.jpg"
+    _camera_jpeg(src)
+    profile = UploadProfile()
+    mime, data = profile.prepare(src, "image/jpeg")
+
+    assert mime == "image/jpeg"
+    with Image.open(io.BytesIO(data)) as im:
+        # rotated to portrait, short side capped at 768
+        assert im.size == (768, 1663)
+    stats = profile.stats()
+    assert stats["sent_bytes"] < stats["original_bytes"]
+    assert stats["bytes_saved"] > 0
+
+
+def test_fresh_preview_is_reused(tmp_path: Path):
+    _import()
+    from upload_profile import UploadProfile
+
+    images_dir = tmp_path / "images"
+    preview_dir = images_dir / "preview"
+    preview_dir.mkdir(parents=True)
+    src = images_dir / "0001_SDB_GEN.jpg"
+    _camera_jpeg(src, orientation=1)
+    Image.new("RGB", (1280, 591), "gray").save(preview_dir / "0001_SDB_GEN.webp", "WEBP")
+
+    profile = UploadProfile(max_side=1280, short_side=None, fmt="webp",
+                            preview_dir=preview_dir, images_dir=images_dir)
+    mime, data = profile.prepare(src, "image/jpeg")
+
+    assert mime == "image/webp"
+    assert profile.previews_reused == 1
+    with Image.open(io.BytesIO(data)) as im:
+        assert im.size == (1280, 591)
+
+    # The default grid needs a 768px short side, which the preview lacks
+    strict = UploadProfile(preview_dir=preview_dir, images_dir=images_dir)
+    strict.prepare(src, "image/jpeg")
+    assert strict.previews_reused == 0
+
+
+def test_unreadable_file_is_sent_untouched(tmp_path: Path):
+    _import()
+    from gpt4o_batch_analysis_oauth import encode_image_as_data_url
+    from upload_profile import UploadProfile
+
+    src = tmp_path / "broken.jpg"
+    src.write_bytes(b"not really a jpeg")
+    profile = UploadProfile()
+    url = encode_image_as_data_url(src, profile)
+    assert url.startswith("data:image/jpeg;base64,")
+    assert profile.stats()["bytes_saved"] == 0
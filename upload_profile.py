@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Pre-upload image preparation for vision requests.
+
+- Applies EXIF orientation, then resizes to the provider's high-detail grid
+  (fit in 2048x2048, shortest side <= 768) or a custom long side
+- Re-encodes to JPEG or WebP at a chosen quality
+- Can reuse the WebP previews from make_previews_and_augment_json.py when
+  they are fresh and cover the target size (e.g. --upload-max-side 1280
+  --upload-short-side 0 matches their 1280px long side)
+- Counts original vs. sent bytes so each batch can report what it saved
+"""
+
+import io
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from image_probe import displayed_size, image_info
+
+try:
+    from PIL import Image, ImageOps
+except Exception:
+    Image = None
+    ImageOps = None
+
+# OpenAI detail=high keeps at most 2048 on the long side and 768 on the short side
+PROVIDER_MAX_SIDE = 2048
+PROVIDER_SHORT_SIDE = 768
+FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+
+
+def target_size(w: int, h: int, max_side: int = PROVIDER_MAX_SIDE,
+                short_side: Optional[int] = PROVIDER_SHORT_SIDE) -> Tuple[int, int]:
+    """Size the provider would downscale (w, h) to; never upscales."""
+    scale = min(1.0, max_side / max(w, h))
+    if short_side:
+        scale = min(scale, short_side / min(w, h))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+class UploadProfile:
+    """How images are shrunk and encoded before being sent."""
+
+    def __init__(
+        self,
+        max_side: int = PROVIDER_MAX_SIDE,
+        short_side: Optional[int] = PROVIDER_SHORT_SIDE,
+        fmt: str = "jpeg",
+        quality: int = 85,
+        preview_dir: Optional[Path] = None,
+        images_dir: Optional[Path] = None,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported upload format: {fmt} (use {', '.join(FORMATS)})")
+        self.max_side = max_side
+        self.short_side = short_side
+        self.fmt = fmt
+        self.quality = quality
+        self.preview_dir = Path(preview_dir) if preview_dir else None
+        self.images_dir = Path(images_dir) if images_dir else None
+        self._lock = threading.Lock()
+        # counters
+        self.images = 0
+        self.previews_reused = 0
+        self.original_bytes = 0
+        self.sent_bytes = 0
+
+    def params(self) -> Dict:
+        """Settings that change what the model sees (part of the cache key)."""
+        return {
+            "max_side": self.max_side,
+            "short_side": self.short_side,
+            "format": self.fmt,
+            "quality": self.quality,
+            "previews": self.preview_dir is not None,
+        }
+
+    def preview_for(self, p: Path) -> Optional[Path]:
+        """Matching WebP preview if it exists and is not older than the source."""
+        if self.preview_dir is None:
+            return None
+        candidates = []
+        if self.images_dir is not None:
+            try:
+                candidates.append(self.preview_dir / p.relative_to(self.images_dir).with_suffix(".webp"))
+            except ValueError:
+                pass
+        candidates.append(self.preview_dir / f"{p.stem}.webp")
+        for c in candidates:
+            if c.exists() and c.stat().st_mtime >= p.stat().st_mtime:
+                return c
+        return None
+
+    def _wanted(self, src: Path) -> Tuple[int, int]:
+        """Target size for `src` after EXIF orientation (header read only)."""
+        info = image_info(src)
+        if info is None:
+            raise ValueError(f"unreadable image header: {src}")
+        return target_size(*displayed_size(info), self.max_side, self.short_side)
+
+    def _encode(self, src: Path, want: Tuple[int, int]) -> Tuple[str, bytes]:
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            if im.size != want:
+                im = im.resize(want, Image.LANCZOS)
+            pil_fmt, mime = FORMATS[self.fmt]
+            if im.mode not in ("RGB", "L") and not (self.fmt == "webp" and im.mode == "RGBA"):
+                im = im.convert("RGB")
+            buf = io.BytesIO()
+            im.save(buf, pil_fmt, quality=self.quality)
+        return mime, buf.getvalue()
+
+    def _preview_covers(self, preview: Path, want: Tuple[int, int]) -> bool:
+        # allow 1% slack for rounding differences between the two resizes
+        with Image.open(preview) as im:
+            return im.width >= want[0] * 0.99 and im.height >= want[1] * 0.99
+
+    def prepare(self, p: Path, fallback_mime: str) -> Tuple[str, bytes]:
+        """(mime, bytes) to upload for `p`; falls back to the original file."""
+        original = p.read_bytes()
+        out = None
+        reused = False
+        if Image is not None:
+            try:
+                want = self._wanted(p)
+                preview = self.preview_for(p)
+                if preview is not None and self._preview_covers(preview, want):
+                    out = self._encode(preview, want)
+                    reused = True
+                else:
+                    out = self._encode(p, want)
+            except Exception:
+                out = None  # odd file: send it untouched
+        if out is None or len(out[1]) >= len(original):
+            out = (fallback_mime, original)
+            reused = False
+        with self._lock:
+            self.images += 1
+            self.previews_reused += int(reused)
+            self.original_bytes += len(original)
+            self.sent_bytes += len(out[1])
+        return out
+
+    def stats(self) -> Dict:
+        return {
+            "images": self.images,
+            "previews_reused": self.previews_reused,
+            "original_bytes": self.original_bytes,
+            "sent_bytes": self.sent_bytes,
+            "bytes_saved": self.original_bytes - self.sent_bytes,
+        }
+
+    def report(self) -> str:
+        saved = self.original_bytes - self.sent_bytes
+        pct = (saved / self.original_bytes * 100) if self.original_bytes else 0.0
+        return (f"Upload: {self.images} image(s), {self.original_bytes / 1e6:.1f} MB -> "
+                f"{self.sent_bytes / 1e6:.1f} MB ({pct:.0f}% saved before base64), "
+                f"{self.previews_reused} preview(s) reused")